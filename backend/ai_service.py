@@ -1,20 +1,122 @@
 import os
 import logging
-from dotenv import load_dotenv
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from typing import List, Dict, Any
+from typing import TYPE_CHECKING, List, Dict, Any, AsyncIterator, Tuple
 import asyncio
 
-# Load environment variables
-load_dotenv()
+from response_cache import ResponseCache
+from llm_limiter import LLMLimiter, LLMSaturatedError, PROVIDERS
+from llm_router import LLMRouter
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+if TYPE_CHECKING:
+    from emergentintegrations.llm.chat import LlmChat, UserMessage
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_MESSAGE = (
+    "You are Matchelor, a helpful AI assistant specialized in real estate and property services. "
+    "You help users find properties, answer questions about real estate, provide market insights, "
+    "assist with home buying and selling processes, offer mortgage guidance, and provide "
+    "personalized property recommendations. Be professional, knowledgeable, and helpful "
+    "while focusing on real estate expertise."
+)
+
+TITLE_SYSTEM_MESSAGE = (
+    "You are a helpful assistant that creates short, descriptive titles "
+    "for conversations. Generate a title that is 2-6 words long and "
+    "captures the main topic of the user's message. Return only the title, "
+    "nothing else."
+)
+
+SUMMARY_SYSTEM_MESSAGE = (
+    "You maintain a running summary of a real estate conversation between a user "
+    "and Matchelor. Merge the new turns into the existing summary. Keep facts the "
+    "user shared (budget, locations, preferences, timelines) and open questions. "
+    "Reply with the updated summary only, in at most 150 words."
+)
+
+FALLBACK_RESPONSE = (
+    "I apologize, but I'm experiencing some technical difficulties right now. "
+    "Please try again in a moment. This is a demo ChatGPT clone, and in the "
+    "full production version, this would be connected to a more robust AI system."
+)
+
+def format_turns(chat_history: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        f"{'User' if msg['sender'] == 'user' else 'Assistant'}: {msg['text']}"
+        for msg in chat_history
+    )
+
+def compose_prompt(message: str, chat_history: List[Dict[str, Any]] = None, context_summary: str = None) -> str:
+    """Prefix the user's message with the conversation context, if any"""
+    if not chat_history and not context_summary:
+        return message
+
+    parts = []
+    if context_summary:
+        parts.append(f"Summary of the earlier conversation:\n{context_summary}")
+    if chat_history:
+        parts.append(f"Recent conversation:\n{format_turns(chat_history)}")
+    parts.append(f"Current user message:\n{message}")
+    return "\n\n".join(parts)
+
+class LLMTimeoutError(Exception):
+    """Raised when an LLM call, or a whole routed request, runs past its deadline"""
+
+    def __init__(self, target: str, seconds: float):
+        super().__init__(f"LLM call to {target} timed out after {seconds:.1f}s")
+        self.target = target
+        self.seconds = seconds
+
+def llm_sdk():
+    """
+    The emergentintegrations chat module. It pulls in the provider SDKs and
+    takes seconds to import, so it is loaded on first use (or by warm_up)
+    rather than when the server starts.
+    """
+    from emergentintegrations.llm import chat
+    return chat
+
+def resolve_model(model: str) -> Tuple[str, str]:
+    """Map a model name to its (provider, model) pair"""
+    if model.startswith("gpt-"):
+        return "openai", model
+    elif model.startswith("claude-"):
+        return "anthropic", model
+    elif model.startswith("gemini-"):
+        return "gemini", model
+    else:
+        # Fallback to default
+        return "openai", "gpt-4o-mini"
+
 class AIService:
     def __init__(self):
         self.api_key = os.environ.get('EMERGENT_LLM_KEY')
         if not self.api_key:
             raise ValueError("EMERGENT_LLM_KEY not found in environment variables")
+
+        # Per-provider concurrency/rate limits with in-flight request coalescing
+        self.limiter = LLMLimiter.from_env()
+
+        # Provider health, failover to LLM_FALLBACK_MODELS and hedged requests
+        self.router = LLMRouter.from_env(lambda model: resolve_model(model)[0])
+
+        # Fail fast while a provider is down instead of piling up behind it
+        self.breakers = {provider: CircuitBreaker.from_env(provider) for provider in PROVIDERS}
+
+        # Deadline per provider call, and for a whole request including
+        # failover; the default stays under the frontend's 30s axios timeout
+        self.call_timeout = float(os.environ.get('LLM_CALL_TIMEOUT', 20))
+        self.request_deadline = float(os.environ.get('LLM_REQUEST_DEADLINE', 28))
+
+        # Answers to standalone questions; RESPONSE_CACHE_SIZE=0 disables it
+        cache_size = int(os.environ.get('RESPONSE_CACHE_SIZE', 1000))
+        similarity = os.environ.get('RESPONSE_CACHE_SIMILARITY')
+        self.response_cache = ResponseCache(
+            max_size=cache_size,
+            ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 3600)),
+            similarity_threshold=float(similarity) if similarity else None
+        ) if cache_size > 0 else None
         
         logger.info("AIService initialized with Emergent LLM key")
 
@@ -23,98 +125,194 @@ class AIService:
         message: str, 
         chat_history: List[Dict[str, Any]] = None,
         session_id: str = None,
-        model: str = "gpt-4o-mini"
+        model: str = "gpt-4o-mini",
+        context_summary: str = None,
+        use_cache: bool = True
     ) -> str:
         """
-        Send a message to AI and get response
+        Send a message to AI and get response. chat_history (chronological)
+        and context_summary are sent ahead of the message as context.
+
+        Standalone questions (no context) are answered from the response
+        cache when possible; pass use_cache=False to bypass it.
         """
         try:
             # Create a unique session ID if not provided
             if not session_id:
                 session_id = f"chat_{hash(message)}"
 
-            # Initialize the chat with system message
-            system_message = (
-                "You are Matchelor, a helpful AI assistant specialized in real estate and property services. "
-                "You help users find properties, answer questions about real estate, provide market insights, "
-                "assist with home buying and selling processes, offer mortgage guidance, and provide "
-                "personalized property recommendations. Be professional, knowledgeable, and helpful "
-                "while focusing on real estate expertise."
-            )
-
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=session_id,
-                system_message=system_message
+            # A cached answer is only valid when nothing earlier in the
+            # conversation could change it
+            cacheable = (
+                use_cache and self.response_cache is not None
+                and not chat_history and not context_summary
             )
+            if cacheable:
+                cached = self.response_cache.get(message, model, SYSTEM_MESSAGE)
+                if cached is not None:
+                    logger.info(f"AI response served from cache for session {session_id}")
+                    return cached
 
-            # Use the specified model (default: GPT-4o-mini)
-            if model.startswith("gpt-"):
-                chat.with_model("openai", model)
-            elif model.startswith("claude-"):
-                chat.with_model("anthropic", model)
-            elif model.startswith("gemini-"):
-                chat.with_model("gemini", model)
-            else:
-                # Fallback to default
-                chat.with_model("openai", "gpt-4o-mini")
-
-            # If we have chat history, we should restore it
-            # Note: For now, we'll send the current message
-            # In a production system, you'd want to restore the full conversation context
-
-            # Create user message
-            user_message = UserMessage(text=message)
+            # Create user message with the conversation context restored
+            user_message = llm_sdk().UserMessage(text=compose_prompt(message, chat_history, context_summary))
             
             # Send message and get response
-            response = await chat.send_message(user_message)
+            response = await self._send(session_id, model, SYSTEM_MESSAGE, user_message)
+
+            if cacheable:
+                self.response_cache.set(message, model, SYSTEM_MESSAGE, response)
             
             logger.info(f"AI response generated for session {session_id}")
             return response
 
+        except (LLMSaturatedError, CircuitOpenError):
+            # Surface saturation (429) and open breakers (503) so the API
+            # can answer quickly with Retry-After
+            raise
         except Exception as e:
             logger.error(f"Error in AI chat: {str(e)}")
             # Return a fallback response instead of raising an error
-            return (
-                "I apologize, but I'm experiencing some technical difficulties right now. "
-                "Please try again in a moment. This is a demo ChatGPT clone, and in the "
-                "full production version, this would be connected to a more robust AI system."
-            )
+            return FALLBACK_RESPONSE
 
-    async def get_chat_title_suggestion(self, first_message: str) -> str:
+    async def stream_chat_with_ai(
+        self,
+        message: str,
+        chat_history: List[Dict[str, Any]] = None,
+        session_id: str = None,
+        model: str = "gpt-4o-mini",
+        context_summary: str = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
         """
-        Generate a short title for a chat based on the first message
+        Stream an AI response as text chunks.
+
+        LlmChat only exposes a blocking send_message, so the completion
+        arrives as a single chunk; backends that support token streaming
+        (see FakeAIService) yield tokens as they are generated.
         """
-        try:
-            # Create a simple chat for title generation
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"title_{hash(first_message)}",
-                system_message=(
-                    "You are a helpful assistant that creates short, descriptive titles "
-                    "for conversations. Generate a title that is 2-6 words long and "
-                    "captures the main topic of the user's message. Return only the title, "
-                    "nothing else."
-                )
+        yield await self.chat_with_ai(
+            message=message,
+            chat_history=chat_history,
+            session_id=session_id,
+            model=model,
+            context_summary=context_summary,
+            use_cache=use_cache
+        )
+
+    async def summarize_conversation(self, chat_id: str, previous_summary: str, turns: List[Dict[str, Any]]) -> str:
+        """
+        Merge older turns of one chat into its running conversation summary.
+        The prompt carries the previous summary, so nothing else from the
+        chat is needed.
+        Raises on provider errors; the previous summary stays cached.
+        """
+        summary_message = llm_sdk().UserMessage(
+            text=(
+                f"Existing summary:\n{previous_summary or '(none)'}\n\n"
+                f"New turns:\n{format_turns(turns)}"
             )
-            
-            chat.with_model("openai", "gpt-4o-mini")
-            
-            title_message = UserMessage(
-                text=f"Create a short title for this conversation starter: '{first_message}'"
+        )
+        summary = await self._send(f"summary_{chat_id}", "gpt-4o-mini", SUMMARY_SYSTEM_MESSAGE, summary_message)
+        return summary.strip()
+
+    def _new_chat(self, session_id: str, model: str, system_message: str) -> "LlmChat":
+        """
+        A fresh client for one call. LlmChat keeps every message it sends
+        in its session, while each prompt here already carries the context
+        the server built within its token budget (recent turns, rolling
+        summary); a reused client would send that history twice and grow
+        until evicted.
+        """
+        chat = llm_sdk().LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        )
+        chat.with_model(*resolve_model(model))
+        return chat
+
+    async def _send(
+        self,
+        session_id: str,
+        model: str,
+        system_message: str,
+        user_message: "UserMessage"
+    ) -> str:
+        """
+        Send through the router (which may fail over or hedge to a backup
+        model), the provider's circuit breaker and its limiter; identical
+        in-flight prompts share one call. Each provider call gets
+        call_timeout and the whole request request_deadline; cancelling
+        the caller cancels the provider call.
+        """
+        async def send_to(candidate: str) -> str:
+            chat = self._new_chat(session_id, candidate, system_message)
+            provider, resolved_model = resolve_model(candidate)
+            return await self.breakers[provider].call(
+                lambda: self.limiter.call(
+                    provider,
+                    lambda: self._with_timeout(chat.send_message(user_message), provider, self.call_timeout),
+                    # Clients are per call, so the answer depends only on
+                    # the prompt and sharing it cannot leak session state
+                    coalesce_key=(resolved_model, system_message, user_message.text)
+                ),
+                ignore=(LLMSaturatedError,)
             )
+
+        return await self._with_timeout(self.router.call(model, send_to), model, self.request_deadline)
+
+    @staticmethod
+    async def _with_timeout(call, target: str, seconds: float):
+        try:
+            return await asyncio.wait_for(call, seconds)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(target, seconds)
+
+    async def warm_up(self):
+        """
+        Import the LLM SDK in a thread, so the first request does not pay
+        for it. No tokens are spent.
+        """
+        await asyncio.to_thread(llm_sdk)
+
+    def cache_stats(self) -> dict:
+        return self.response_cache.stats() if self.response_cache else {}
+
+    def limiter_stats(self) -> dict:
+        return self.limiter.stats()
+
+    def router_stats(self) -> dict:
+        return self.router.stats()
+
+    def breaker_stats(self) -> dict:
+        return {provider: breaker.stats() for provider, breaker in self.breakers.items()}
+
+    async def generate_chat_title(self, first_message: str) -> str:
+        """
+        Generate a short title for a chat based on the first message.
+        Raises on provider errors so callers can retry.
+        """
+        title_message = llm_sdk().UserMessage(
+            text=f"Create a short title for this conversation starter: '{first_message}'"
+        )
+        
+        title = await self._send(f"title_{hash(first_message)}", "gpt-4o-mini", TITLE_SYSTEM_MESSAGE, title_message)
+        
+        # Clean up the title (remove quotes, extra text)
+        title = title.strip().strip('"').strip("'")
+        
+        # Fallback to a simple title if the response is too long
+        if len(title) > 50:
+            title = "New Chat"
             
-            title = await chat.send_message(title_message)
-            
-            # Clean up the title (remove quotes, extra text)
-            title = title.strip().strip('"').strip("'")
-            
-            # Fallback to a simple title if the response is too long
-            if len(title) > 50:
-                title = "New Chat"
-                
-            return title
+        return title
 
+    async def get_chat_title_suggestion(self, first_message: str) -> str:
+        """
+        Generate a short title for a chat based on the first message
+        """
+        try:
+            return await self.generate_chat_title(first_message)
         except Exception as e:
             logger.error(f"Error generating chat title: {str(e)}")
-            return "New Chat"
\ No newline at end of file
+            return "New Chat"
@@ -0,0 +1,111 @@
+"""
+Request authentication: who owns the chats a request may see.
+
+With AUTH_JWT_KEY set, every /api request needs `Authorization: Bearer
+<jwt>`, verified with that key (an HS256 secret, or a PEM public key for
+RS256/ES256 via AUTH_JWT_ALGORITHMS); the user id is the `sub` claim.
+Without a key the API stays single-tenant and every request belongs to
+ANONYMOUS_USER_ID, which is also what migrations.py assigns to chats
+created before userId existed.
+
+Browsers cannot set headers on a WebSocket, and a bearer token in the URL
+ends up in access logs. So a socket authenticates with a ticket instead: a
+short-lived HS256 JWT from POST /api/ws-ticket, with its own audience, that
+the HTTP routes reject as a bearer token.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+ANONYMOUS_USER_ID = "anonymous"
+MAX_USER_ID_LENGTH = 128
+TICKET_AUDIENCE = "matchelor:ws"
+
+class JWTAuthenticator:
+    def __init__(
+        self,
+        key: Optional[str],
+        algorithms: List[str],
+        audience: Optional[str] = None,
+        ticket_key: Optional[str] = None,
+        ticket_ttl: float = 30.0
+    ):
+        self.key = key
+        self.algorithms = algorithms
+        self.audience = audience
+        self.ticket_ttl = ticket_ttl
+        if key:
+            import jwt  # only needed when auth is on
+            self._jwt = jwt
+            # An HS* secret can sign tickets too; a public key cannot
+            if not ticket_key and all(algorithm.startswith("HS") for algorithm in algorithms):
+                ticket_key = key
+            if not ticket_key:
+                raise ValueError(f"WS_TICKET_KEY is required with AUTH_JWT_ALGORITHMS={','.join(algorithms)}")
+        self.ticket_key = ticket_key
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.key)
+
+    def user_id(self, authorization: Optional[str]) -> str:
+        """The user id for an Authorization header value; raises 401 when invalid"""
+        if not self.enabled:
+            return ANONYMOUS_USER_ID
+
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise self._unauthorized("Missing bearer token")
+        try:
+            claims = self._jwt.decode(
+                token.strip(),
+                self.key,
+                algorithms=self.algorithms,
+                audience=self.audience,
+                options={"require": ["sub", "exp"]}
+            )
+        except self._jwt.PyJWTError as e:
+            raise self._unauthorized(f"Invalid token: {str(e)}")
+
+        return self._subject(claims)
+
+    def issue_ticket(self, user_id: str) -> Optional[str]:
+        """A WebSocket ticket for the user, good for ticket_ttl seconds (None when auth is off)"""
+        if not self.enabled:
+            return None
+        claims = {
+            "sub": user_id,
+            "aud": TICKET_AUDIENCE,
+            "exp": datetime.utcnow() + timedelta(seconds=self.ticket_ttl)
+        }
+        return self._jwt.encode(claims, self.ticket_key, algorithm="HS256")
+
+    def ticket_user_id(self, ticket: Optional[str]) -> str:
+        """The user id for a WebSocket ticket; raises 401 when invalid"""
+        if not self.enabled:
+            return ANONYMOUS_USER_ID
+        if not ticket:
+            raise self._unauthorized("Missing ticket")
+        try:
+            claims = self._jwt.decode(
+                ticket,
+                self.ticket_key,
+                algorithms=["HS256"],
+                audience=TICKET_AUDIENCE,
+                options={"require": ["sub", "exp"]}
+            )
+        except self._jwt.PyJWTError as e:
+            raise self._unauthorized(f"Invalid ticket: {str(e)}")
+        return self._subject(claims)
+
+    def _subject(self, claims: dict) -> str:
+        user_id = claims["sub"]
+        if not isinstance(user_id, str) or not 0 < len(user_id) <= MAX_USER_ID_LENGTH:
+            raise self._unauthorized("Invalid token subject")
+        return user_id
+
+    @staticmethod
+    def _unauthorized(detail: str) -> HTTPException:
+        return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
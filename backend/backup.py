@@ -0,0 +1,210 @@
+"""
+NDJSON export and import of one user's chats and messages.
+
+Each line is {"type": "header" | "chat" | "message", "data": {...}}. The
+header comes first, then each chat followed by its messages, oldest first.
+Soft-deleted chats (and their messages, pending purge) are left out.
+Datetimes are written as Mongo Extended JSON ({"$date": "...Z"}), so nested
+values such as recentMessages round-trip as well.
+
+Export walks the user's chats on the chat list index and streams each
+chat's messages from the chatId_timestamp_id index, so memory stays
+constant whatever the size of a chat. Import inserts in insert_many batches
+and only reads more input once a batch is written, so a fast client cannot
+outrun the database. Everything imported belongs to the importing user;
+documents whose id already exists are skipped, and so are messages of chats
+the user does not own.
+"""
+
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import orjson
+from pymongo.errors import BulkWriteError
+
+from purge_worker import LIVE_CHATS
+
+EXPORT_VERSION = 1
+DEFAULT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+MAX_LINE_BYTES = 16 * 1024 * 1024  # Mongo's document size limit
+DUPLICATE_KEY = 11000
+
+REQUIRED_FIELDS = {
+    "chat": ("id", "title", "createdAt", "updatedAt"),
+    "message": ("id", "chatId", "text", "sender", "timestamp"),
+}
+
+class ImportFormatError(ValueError):
+    """Raised for a line that is not a valid export record"""
+
+    def __init__(self, line_number: int, reason: str):
+        super().__init__(f"Line {line_number}: {reason}")
+        self.line_number = line_number
+
+def _encode_default(value: Any):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat(timespec="milliseconds") + "Z"}
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+def encode_record(record_type: str, data: Dict[str, Any]) -> bytes:
+    return orjson.dumps(
+        {"type": record_type, "data": data},
+        default=_encode_default,
+        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+    )
+
+def _restore_dates(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and "$date" in value:
+            return datetime.fromisoformat(value["$date"].rstrip("Z"))
+        return {key: _restore_dates(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_restore_dates(item) for item in value]
+    return value
+
+def decode_record(line: bytes, line_number: int) -> tuple:
+    try:
+        record = orjson.loads(line)
+        record_type, data = record["type"], _restore_dates(record["data"])
+    except (orjson.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ImportFormatError(line_number, f"not an export record ({e})")
+
+    if record_type == "header":
+        if data.get("version") != EXPORT_VERSION:
+            raise ImportFormatError(line_number, f"unsupported export version {data.get('version')}")
+        return record_type, data
+    if record_type not in REQUIRED_FIELDS:
+        raise ImportFormatError(line_number, f"unknown record type {record_type!r}")
+    missing = [field for field in REQUIRED_FIELDS[record_type] if field not in data]
+    if missing:
+        raise ImportFormatError(line_number, f"{record_type} is missing {', '.join(missing)}")
+    return record_type, data
+
+async def export_records(db, user_id: str, batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Yield the user's export as NDJSON chunks of roughly CHUNK_SIZE bytes"""
+    chats = (
+        db.chats.find({"userId": user_id, **LIVE_CHATS}, {"_id": 0})
+        .sort([("updatedAt", -1), ("id", -1)])
+        .batch_size(batch_size)
+    )
+
+    buffer = bytearray(encode_record("header", {
+        "version": EXPORT_VERSION,
+        "exportedAt": datetime.utcnow()
+    }))
+
+    async for chat in chats:
+        buffer += encode_record("chat", chat)
+        messages = (
+            db.messages.find({"chatId": chat["id"]}, {"_id": 0})
+            .sort([("timestamp", 1), ("id", 1)])
+            .batch_size(batch_size)
+        )
+        async for message in messages:
+            buffer += encode_record("message", message)
+            if len(buffer) >= CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+
+    if buffer:
+        yield bytes(buffer)
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream into lines, skipping blank ones"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+        if len(pending) > MAX_LINE_BYTES:
+            raise ImportFormatError(0, f"line longer than {MAX_LINE_BYTES} bytes")
+    if pending.strip():
+        yield pending
+
+async def _insert_batch(collection, documents: List[Dict[str, Any]]) -> tuple:
+    """insert_many, treating duplicate ids as skipped; returns (inserted, skipped) documents"""
+    try:
+        await collection.insert_many(documents, ordered=False)
+        return documents, []
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+        failed = {error["index"] for error in errors}
+        inserted = [doc for i, doc in enumerate(documents) if i not in failed]
+        return inserted, [documents[i] for i in sorted(failed)]
+
+async def import_records(
+    db,
+    lines: AsyncIterator[bytes],
+    user_id: str,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Insert every chat and message from an export into the user's account.
+    on_batch(type, docs) is called with the documents of each written batch
+    so derived indexes can follow. On a bad line, earlier batches stay
+    written; re-running the import skips them.
+    """
+    started = time.perf_counter()
+    stats = {"chats": 0, "messages": 0, "skipped": 0}
+    batches: Dict[str, List[Dict[str, Any]]] = {"chat": [], "message": []}
+    collections = {"chat": db.chats, "message": db.messages}
+    plural = {"chat": "chats", "message": "messages"}
+    # Chats the user owns, from this import or from an earlier run of it
+    owned_chats = set()
+
+    async def flush(record_type: str):
+        documents = batches[record_type]
+        if not documents:
+            return
+        batches[record_type] = []
+        if record_type == "message":
+            # Chats are flushed first, so every owned chat is known by now
+            allowed = [doc for doc in documents if doc["chatId"] in owned_chats]
+            stats["skipped"] += len(documents) - len(allowed)
+            documents = allowed
+            if not documents:
+                return
+
+        inserted, skipped = await _insert_batch(collections[record_type], documents)
+        stats[plural[record_type]] += len(inserted)
+        stats["skipped"] += len(skipped)
+        if record_type == "chat":
+            owned_chats.update(doc["id"] for doc in inserted)
+            if skipped:
+                async for chat in db.chats.find(
+                    {"id": {"$in": [doc["id"] for doc in skipped]}, "userId": user_id}, {"_id": 0, "id": 1}
+                ):
+                    owned_chats.add(chat["id"])
+        if on_batch and inserted:
+            on_batch(record_type, inserted)
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        record_type, data = decode_record(line, line_number)
+        if record_type == "header":
+            continue
+        data["userId"] = user_id
+        batches[record_type].append(data)
+        if len(batches[record_type]) >= batch_size:
+            if record_type == "message":
+                await flush("chat")
+            await flush(record_type)
+
+    await flush("chat")
+    await flush("message")
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["messagesPerSecond"] = round(stats["messages"] / elapsed, 1) if elapsed else 0.0
+    return stats
@@ -0,0 +1,54 @@
+"""
+Shared helpers for the backend benchmarks.
+
+Benchmarks run from the backend directory, e.g.:
+
+    python -m benchmarks.send_message_db --mongo-url mongodb://localhost:27017
+"""
+
+import json
+import os
+import statistics
+from typing import Dict, List
+
+def configure_env(mongo_url: str, db_name: str):
+    """Environment create_app() reads (Settings.from_env); the LLM is always faked"""
+    os.environ["MONGO_URL"] = mongo_url
+    os.environ["DB_NAME"] = db_name
+    os.environ["AI_BACKEND"] = "fake"
+    # Benchmarks run one process, so the in-process chat cache is safe
+    os.environ.setdefault("CHAT_CACHE_SIZE", "10000")
+    os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+
+def connect(mongo_url: str, db_name: str, use_mongomock: bool = False):
+    """Return (client, db) for a local mongod, or for mongomock when asked"""
+    if use_mongomock:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_url)
+    return client, client[db_name]
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
+
+def write_report(report: dict, output: str = None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
@@ -0,0 +1,138 @@
+"""
+Export/import throughput in messages per second.
+
+Seeds --chats chats with --messages messages in total, streams
+GET /api/export through the app, then POSTs the export to /api/import
+against an empty database. Reports messages/s for both directions, plus
+the tracemalloc peak during export so memory can be checked to stay flat
+as the history grows.
+
+    python -m benchmarks.export_import --messages 200000
+    python -m benchmarks.export_import --mongomock --messages 20000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import configure_env, connect, write_report
+
+# The user the API runs as without AUTH_JWT_KEY
+BENCH_USER = "anonymous"
+
+async def seed(db, chats: int, messages: int, batch_size: int = 5000):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    chat_ids = [str(uuid.uuid4()) for _ in range(chats)]
+    await db.chats.insert_many([
+        {"id": chat_id, "userId": BENCH_USER, "title": f"Chat {i}", "createdAt": now, "updatedAt": now,
+         "messageCount": 0, "recentMessages": []}
+        for i, chat_id in enumerate(chat_ids)
+    ])
+    start = now - timedelta(days=30)
+    for offset in range(0, messages, batch_size):
+        await db.messages.insert_many([
+            {
+                "id": str(uuid.uuid4()),
+                "chatId": rng.choice(chat_ids),
+                "userId": BENCH_USER,
+                "text": "What would the monthly payment be on a 30 year fixed loan? " * rng.randint(1, 4),
+                "sender": "user" if i % 2 == 0 else "ai",
+                "timestamp": start + timedelta(seconds=offset + i),
+                "metadata": {}
+            }
+            for i in range(min(batch_size, messages - offset))
+        ])
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    import server
+
+    client, source = connect(args.mongo_url, args.db_name, args.mongomock)
+    target = client[f"{args.db_name}_import"]
+    for db in (source, target):
+        await db.messages.drop()
+        await db.chats.drop()
+        if args.mongomock:
+            await db.chats.create_index("id", unique=True)
+            await db.messages.create_index("id", unique=True)
+        else:
+            await server.ensure_indexes(db)
+    await seed(source, args.chats, args.messages)
+
+    app = server.create_app()
+    services = app.state.services
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        services.db = source
+        tracemalloc.start()
+        started = time.perf_counter()
+        exported = bytearray() if args.keep_export else None
+        size = 0
+        async with http.stream("GET", "/api/export") as response:
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if exported is not None:
+                    exported += chunk
+        export_seconds = time.perf_counter() - started
+        _, export_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        if exported is None:
+            # Re-export into memory for the import leg (not timed)
+            exported = bytearray()
+            async with http.stream("GET", "/api/export") as response:
+                async for chunk in response.aiter_bytes():
+                    exported += chunk
+
+        services.db = target
+
+        async def body():
+            for offset in range(0, len(exported), 64 * 1024):
+                yield bytes(exported[offset:offset + 64 * 1024])
+
+        started = time.perf_counter()
+        response = await http.post("/api/import", content=body())
+        import_seconds = time.perf_counter() - started
+        stats = response.json()
+
+    client.close()
+    write_report({
+        "backend": "mongomock" if args.mongomock else "mongod",
+        "chats": args.chats,
+        "messages": args.messages,
+        "export": {
+            "seconds": round(export_seconds, 3),
+            "messages_per_second": round(args.messages / export_seconds, 1),
+            "megabytes": round(size / 1e6, 2),
+            # Includes the benchmark's own buffer when --keep-export is set
+            "tracemalloc_peak_mb": round(export_peak / 1e6, 2)
+        },
+        "import": {
+            "status": response.status_code,
+            "seconds": round(import_seconds, 3),
+            "messages_per_second": round(stats.get("messages", 0) / import_seconds, 1),
+            "imported": stats
+        }
+    }, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_backup_bench")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a local mongod")
+    parser.add_argument("--chats", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--keep-export", action="store_true",
+                        help="buffer the timed export instead of exporting twice")
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Cold-start import budget for server.py.
+
+Imports server and builds the app with create_app() in fresh interpreters
+under `python -X importtime` (the real AIService path, no LLM call or Mongo
+connection is made) and reports the median time, the packages that
+dominate it, and any module from LAZY_MODULES that got imported eagerly.
+Exits non-zero when the median is over --budget-ms or a lazy module was
+loaded, so it can gate CI.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget-ms 600 --rounds 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.common import configure_env, write_report
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Must only be imported on first use (or by the lifespan warm-up)
+LAZY_MODULES = (
+    "emergentintegrations", "litellm", "openai", "anthropic", "google.generativeai",
+    "redis", "pandas", "numpy", "boto3",
+)
+
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import server; server.create_app(); "
+    "print(f'{(time.perf_counter() - started) * 1000:.3f}')"
+)
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for each line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def import_once(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, int, int]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+def top_packages(rows: List[Tuple[str, int, int]], count: int) -> Dict[str, float]:
+    """Self time in ms summed per top-level package (nesting would double count)"""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.strip().split(".")[0]] += self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:count]
+    return {package: round(us / 1000, 1) for package, us in ranked}
+
+def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    env = dict(os.environ)
+    env.pop("AI_BACKEND", None)  # measure the real AIService path
+
+    samples = []
+    rows: List[Tuple[str, int, int]] = []
+    for _ in range(args.rounds):
+        elapsed_ms, rows = import_once(env)
+        samples.append(elapsed_ms)
+
+    imported = {name.strip() for name, _, _ in rows}
+    eager = sorted(
+        module for module in LAZY_MODULES
+        if any(name == module or name.startswith(module + ".") for name in imported)
+    )
+    median_ms = statistics.median(samples)
+    report = {
+        "rounds": args.rounds,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(samples), 1),
+        "max_ms": round(max(samples), 1),
+        "budget_ms": args.budget_ms,
+        "modules_imported": len(imported),
+        "top_packages_ms": top_packages(rows, args.top),
+        "eager_lazy_modules": eager,
+    }
+    write_report(report, args.output)
+
+    if median_ms > args.budget_ms or eager:
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_import_bench")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--top", type=int, default=12, help="how many packages to list")
+    parser.add_argument("--output", help="also write the JSON report here")
+    run(parser.parse_args())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Tail latency of LLM calls under the routing policy, with fake providers.
+
+Each fake provider answers after a lognormal latency, with a --slow-rate
+chance of a --slow-seconds stall and an --error-rate chance of failing.
+Runs the same request stream through LLMRouter with no backup, with
+failover only, and with failover plus hedging, and reports p50/p95/p99,
+fallback answers (the apology a user would see) and extra provider calls.
+
+    python -m benchmarks.llm_routing
+    python -m benchmarks.llm_routing --requests 2000 --error-rate 0.05 --slow-rate 0.08
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+from benchmarks.common import summarize, write_report
+
+PRIMARY = "gpt-4o-mini"
+BACKUP = "claude-3-5-haiku-20241022"
+
+class FakeProvider:
+    def __init__(self, rng: random.Random, median: float, slow_rate: float, slow_seconds: float, error_rate: float):
+        self.rng = rng
+        self.median = median
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.error_rate = error_rate
+        self.calls = 0
+
+    async def send(self) -> str:
+        self.calls += 1
+        delay = self.median * self.rng.lognormvariate(0, 0.3)
+        if self.rng.random() < self.slow_rate:
+            delay += self.slow_seconds
+        await asyncio.sleep(delay)
+        if self.rng.random() < self.error_rate:
+            raise RuntimeError("provider error")
+        return "answer"
+
+async def run_mode(args, fallbacks: dict, hedge: bool) -> dict:
+    from ai_service import resolve_model
+    from llm_router import LLMRouter
+
+    rng = random.Random(args.seed)
+    providers = {
+        PRIMARY: FakeProvider(rng, args.median, args.slow_rate, args.slow_seconds, args.error_rate),
+        BACKUP: FakeProvider(rng, args.median * args.backup_factor, args.slow_rate, args.slow_seconds, args.error_rate),
+    }
+    router = LLMRouter(
+        fallbacks,
+        lambda model: resolve_model(model)[0],
+        hedge=hedge,
+        hedge_delay=args.median * 3,
+        hedge_min_samples=20
+    )
+    samples = []
+    fallback_answers = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        nonlocal fallback_answers
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await router.call(PRIMARY, lambda model: providers[model].send())
+            except RuntimeError:
+                fallback_answers += 1
+            samples.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    calls = sum(provider.calls for provider in providers.values())
+    return {
+        "latency": summarize(samples),
+        "fallback_answers": fallback_answers,
+        "extra_calls_pct": round(100 * (calls - args.requests) / args.requests, 2),
+        "router": {key: value for key, value in router.stats().items() if key != "providers"}
+    }
+
+async def run(args):
+    logging.getLogger("llm_router").setLevel(logging.ERROR)  # one warning per failover otherwise
+    fallbacks = {PRIMARY: BACKUP}
+    write_report({
+        "config": {
+            "requests": args.requests,
+            "median_s": args.median,
+            "slow_rate": args.slow_rate,
+            "slow_seconds": args.slow_seconds,
+            "error_rate": args.error_rate,
+        },
+        "primary_only": await run_mode(args, {}, hedge=False),
+        "failover": await run_mode(args, fallbacks, hedge=False),
+        "hedged": await run_mode(args, fallbacks, hedge=True),
+    }, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--median", type=float, default=0.05, help="median provider latency in seconds")
+    parser.add_argument("--backup-factor", type=float, default=1.2, help="backup latency relative to primary")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-seconds", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
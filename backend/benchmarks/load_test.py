@@ -0,0 +1,177 @@
+"""
+Load benchmark for the FastAPI backend with a stubbed LLM.
+
+Runs server.py in-process against a local mongod (or mongomock) with
+FakeAIService standing in for the LLM, drives a weighted mix of
+create/list/send/get requests at a fixed concurrency, and prints
+throughput and p50/p95/p99 latency per endpoint as JSON, so runs can be
+diffed across commits.
+
+    python -m benchmarks.load_test --concurrency 32 --duration 30
+    python -m benchmarks.load_test --mongomock --llm-latency 0.2 --output load.json
+"""
+
+import argparse
+import asyncio
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import configure_env, connect, summarize, write_report
+
+ENDPOINTS = ("create", "list", "send", "get")
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name}")
+        mix[name] = float(weight)
+    return mix
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class LoadRunner:
+    def __init__(self, client: httpx.AsyncClient, mix: dict, seed_chats: list):
+        self.client = client
+        self.endpoints = list(mix)
+        self.weights = [mix[name] for name in self.endpoints]
+        self.chat_ids = list(seed_chats)
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(self, endpoint: str):
+        if endpoint == "create":
+            return await self.client.post("/api/chats", json={"title": "Load test"})
+        if endpoint == "list":
+            return await self.client.get("/api/chats", params={"limit": 50})
+        chat_id = random.choice(self.chat_ids)
+        if endpoint == "send":
+            return await self.client.post(
+                f"/api/chats/{chat_id}/messages",
+                json={"message": f"What are closing costs on a {random.randint(100, 900)}k home?"}
+            )
+        return await self.client.get(f"/api/chats/{chat_id}/messages", params={"limit": 50})
+
+    async def worker(self, deadline: float):
+        while time.perf_counter() < deadline:
+            endpoint = random.choices(self.endpoints, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await self.request(endpoint)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                response, ok = None, False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if ok:
+                self.samples[endpoint].append(elapsed_ms)
+                if endpoint == "create":
+                    self.chat_ids.append(response.json()["id"])
+            else:
+                self.errors[endpoint] += 1
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    import server
+    from fake_ai_service import FakeAIService
+
+    random.seed(args.seed)
+    mongo_client, db = connect(args.mongo_url, args.db_name, args.mongomock)
+    await db.messages.drop()
+    await db.chats.drop()
+
+    app = server.create_app()
+    services = app.state.services
+    services.db = db
+    services.ai_service = FakeAIService(first_token_delay=args.llm_latency, token_delay=args.token_delay)
+    services.title_worker.db = db
+    services.title_worker.generate_title = services.ai_service.generate_chat_title
+    if not args.mongomock:
+        await server.ensure_indexes(db)
+
+    uvicorn_server = None
+    if args.transport == "http":
+        import uvicorn
+        uvicorn_server = uvicorn.Server(uvicorn.Config(app, port=args.port, log_level="warning"))
+        serve_task = asyncio.create_task(uvicorn_server.serve())
+        while not uvicorn_server.started:
+            await asyncio.sleep(0.05)
+        client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency)
+        )
+    else:
+        services.title_worker.start()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    async with client:
+        seed_chats = []
+        for _ in range(args.seed_chats):
+            response = await client.post("/api/chats", json={"title": "Seed"})
+            seed_chats.append(response.json()["id"])
+
+        runner = LoadRunner(client, args.mix, seed_chats)
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(runner.worker(deadline) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    if uvicorn_server:
+        uvicorn_server.should_exit = True
+        await serve_task
+    else:
+        await services.title_worker.stop(timeout=0)
+    mongo_client.close()
+
+    report = {
+        "revision": git_revision(),
+        "config": {
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "transport": args.transport,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "llm_latency_s": args.llm_latency,
+            "mix": args.mix
+        },
+        "endpoints": {
+            endpoint: {
+                **summarize(runner.samples[endpoint]),
+                "throughput_rps": round(len(runner.samples[endpoint]) / elapsed, 2),
+                "errors": runner.errors[endpoint]
+            }
+            for endpoint in args.mix
+        },
+        "total_rps": round(sum(len(s) for s in runner.samples.values()) / elapsed, 2)
+    }
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_load")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a local mongod")
+    parser.add_argument("--transport", choices=("asgi", "http"), default="asgi",
+                        help="call the app in-process, or through uvicorn on --port")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("create=1,list=4,send=2,get=3"))
+    parser.add_argument("--seed-chats", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM time to first token (s)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="fake LLM delay per token (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
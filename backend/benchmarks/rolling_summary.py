@@ -0,0 +1,155 @@
+"""
+Prompt tokens per turn over a long synthetic conversation.
+
+Replays --turns exchanges into one chat through server.load_chat_context,
+server.save_user_message and server.save_exchange (the LLM is faked; its
+summaries are capped at 150 words like the real prompt's). Each turn
+records the estimated tokens of the prompt compose_prompt would send. Modes:
+
+- window: summaries off, only the recentMessages window is sent
+- rolling: older turns folded into the rolling summary every
+  --summary-batch messages once the chat has --summarize-after
+
+The report also gives the tokens the whole history would have cost
+("full_history"), what each fold sent to the summarizer, how many messages
+it read and how many messages were stored (two per turn). With rolling
+summaries the prompt and the per-fold reads should stay flat from the first
+hundred turns to the last.
+
+    python -m benchmarks.rolling_summary --mongomock
+    python -m benchmarks.rolling_summary --turns 500 --summarize-after 40 --summary-batch 10
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.common import configure_env, connect, summarize, write_report
+
+BENCH_USER = "anonymous"
+
+TOPICS = ["down payment", "closing costs", "HOA fees", "property taxes", "inspection", "mortgage rates"]
+PLACES = ["Austin", "Denver", "Raleigh", "Tampa", "Boise", "Columbus"]
+
+def user_text(rng: random.Random, turn: int) -> str:
+    topic, place = rng.choice(TOPICS), rng.choice(PLACES)
+    detail = " ".join(["We are also comparing a few neighborhoods nearby."] * rng.randint(0, 3))
+    return f"Turn {turn}: what should I expect for {topic} on a house in {place}? {detail}".strip()
+
+def ai_text(rng: random.Random, question: str) -> str:
+    sentence = "Typical figures vary by lender, price range and neighborhood, so compare several offers."
+    return f"About {question[:60]}... " + " ".join([sentence] * rng.randint(2, 6))
+
+def window_stats(values, first: int, last: int) -> dict:
+    chunk = values[first:last]
+    return {"mean": round(statistics.fmean(chunk), 1), "max": max(chunk)} if chunk else {}
+
+async def run_mode(server, services, db, args, rolling: bool) -> dict:
+    from ai_service import compose_prompt
+    from context_builder import estimate_tokens, message_tokens
+    from models import reply_timestamp
+
+    builder = services.context_builder
+    folds = []
+
+    async def summarize_turns(chat_id, previous_summary, turns):
+        folds.append({
+            "input_tokens": estimate_tokens(previous_summary or "") + sum(message_tokens(turn) for turn in turns),
+            "messages_read": len(turns)
+        })
+        return await services.ai_service.summarize_conversation(chat_id, previous_summary, turns)
+
+    builder.summarize = summarize_turns if rolling else None
+    builder.summarize_after = args.summarize_after
+    builder.summary_batch = args.summary_batch
+
+    chat = server.ChatModel(title=f"bench-{'rolling' if rolling else 'window'}", userId=BENCH_USER).dict()
+    chat["recentMessages"] = []
+    await db.chats.insert_one(chat)
+
+    rng = random.Random(args.seed)
+    prompt_tokens, history_tokens, samples = [], [], []
+    history = 0
+    for turn in range(1, args.turns + 1):
+        text = user_text(rng, turn)
+        start = time.perf_counter()
+        loaded, context = await server.load_chat_context(services, chat["id"], BENCH_USER)
+        samples.append((time.perf_counter() - start) * 1000)
+        prompt_tokens.append(estimate_tokens(compose_prompt(text, context.messages, context.summary)))
+        history_tokens.append(history + estimate_tokens(text))
+
+        # As send_message does: the question is saved before the LLM call
+        user_message = server.MessageModel(chatId=chat["id"], text=text, sender="user")
+        await server.save_user_message(services, loaded, user_message)
+        ai_message = server.MessageModel(
+            chatId=chat["id"], text=ai_text(rng, text), sender="ai",
+            timestamp=reply_timestamp(user_message.timestamp)
+        )
+        await server.save_exchange(services, loaded, user_message, ai_message)
+        history += message_tokens(user_message.dict()) + message_tokens(ai_message.dict())
+        # Let a fold triggered by this turn land before the next one, as it
+        # would while the user reads the reply
+        while services.background_tasks:
+            await asyncio.gather(*list(services.background_tasks))
+
+    stored = await db.messages.count_documents({"chatId": chat["id"]})
+    checkpoints = sorted({turn for turn in (1, 10, 50, 100, 200, 300, 400, args.turns) if turn <= args.turns})
+    summarizer_tokens = sum(fold["input_tokens"] for fold in folds)
+    return {
+        "prompt_tokens_at_turn": {turn: prompt_tokens[turn - 1] for turn in checkpoints},
+        "full_history_tokens_at_turn": {turn: history_tokens[turn - 1] for turn in checkpoints},
+        "prompt_tokens_first_100": window_stats(prompt_tokens, 0, 100),
+        "prompt_tokens_last_100": window_stats(prompt_tokens, -100, None),
+        "messages_stored": stored,
+        "folds": len(folds),
+        "fold_input_tokens": window_stats([fold["input_tokens"] for fold in folds], 0, None),
+        "fold_messages_read": window_stats([fold["messages_read"] for fold in folds], 0, None),
+        # Summarizer cost spread over every turn, on top of the prompt
+        "summarizer_tokens_per_turn": round(summarizer_tokens / args.turns, 1),
+        "load_context": summarize(samples)
+    }
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    import server
+
+    client, db = connect(args.mongo_url, args.db_name, args.mongomock)
+    services = server.create_app().state.services
+    services.db = db
+    services.title_worker.db = db
+    services.ai_service.first_token_delay = 0
+    await db.messages.drop()
+    await db.chats.drop()
+    if not args.mongomock:
+        await server.ensure_indexes(db)
+
+    report = {
+        "turns": args.turns,
+        "window_size": services.context_builder.window_size,
+        "token_budget": services.context_builder.token_budget,
+        "summarize_after": args.summarize_after,
+        "summary_batch": args.summary_batch,
+        "window": await run_mode(server, services, db, args, rolling=False),
+        "rolling": await run_mode(server, services, db, args, rolling=True),
+    }
+
+    await services.title_worker.stop(timeout=0)
+    client.close()
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_summary_bench")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a local mongod")
+    parser.add_argument("--turns", type=int, default=500, help="user messages (each gets a reply)")
+    parser.add_argument("--summarize-after", type=int, default=40)
+    parser.add_argument("--summary-batch", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+GET /api/search latency over a large synthetic history.
+
+Seeds --messages messages (default one million) spread over --chats chats,
+with words drawn from a Zipf-like vocabulary, then times the search backend
+for rare, mid-frequency and multi-word queries. Against mongod this uses
+the text indexes from db_indexes.py; --mongomock uses the in-memory index
+(SEARCH_BACKEND=memory) and should be run with far fewer messages.
+
+    python -m benchmarks.search --messages 1000000
+    python -m benchmarks.search --mongomock --messages 20000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import configure_env, connect, summarize, write_report
+
+# Every seeded chat belongs to the user the API runs as without auth
+BENCH_USER = "anonymous"
+
+VOCABULARY = (
+    "house mortgage escrow closing offer inspection appraisal lender rate loan "
+    "condo townhouse listing agent seller buyer deposit title insurance tax "
+    "refinance equity downpayment preapproval contingency survey hoa zoning "
+    "duplex basement roof kitchen garage backyard neighborhood school commute"
+).split()
+# Synthetic long-tail words so rare terms exist
+RARE_WORDS = [f"parcel{i}" for i in range(5000)]
+
+QUERIES = {
+    "rare": ["parcel17", "parcel4242", "parcel999"],
+    "mid": ["zoning", "survey", "duplex"],
+    "common": ["house", "mortgage"],
+    "multi": ["escrow inspection", "refinance equity rate"],
+}
+
+def make_text(rng: random.Random) -> str:
+    words = [VOCABULARY[min(int(rng.paretovariate(1.2)) - 1, len(VOCABULARY) - 1)] for _ in range(rng.randint(8, 30))]
+    if rng.random() < 0.02:
+        words.append(rng.choice(RARE_WORDS))
+    return " ".join(words)
+
+async def seed(db, search_index, messages: int, chats: int, batch_size: int = 10000):
+    rng = random.Random(7)
+    chat_ids = [str(uuid.uuid4()) for _ in range(chats)]
+    now = datetime.utcnow()
+    chat_docs = [
+        {"id": chat_id, "userId": BENCH_USER, "title": f"Chat about {rng.choice(VOCABULARY)}", "updatedAt": now}
+        for chat_id in chat_ids
+    ]
+    await db.chats.insert_many(chat_docs)
+    for chat in chat_docs:
+        search_index.index_chat(chat)
+
+    start = now - timedelta(days=365)
+    for offset in range(0, messages, batch_size):
+        batch = [
+            {
+                "id": str(uuid.uuid4()),
+                "chatId": rng.choice(chat_ids),
+                "userId": BENCH_USER,
+                "text": make_text(rng),
+                "sender": "user" if i % 2 == 0 else "ai",
+                "timestamp": start + timedelta(seconds=30 * (offset + i)),
+                "metadata": {}
+            }
+            for i in range(min(batch_size, messages - offset))
+        ]
+        await db.messages.insert_many(batch)
+        search_index.index_messages(batch)
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    from search import MongoTextSearch, InMemorySearchIndex
+    from db_indexes import ensure_indexes
+
+    client, db = connect(args.mongo_url, args.db_name, args.mongomock)
+    search_index = InMemorySearchIndex() if args.mongomock else MongoTextSearch()
+    if not args.skip_seed:
+        await db.messages.drop()
+        await db.chats.drop()
+        if not args.mongomock:
+            await ensure_indexes(db)
+        seed_start = time.perf_counter()
+        await seed(db, search_index, args.messages, args.chats)
+        print(f"Seeded {args.messages} messages in {time.perf_counter() - seed_start:.1f}s")
+    elif args.mongomock:
+        await search_index.rebuild(db)
+
+    report = {
+        "backend": "memory" if args.mongomock else "mongo-text",
+        "messages": args.messages,
+        "limit": args.limit,
+        "queries": {}
+    }
+    for kind, queries in QUERIES.items():
+        samples = []
+        for _ in range(args.rounds):
+            for query in queries:
+                start = time.perf_counter()
+                await search_index.search(db, BENCH_USER, query, args.limit)
+                samples.append((time.perf_counter() - start) * 1000)
+        report["queries"][kind] = summarize(samples)
+
+    client.close()
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_search_bench")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock and the in-memory index")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--chats", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the data from a previous run")
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Per-message database time in send_message, before and after batching.
+
+"legacy" replays the original six round trips (find_one chat, insert user
+message, read last 10 messages, insert AI message, count_documents, update
+chat). "current" runs the production path: server.load_chat_context (the
+chat comes from the chat cache once warm), server.save_user_message before
+the LLM call (insert, bump the chat's historyVersion), then
+server.save_exchange (insert the reply, one find_one_and_update). Round
+trips are counted as they are issued, not assumed. The LLM call is left
+out, so the numbers are pure DB time.
+
+    python -m benchmarks.send_message_db --messages 500
+    python -m benchmarks.send_message_db --mongomock   # smoke run, no mongod
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from benchmarks.common import configure_env, connect, summarize, write_report
+
+BENCH_USER = "anonymous"
+
+class CountingCollection:
+    """Counts the operations issued through one collection (each is a round trip)"""
+
+    OPERATIONS = {
+        "find", "find_one", "find_one_and_update", "insert_one", "insert_many",
+        "update_one", "update_many", "delete_one", "delete_many", "count_documents"
+    }
+
+    def __init__(self, database: "CountingDatabase", collection):
+        self.database = database
+        self.collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self.collection, name)
+        if name not in self.OPERATIONS:
+            return attr
+
+        def counted(*args, **kwargs):
+            self.database.round_trips += 1
+            return attr(*args, **kwargs)
+        return counted
+
+class CountingDatabase:
+    def __init__(self, db):
+        self.db = db
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        return CountingCollection(self, getattr(self.db, name))
+
+async def legacy_exchange(db, chat_id: str, text: str, models):
+    chat = await db.chats.find_one({"id": chat_id})
+    assert chat
+    user_message = models.MessageModel(chatId=chat_id, text=text, sender="user")
+    await db.messages.insert_one(user_message.dict())
+    await db.messages.find({"chatId": chat_id}).sort("timestamp", -1).limit(10).to_list(10)
+    ai_message = models.MessageModel(chatId=chat_id, text=f"answer to {text}", sender="ai")
+    await db.messages.insert_one(ai_message.dict())
+    message_count = await db.messages.count_documents({"chatId": chat_id})
+    await db.chats.update_one({"id": chat_id}, {"$set": {
+        "messageCount": message_count,
+        "updatedAt": datetime.utcnow(),
+        "lastMessagePreview": models.build_preview(ai_message.text),
+        "lastMessageAt": ai_message.timestamp
+    }})
+
+async def current_exchange(server, services, chat_id: str, text: str):
+    chat, context = await server.load_chat_context(services, chat_id, BENCH_USER)
+    user_message = server.MessageModel(chatId=chat_id, text=text, sender="user")
+    await server.save_user_message(services, chat, user_message)
+    ai_message = server.MessageModel(chatId=chat_id, text=f"answer to {text}", sender="ai")
+    await server.save_exchange(services, chat, user_message, ai_message)
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    import server
+    import models
+
+    client, raw_db = connect(args.mongo_url, args.db_name, args.mongomock)
+    db = CountingDatabase(raw_db)
+    services = server.create_app().state.services
+    services.db = db
+    services.title_worker.db = raw_db
+    await db.messages.drop()
+    await db.chats.drop()
+    if not args.mongomock:
+        await server.ensure_indexes(raw_db)
+
+    report = {"messages_per_chat": args.messages, "variants": {}}
+    for variant in ("legacy", "current"):
+        chat = server.ChatModel(title=f"bench-{variant}", userId=BENCH_USER).dict()
+        chat["recentMessages"] = []
+        await db.chats.insert_one(chat)
+
+        samples = []
+        db.round_trips = 0
+        for i in range(args.messages):
+            text = f"How much is the down payment on house {i}?"
+            start = time.perf_counter()
+            if variant == "legacy":
+                await legacy_exchange(db, chat["id"], text, models)
+            else:
+                await current_exchange(server, services, chat["id"], text)
+            samples.append((time.perf_counter() - start) * 1000)
+
+        report["variants"][variant] = {
+            "round_trips_per_message": round(db.round_trips / args.messages, 2),
+            "all": summarize(samples),
+            # count_documents grows with chat length; the tail shows it
+            "last_100": summarize(samples[-100:])
+        }
+
+    await services.title_worker.stop(timeout=0)
+    client.close()
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_bench")
+    parser.add_argument("--messages", type=int, default=500, help="exchanges per chat")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a local mongod")
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+List endpoint serialization time, before and after the fast path.
+
+"legacy" replays the original get_chats/get_messages serialization: one
+Pydantic model per item (with a utcnow() call or strftime per item), FastAPI
+response_model validation, then the stdlib JSON encoder. "current" builds
+plain dicts with serializers.chat_summaries/message_summaries and renders
+them with ORJSONResponse. No database is involved.
+
+    python -m benchmarks.serialization --items 1000 --rounds 200
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from benchmarks.common import summarize, write_report
+from models import ChatResponse, MessageResponse, EMPTY_PREVIEW
+from serializers import chat_summaries, message_summaries
+
+def legacy_format_timestamp(dt: datetime) -> str:
+    now = datetime.utcnow()
+    diff = now - dt
+
+    if diff.total_seconds() < 60:
+        return "now"
+    elif diff.total_seconds() < 3600:
+        minutes = int(diff.total_seconds() / 60)
+        return f"{minutes} min ago"
+    elif diff.total_seconds() < 86400:
+        hours = int(diff.total_seconds() / 3600)
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    else:
+        days = int(diff.total_seconds() / 86400)
+        return f"{days} day{'s' if days > 1 else ''} ago"
+
+def make_chats(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "title": f"Offer on listing {i}",
+            "lastMessagePreview": "What closing costs should I budget for on a condo?",
+            "updatedAt": now - timedelta(minutes=7 * i),
+            "messageCount": i % 40
+        }
+        for i in range(count)
+    ]
+
+def make_messages(count: int) -> List[dict]:
+    chat_id = str(uuid.uuid4())
+    start = datetime.utcnow() - timedelta(days=1)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "chatId": chat_id,
+            "text": "The seller agreed to cover half of the transfer tax. " * 3,
+            "sender": "user" if i % 2 == 0 else "ai",
+            "timestamp": start + timedelta(seconds=37 * i),
+            "metadata": {}
+        }
+        for i in range(count)
+    ]
+
+CHATS_FIELD = create_response_field(name="Response_get_chats", type_=List[ChatResponse])
+MESSAGES_FIELD = create_response_field(name="Response_get_messages", type_=List[MessageResponse])
+
+async def legacy_chats(chats: List[dict]) -> bytes:
+    responses = [
+        ChatResponse(
+            id=chat["id"],
+            title=chat["title"],
+            preview=chat.get("lastMessagePreview") or EMPTY_PREVIEW,
+            timestamp=legacy_format_timestamp(chat["updatedAt"]),
+            messageCount=chat.get("messageCount", 0)
+        )
+        for chat in chats
+    ]
+    content = await serialize_response(field=CHATS_FIELD, response_content=responses)
+    return JSONResponse(content).body
+
+async def legacy_messages(messages: List[dict]) -> bytes:
+    responses = [
+        MessageResponse(
+            id=message["id"],
+            text=message["text"],
+            sender=message["sender"],
+            timestamp=message["timestamp"].strftime("%I:%M %p"),
+            chatId=message["chatId"]
+        )
+        for message in messages
+    ]
+    content = await serialize_response(field=MESSAGES_FIELD, response_content=responses)
+    return JSONResponse(content).body
+
+async def current_chats(chats: List[dict]) -> bytes:
+    return ORJSONResponse(chat_summaries(chats)).body
+
+async def current_messages(messages: List[dict]) -> bytes:
+    return ORJSONResponse(message_summaries(messages)).body
+
+VARIANTS = {
+    "chats": (make_chats, legacy_chats, current_chats),
+    "messages": (make_messages, legacy_messages, current_messages),
+}
+
+async def measure(render, items: List[dict], rounds: int) -> List[float]:
+    await render(items)  # warm up
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await render(items)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def run(args):
+    report = {"items": args.items, "rounds": args.rounds, "endpoints": {}}
+    for endpoint, (make_items, legacy, current) in VARIANTS.items():
+        items = make_items(args.items)
+        legacy_samples = await measure(legacy, items, args.rounds)
+        current_samples = await measure(current, items, args.rounds)
+        legacy_stats, current_stats = summarize(legacy_samples), summarize(current_samples)
+        report["endpoints"][endpoint] = {
+            "legacy": legacy_stats,
+            "current": current_stats,
+            "speedup_p50": round(legacy_stats["p50_ms"] / current_stats["p50_ms"], 2)
+        }
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=1000, help="items per response")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+GET /api/chats latency as the number of tenants grows.
+
+Seeds --chats-per-user chats for each of a growing number of users (the
+--tenants steps, added incrementally), signs a JWT for a sample of them and
+times their chat lists through the app. With the userId-prefixed list index
+the p50/p95 should stay flat from the first step to the last. Against
+mongod the report also includes the explain() docsExamined/keysExamined
+of one list query per step, which should equal the page size. mongomock has
+no indexes, so its latencies grow with the total and only check the wiring.
+
+    python -m benchmarks.tenant_scaling --tenants 10,100,1000,10000
+    python -m benchmarks.tenant_scaling --mongomock --tenants 10,100,500
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks.common import configure_env, connect, summarize, write_report
+
+BENCH_KEY = "tenant-scaling-benchmark-signing-secret"
+
+def parse_steps(value: str):
+    return sorted(int(step) for step in value.split(","))
+
+def make_token(jwt, user_id: str) -> str:
+    claims = {"sub": user_id, "exp": datetime.utcnow() + timedelta(hours=1)}
+    return jwt.encode(claims, BENCH_KEY, algorithm="HS256")
+
+async def seed_users(db, first: int, last: int, chats_per_user: int, batch_size: int = 5000):
+    """Insert chats for users first..last-1, interleaved in time across users"""
+    rng = random.Random(first)
+    now = datetime.utcnow()
+    batch = []
+    for user in range(first, last):
+        for i in range(chats_per_user):
+            updated = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "userId": f"user-{user}",
+                "title": f"Chat {i}",
+                "createdAt": updated,
+                "updatedAt": updated,
+                "deletedAt": None,
+                "messageCount": 0,
+                "recentMessages": []
+            })
+            if len(batch) >= batch_size:
+                await db.chats.insert_many(batch)
+                batch = []
+    if batch:
+        await db.chats.insert_many(batch)
+
+async def explain_list(db, user_id: str, limit: int) -> dict:
+    from pagination import keyset_sort
+    from purge_worker import LIVE_CHATS
+    explain = await (
+        db.chats.find({"userId": user_id, **LIVE_CHATS})
+        .sort(keyset_sort("updatedAt"))
+        .limit(limit)
+        .explain()
+    )
+    stats = explain.get("executionStats", {})
+    return {
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "returned": stats.get("nReturned"),
+    }
+
+async def run(args):
+    configure_env(args.mongo_url, args.db_name)
+    import jwt
+    import server
+    from auth import JWTAuthenticator
+
+    client, db = connect(args.mongo_url, args.db_name, args.mongomock)
+    await db.messages.drop()
+    await db.chats.drop()
+    if not args.mongomock:
+        await server.ensure_indexes(db)
+    app = server.create_app()
+    app.state.services.db = db
+    app.state.services.authenticator = JWTAuthenticator(BENCH_KEY, ["HS256"])
+
+    rng = random.Random(11)
+    report = {
+        "backend": "mongomock" if args.mongomock else "mongod",
+        "chats_per_user": args.chats_per_user,
+        "limit": args.limit,
+        "steps": []
+    }
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+        seeded = 0
+        for tenants in args.tenants:
+            started = time.perf_counter()
+            await seed_users(db, seeded, tenants, args.chats_per_user)
+            seed_seconds = time.perf_counter() - started
+            seeded = tenants
+
+            users = [f"user-{rng.randrange(tenants)}" for _ in range(args.sample_users)]
+            headers = {user: {"Authorization": f"Bearer {make_token(jwt, user)}"} for user in users}
+            samples = []
+            for _ in range(args.rounds):
+                for user in users:
+                    start = time.perf_counter()
+                    response = await http.get("/api/chats", params={"limit": args.limit}, headers=headers[user])
+                    samples.append((time.perf_counter() - start) * 1000)
+                    response.raise_for_status()
+
+            step = {
+                "tenants": tenants,
+                "chats": tenants * args.chats_per_user,
+                "seed_seconds": round(seed_seconds, 2),
+                "list": summarize(samples),
+            }
+            if not args.mongomock:
+                step["explain"] = await explain_list(db, users[0], args.limit)
+            report["steps"].append(step)
+
+    client.close()
+    write_report(report, args.output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--db-name", default="matchelor_tenant_bench")
+    parser.add_argument("--mongomock", action="store_true", help="use mongomock instead of a local mongod")
+    parser.add_argument("--tenants", type=parse_steps, default=parse_steps("10,100,1000,10000"))
+    parser.add_argument("--chats-per-user", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--sample-users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--output", help="also write the JSON report here")
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Read-through cache for chat documents.
+
+The chat document carries its metadata and its last N messages
+(recentMessages), so one cached entry serves send_message, get_messages,
+get_chat and update_chat. Every write path in server.py either stores the
+post-write document (create, update, send) or drops the entry (delete,
+title and summary updates).
+
+Backends:
+- MemoryCacheBackend: in-process TTL/LRU, opt-in with CHAT_CACHE_SIZE for
+  single-process deployments. With several workers, entries could be stale
+  in the other workers for up to the TTL.
+- RedisCacheBackend: any client with redis.asyncio's get/set/delete, shared
+  by all workers (needs the redis package). FakeRedis (fake_redis.py)
+  stands in for it locally.
+"""
+
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import bson
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+class MemoryCacheBackend:
+    """Stores the documents themselves; callers must treat them as read-only"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0):
+        self.entries = TTLCache(max_size, ttl)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key, record=False)
+
+    async def set(self, key: str, document: Dict[str, Any]):
+        self.entries.set(key, document)
+
+    async def delete(self, key: str):
+        self.entries.pop(key)
+
+class RedisCacheBackend:
+    """BSON-encoded entries, so datetimes round-trip unchanged"""
+
+    def __init__(self, client, ttl: float = 60.0, prefix: str = "matchelor:chat:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = await self.client.get(self.prefix + key)
+        return bson.decode(data) if data is not None else None
+
+    async def set(self, key: str, document: Dict[str, Any]):
+        await self.client.set(self.prefix + key, bson.encode(document), ex=max(1, round(self.ttl)))
+
+    async def delete(self, key: str):
+        await self.client.delete(self.prefix + key)
+
+class ChatCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, redis_url: Optional[str] = None, shared: bool = False) -> "ChatCache":
+        """
+        redis_url (Settings.chat_cache_redis_url) selects Redis; otherwise an
+        in-process cache of CHAT_CACHE_SIZE entries. That defaults to 0
+        (nothing cached): the app cannot tell how many workers gunicorn -w or
+        uvicorn --workers started, so only a deployment known to run one
+        process should set it. CHAT_CACHE_TTL is in seconds. With
+        shared=True (WEB_CONCURRENCY > 1) the in-process cache stays off.
+        """
+        ttl = float(os.environ.get("CHAT_CACHE_TTL", 60))
+        if redis_url:
+            import redis.asyncio as redis
+            return cls(RedisCacheBackend(redis.from_url(redis_url), ttl=ttl))
+
+        size = int(os.environ.get("CHAT_CACHE_SIZE", 0))
+        if shared and size > 0:
+            logger.warning("Chat cache disabled: several workers need CHAT_CACHE_REDIS_URL to share it")
+            size = 0
+        return cls(MemoryCacheBackend(max(size, 0), ttl))
+
+    async def get_or_load(
+        self,
+        chat_id: str,
+        load: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        """Return the cached chat, or load it (with load()) and cache it"""
+        try:
+            document = await self.backend.get(chat_id)
+        except Exception as e:
+            # A cache outage degrades to database reads
+            self.errors += 1
+            logger.warning(f"Chat cache read failed: {str(e)}")
+            return await load()
+
+        if document is not None:
+            self.hits += 1
+            return document
+
+        self.misses += 1
+        document = await load()
+        if document is not None:
+            await self.set(chat_id, document)
+        return document
+
+    async def set(self, chat_id: str, document: Dict[str, Any]):
+        try:
+            await self.backend.set(chat_id, document)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Chat cache write failed: {str(e)}")
+
+    async def invalidate(self, chat_id: str):
+        try:
+            await self.backend.delete(chat_id)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Chat cache invalidation failed for {chat_id}: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
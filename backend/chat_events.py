@@ -0,0 +1,189 @@
+"""
+Fan-out of chat events to WebSocket subscribers.
+
+Writes publish events ({"type": ..., ...}) to two kinds of topic:
+- chat:<id> carries one chat's live traffic: the start and tokens of a
+  reply being generated, the messages once saved, and failures.
+- user:<id> carries changes to the user's chat list: chat upserts (new
+  chats, titles, the latest message) and deletions.
+Each socket subscribes to its chat and its user, so every open tab and
+device sees the same conversation and sidebar without refetching.
+
+Brokers:
+- LocalBroker: in-process fan-out (default). With several workers an event
+  only reaches sockets connected to the worker that published it.
+- RedisBroker: Redis PUBLISH/PSUBSCRIBE, shared by all workers (needs the
+  redis package).
+
+A subscriber that falls max_queue events behind is dropped (its socket is
+closed and the client resyncs) rather than buffering without bound or
+slowing down publishers. Publishing never raises: a broker outage loses
+live updates, not writes.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+def chat_topic(chat_id: str) -> str:
+    return f"chat:{chat_id}"
+
+def user_topic(user_id: str) -> str:
+    return f"user:{user_id}"
+
+class Subscription:
+    """Async iterator over the events of its topics; ends if it overflows"""
+
+    def __init__(self, broker: "LocalBroker", topics: Tuple[str, ...], max_queue: int):
+        self.broker = broker
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue + 1)
+        self.max_queue = max_queue
+        self.overflowed = False
+
+    def deliver(self, event: Dict[str, Any]):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            # The spare slot holds the end marker
+            self.overflowed = True
+            self.broker.overflows += 1
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(event)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        event = await self.queue.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    def close(self):
+        self.broker.remove(self)
+
+class LocalBroker:
+    def __init__(self):
+        self.subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self.overflows = 0
+
+    def add(self, subscription: Subscription):
+        for topic in subscription.topics:
+            self.subscribers[topic].add(subscription)
+
+    def remove(self, subscription: Subscription):
+        for topic in subscription.topics:
+            subscribers = self.subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[topic]
+
+    def deliver(self, topic: str, event: Dict[str, Any]):
+        for subscription in list(self.subscribers.get(topic, ())):
+            subscription.deliver(event)
+
+    async def publish(self, topic: str, event: Dict[str, Any]):
+        self.deliver(topic, event)
+
+    async def close(self):
+        pass
+
+class RedisBroker(LocalBroker):
+    """Publishes through Redis; one pattern subscription per process delivers locally"""
+
+    def __init__(self, client, prefix: str = "matchelor:events:"):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.listener: Optional[asyncio.Task] = None
+
+    def add(self, subscription: Subscription):
+        super().add(subscription)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self._listen(), name="chat-events-listener")
+
+    async def _listen(self):
+        pubsub = self.client.pubsub()
+        await pubsub.psubscribe(self.prefix + "*")
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode()
+                self.deliver(channel[len(self.prefix):], json.loads(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Chat event listener stopped: {str(e)}")
+        finally:
+            await pubsub.close()
+
+    async def publish(self, topic: str, event: Dict[str, Any]):
+        await self.client.publish(self.prefix + topic, json.dumps(event))
+
+    async def close(self):
+        if self.listener:
+            self.listener.cancel()
+            await asyncio.gather(self.listener, return_exceptions=True)
+            self.listener = None
+
+class ChatEvents:
+    def __init__(self, broker: LocalBroker, max_queue: int = 256):
+        self.broker = broker
+        self.max_queue = max_queue
+        self.published = 0
+        self.errors = 0
+
+    @classmethod
+    def from_env(cls, redis_url: Optional[str] = None, shared: bool = False) -> "ChatEvents":
+        """
+        redis_url (Settings.chat_events_redis_url) selects Redis; otherwise
+        events stay in this process. CHAT_EVENTS_MAX_QUEUE bounds each
+        subscriber's backlog.
+        """
+        max_queue = int(os.environ.get("CHAT_EVENTS_MAX_QUEUE", 256))
+        if redis_url:
+            import redis.asyncio as redis
+            return cls(RedisBroker(redis.from_url(redis_url)), max_queue)
+
+        if shared:
+            logger.warning("Chat events only reach sockets on the same worker; set CHAT_EVENTS_REDIS_URL to share them")
+        return cls(LocalBroker(), max_queue)
+
+    def subscribe(self, *topics: str) -> Subscription:
+        subscription = Subscription(self.broker, topics, self.max_queue)
+        self.broker.add(subscription)
+        return subscription
+
+    async def publish(self, topic: str, event_type: str, **data: Any):
+        try:
+            await self.broker.publish(topic, {"type": event_type, **data})
+            self.published += 1
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Publishing {event_type} to {topic} failed: {str(e)}")
+
+    async def close(self):
+        await self.broker.close()
+
+    def stats(self) -> dict:
+        return {
+            "subscriptions": len({
+                id(subscription)
+                for subscribers in self.broker.subscribers.values()
+                for subscription in subscribers
+            }),
+            "published": self.published,
+            "overflows": self.broker.overflows,
+            "errors": self.errors
+        }
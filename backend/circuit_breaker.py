@@ -0,0 +1,124 @@
+"""
+Per-provider circuit breakers for LLM calls.
+
+A breaker is closed while calls succeed. After failure_threshold failures in
+a row (errors or timeouts) it opens: calls fail at once with
+CircuitOpenError instead of queueing behind a provider that is down. After
+reset_timeout seconds it lets one trial call through (half-open); success
+closes it, failure opens it for another reset_timeout.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge values for /metrics
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while its breaker is open"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"LLM provider {provider} is unavailable, retry after {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        provider: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, provider: str) -> "CircuitBreaker":
+        """
+        LLM_BREAKER_FAILURES and LLM_BREAKER_RESET, with a _<PROVIDER>
+        suffix to override one provider (as for the limiter settings)
+        """
+        def setting(name: str, default: str) -> str:
+            return os.environ.get(f"{name}_{provider.upper()}", os.environ.get(name, default))
+
+        return cls(
+            provider,
+            failure_threshold=int(setting("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(setting("LLM_BREAKER_RESET", "30"))
+        )
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+        return self._state
+
+    def _reject(self) -> CircuitOpenError:
+        self.rejected += 1
+        retry_after = max(self.reset_timeout - (self.clock() - self.opened_at), 1.0)
+        return CircuitOpenError(self.provider, retry_after)
+
+    def _open(self):
+        if self._state != OPEN:
+            self.trips += 1
+            logger.warning(f"Circuit breaker for {self.provider} opened after {self.failures} failures")
+        self._state = OPEN
+        self.opened_at = self.clock()
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable[Any]],
+        ignore: Tuple[Type[BaseException], ...] = ()
+    ) -> Any:
+        """Run fn unless the breaker is open; exceptions in `ignore` are not failures"""
+        state = self.state
+        trial = state == HALF_OPEN
+        if state == OPEN or (trial and self.trial_in_flight):
+            raise self._reject()
+
+        if trial:
+            self.trial_in_flight = True
+        try:
+            result = await fn()
+        except ignore:
+            raise
+        except Exception:
+            self.failures += 1
+            if trial or self.failures >= self.failure_threshold:
+                self._open()
+            raise
+        finally:
+            # Also on cancellation, so the next call can be the trial
+            if trial:
+                self.trial_in_flight = False
+
+        if self._state != CLOSED:
+            logger.info(f"Circuit breaker for {self.provider} closed")
+        self._state = CLOSED
+        self.failures = 0
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected
+        }
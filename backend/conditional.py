@@ -0,0 +1,51 @@
+"""
+Conditional GET support (ETag / If-None-Match).
+
+- every change to a chat's message history bumps the chat's historyVersion
+  (save_user_message and discard_user_message before and after a rejected
+  LLM call, save_exchange with updatedAt and messageCount too), so its
+  validator comes from the chat document and a match is answered before
+  the page query runs
+- a page of the chat list is validated by the stored fields of the chats on
+  it (plus the cursor to the next page): the page query is the only read,
+  and a match skips serializing and sending the body
+
+ETags are weak: list items also carry a relative "5 min ago" string that
+ages without the data changing.
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi import Response
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(
+        "|".join("" if part is None else str(part) for part in parts).encode(),
+        digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison against an If-None-Match header value"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = _opaque(etag)
+    return any(_opaque(candidate.strip()) == opaque for candidate in if_none_match.split(","))
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+def page_version(docs: List[dict]) -> tuple:
+    """One part per stored document, covering every field it was read with"""
+    return tuple(repr(sorted(doc.items())) for doc in docs)
+
+def chat_version(chat: dict) -> tuple:
+    updated_at: datetime = chat["updatedAt"]
+    return (chat["id"], updated_at.isoformat(), chat.get("messageCount", 0), chat.get("historyVersion", 0))
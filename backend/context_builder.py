@@ -0,0 +1,208 @@
+"""
+Token-budgeted conversation context for AI requests.
+
+The last few messages are kept on the chat document itself (recentMessages,
+capped at window_size by send_message), so the chat lookup that checks the
+chat exists also returns its history. Chats written before the window
+existed fall back to reading history newest first until the token budget is
+spent, so Mongo only returns as many messages as the prompt can hold. Turns that fall
+out of the window can be folded into a summary cached on the chat document
+(contextSummary / contextSummaryUntil), which is then sent ahead of the
+recent messages.
+
+Summaries are rolling: once a chat reaches summarize_after messages, every
+summary_batch new messages fold only the turns since contextSummaryUntil
+into the previous summary. A turn's prompt is the summary plus the window
+and each fold reads about summary_batch messages, however long the chat.
+"""
+
+import logging
+import math
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4  # role marker and separators
+MIN_MESSAGE_TOKENS = MESSAGE_OVERHEAD_TOKENS + 1
+SUMMARY_SOURCE_LIMIT = 200
+
+HISTORY_PROJECTION = {"_id": 0, "id": 1, "text": 1, "sender": 1, "timestamp": 1}
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token for English)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def message_tokens(message: Dict[str, Any]) -> int:
+    return estimate_tokens(message["text"]) + MESSAGE_OVERHEAD_TOKENS
+
+@dataclass
+class ConversationContext:
+    messages: List[Dict[str, Any]] = field(default_factory=list)  # chronological
+    summary: Optional[str] = None
+    tokens: int = 0
+    truncated: bool = False  # older turns exist that did not fit
+
+class ContextBuilder:
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        max_messages: int = 100,
+        window_size: int = 20,
+        summarize: Optional[Callable[[str, Optional[str], List[Dict[str, Any]]], Awaitable[str]]] = None,
+        summarize_after: int = 40,
+        summary_batch: int = 10
+    ):
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.window_size = window_size
+        self.summarize = summarize
+        self.summarize_after = summarize_after
+        self.summary_batch = max(1, summary_batch)
+
+    @staticmethod
+    def window_entry(message: Dict[str, Any]) -> Dict[str, Any]:
+        """The fields of a message kept in the chat's recentMessages window"""
+        return {key: message[key] for key in HISTORY_PROJECTION if key != "_id"}
+
+    def message_limit(self) -> int:
+        """Upper bound on messages the budget could hold"""
+        return max(1, min(self.max_messages, self.token_budget // MIN_MESSAGE_TOKENS))
+
+    def history_query(self, chat: Dict[str, Any]) -> dict:
+        """Messages not yet folded into the cached summary"""
+        query = {"chatId": chat["id"]}
+        if chat.get("contextSummaryUntil"):
+            query["timestamp"] = {"$gt": chat["contextSummaryUntil"]}
+        return query
+
+    def pack(self, chat: Dict[str, Any], newest_first: List[Dict[str, Any]]) -> ConversationContext:
+        """Pack already-fetched history (newest first) into the budget"""
+        context = ConversationContext()
+        budget = self.token_budget
+
+        summary = chat.get("contextSummary")
+        if summary:
+            summary_tokens = estimate_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+            if summary_tokens <= budget:
+                context.summary = summary
+                context.tokens += summary_tokens
+                budget -= summary_tokens
+
+        for message in newest_first:
+            cost = message_tokens(message)
+            if cost > budget:
+                context.truncated = True
+                break
+            context.messages.append(message)
+            context.tokens += cost
+            budget -= cost
+        else:
+            # A full read means there may be more history beyond the limit
+            context.truncated = len(newest_first) >= self.message_limit()
+
+        context.messages.reverse()
+        return context
+
+    def pack_window(self, chat: Dict[str, Any]) -> ConversationContext:
+        """Pack the chat's embedded recentMessages window (no extra reads)"""
+        window = chat["recentMessages"]
+        until = chat.get("contextSummaryUntil")
+        if until:
+            window = [message for message in window if message["timestamp"] > until]
+
+        context = self.pack(chat, list(reversed(window)))
+        # A full window means older turns exist outside it
+        context.truncated = context.truncated or (
+            len(chat["recentMessages"]) >= self.window_size and len(window) == len(chat["recentMessages"])
+        )
+        return context
+
+    async def context_for(self, db, chat: Dict[str, Any]) -> ConversationContext:
+        if "recentMessages" in chat:
+            return self.pack_window(chat)
+        return await self.build(db, chat)
+
+    async def build(self, db, chat: Dict[str, Any]) -> ConversationContext:
+        """Read only as much recent history as the budget can hold"""
+        limit = self.message_limit()
+        cursor = (
+            db.messages.find(self.history_query(chat), HISTORY_PROJECTION)
+            .sort([("timestamp", DESCENDING), ("id", DESCENDING)])
+            .limit(limit)
+            .batch_size(min(limit, 20))
+        )
+
+        newest_first = []
+        budget = self.token_budget
+        if chat.get("contextSummary"):
+            budget -= estimate_tokens(chat["contextSummary"]) + MESSAGE_OVERHEAD_TOKENS
+        async for message in cursor:
+            newest_first.append(message)
+            budget -= message_tokens(message)
+            if budget < 0:
+                break
+
+        return self.pack(chat, newest_first)
+
+    def needs_summary(self, chat: Dict[str, Any], added: int) -> bool:
+        """
+        Whether the `added` messages just saved moved the chat's
+        messageCount past summarize_after or the next summary_batch after
+        it. A failed fold is retried at the next step, which picks up
+        everything since contextSummaryUntil.
+        """
+        if not self.summarize:
+            return False
+
+        def steps(count: int) -> int:
+            if count < self.summarize_after:
+                return 0
+            return (count - self.summarize_after) // self.summary_batch + 1
+
+        count = chat.get("messageCount", 0)
+        return steps(count) > steps(count - added)
+
+    async def refresh_summary(self, db, chat: Dict[str, Any]) -> Optional[str]:
+        """
+        Fold the turns between the cached summary and the oldest message the
+        next prompt will carry into the summary stored on the chat document.
+        The write only applies if no other fold moved contextSummaryUntil
+        meanwhile, so concurrent folds (other workers) can't merge twice.
+        """
+        if not self.summarize:
+            return None
+        context = await self.context_for(db, chat)
+        if not context.messages:
+            return None
+
+        query = self.history_query(chat)
+        window_start = context.messages[0]["timestamp"]
+        query["timestamp"] = {**query.get("timestamp", {}), "$lt": window_start}
+        older = await (
+            db.messages.find(query, HISTORY_PROJECTION)
+            .sort([("timestamp", ASCENDING), ("id", ASCENDING)])
+            .limit(SUMMARY_SOURCE_LIMIT)
+            .to_list(SUMMARY_SOURCE_LIMIT)
+        )
+        if not older:
+            return None
+
+        summary = await self.summarize(chat["id"], chat.get("contextSummary"), older)
+        result = await db.chats.update_one(
+            {"id": chat["id"], "contextSummaryUntil": chat.get("contextSummaryUntil")},
+            {"$set": {
+                "contextSummary": summary,
+                "contextSummaryUntil": older[-1]["timestamp"],
+                "contextSummaryUpdatedAt": datetime.utcnow()
+            }}
+        )
+        if not result.matched_count:
+            logger.info(f"Summary of chat {chat['id']} was already advanced; dropped this fold")
+            return None
+        logger.info(f"Summarized {len(older)} older messages for chat {chat['id']}")
+        return summary
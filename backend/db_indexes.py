@@ -0,0 +1,166 @@
+"""
+Index bootstrap and query-plan verification for the chats/messages collections.
+
+ensure_indexes() runs at server startup. To check that every route query is
+index-backed, run from the backend directory:
+
+    python db_indexes.py --verify
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import OperationFailure
+
+from purge_worker import LIVE_CHATS, DELETED_CHATS
+from pagination import (
+    encode_cursor, keyset_query, keyset_sort, keyset_after_query, keyset_sort_ascending
+)
+
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    "messages": [
+        {"keys": [("chatId", ASCENDING), ("timestamp", ASCENDING), ("id", ASCENDING)],
+         "name": "chatId_timestamp_id"},
+        {"keys": [("id", ASCENDING)], "name": "id_unique", "unique": True},
+        # Equality prefix on userId keeps search inside one user's messages
+        {"keys": [("userId", ASCENDING), ("text", TEXT)], "name": "user_text_search",
+         "default_language": "english"},
+    ],
+    "chats": [
+        {"keys": [("id", ASCENDING)], "name": "id_unique", "unique": True},
+        # One contiguous range per user (deletedAt is null for live chats), so
+        # a chat list reads only that user's page however many tenants exist
+        {"keys": [("userId", ASCENDING), ("deletedAt", ASCENDING), ("updatedAt", DESCENDING),
+                  ("id", DESCENDING)],
+         "name": "userId_deletedAt_updatedAt_id"},
+        # The purge worker reads the non-null end across all users, oldest first
+        {"keys": [("deletedAt", ASCENDING)], "name": "deletedAt"},
+        {"keys": [("userId", ASCENDING), ("title", TEXT)], "name": "user_title_search",
+         "default_language": "english"},
+    ],
+}
+
+# Replaced by the userId-prefixed indexes above; dropped on startup
+SUPERSEDED_INDEXES = {
+    "messages": ["text_search"],
+    "chats": ["updatedAt_id_desc", "deletedAt_updatedAt_id", "title_search"],
+}
+
+# Placeholder value used when explaining route queries; the plan does not
+# depend on whether a matching document exists.
+PROBE_ID = "explain-probe"
+PROBE_CURSOR = encode_cursor(datetime(2000, 1, 1), PROBE_ID)
+USER_CHATS = {"userId": PROBE_ID, **LIVE_CHATS}
+
+# (route, collection, filter, sort) for every hot query in server.py
+ROUTE_QUERIES = [
+    ("GET /chats", "chats", USER_CHATS, keyset_sort("updatedAt")),
+    ("GET /chats?before=", "chats", keyset_query(USER_CHATS, "updatedAt", PROBE_CURSOR), keyset_sort("updatedAt")),
+    ("GET /chats/{id}", "chats", {"id": PROBE_ID, **LIVE_CHATS}, None),
+    ("GET /chats/{id}/messages", "messages", {"chatId": PROBE_ID}, keyset_sort("timestamp")),
+    ("GET /chats/{id}/messages?before=", "messages",
+     keyset_query({"chatId": PROBE_ID}, "timestamp", PROBE_CURSOR), keyset_sort("timestamp")),
+    ("GET /chats/{id}/messages?since= anchor", "messages", {"id": PROBE_ID, "chatId": PROBE_ID}, None),
+    ("GET /chats/{id}/messages?since=", "messages",
+     keyset_after_query({"chatId": PROBE_ID}, "timestamp", datetime(2000, 1, 1), PROBE_ID),
+     keyset_sort_ascending("timestamp")),
+    ("POST /chats/{id}/messages history", "messages", {"chatId": PROBE_ID}, keyset_sort("timestamp")),
+    ("POST /chats/{id}/messages history after summary", "messages",
+     {"chatId": PROBE_ID, "timestamp": {"$gt": datetime(2000, 1, 1)}}, keyset_sort("timestamp")),
+    ("purge pending chats", "chats", DELETED_CHATS, [("deletedAt", ASCENDING)]),
+    ("purge messages", "messages", {"chatId": PROBE_ID}, None),
+    ("GET /search messages", "messages", {"userId": PROBE_ID, "$text": {"$search": PROBE_ID}}, None),
+    ("GET /search chats", "chats", {"userId": PROBE_ID, "$text": {"$search": PROBE_ID}}, None),
+    ("GET /export chats", "chats", USER_CHATS, keyset_sort("updatedAt")),
+]
+
+class QueryPlanError(Exception):
+    """Raised when a route query is not served by an index"""
+
+async def ensure_indexes(db):
+    """Create all indexes; create_index is a no-op when the index exists"""
+    for collection, names in SUPERSEDED_INDEXES.items():
+        # A collection holds one text index, so the old ones must go first
+        existing = await db[collection].index_information()
+        for name in names:
+            if name not in existing:
+                continue
+            try:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped superseded index {collection}.{name}")
+            except OperationFailure as e:
+                logger.warning(f"Could not drop index {collection}.{name}: {str(e)}")
+    for collection, specs in INDEXES.items():
+        for spec in specs:
+            options = {k: v for k, v in spec.items() if k != "keys"}
+            await db[collection].create_index(spec["keys"], **options)
+    logger.info("Database indexes ensured")
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def verify_query_plans(db):
+    """
+    Explain each route query and raise QueryPlanError if any winning plan
+    contains a COLLSCAN. Returns {route: [stages]} for reporting.
+    """
+    plans = {}
+    failures = []
+    for route, collection, query, sort in ROUTE_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {})))
+        plans[route] = stages
+        if "COLLSCAN" in stages:
+            failures.append(route)
+
+    if failures:
+        raise QueryPlanError(f"COLLSCAN in query plan for: {', '.join(failures)}")
+    return plans
+
+async def main(verify: bool):
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        await ensure_indexes(db)
+        if verify:
+            plans = await verify_query_plans(db)
+            for route, stages in plans.items():
+                print(f"{route}: {' <- '.join(stages)}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Ensure indexes and verify query plans")
+    parser.add_argument("--verify", action="store_true", help="fail if any route query is a COLLSCAN")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.verify))
+    except QueryPlanError as e:
+        logger.error(str(e))
+        sys.exit(1)
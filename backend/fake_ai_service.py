@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+class FakeAIService:
+    """
+    Drop-in stand-in for AIService that needs no LLM key. Streams a canned
+    reply token by token with configurable latency. Enabled in server.py with
+    AI_BACKEND=fake; also used by tests and benchmarks.
+    """
+
+    def __init__(
+        self,
+        first_token_delay: float = 0.05,
+        token_delay: float = 0.01,
+        reply: str = None
+    ):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.reply = reply
+        logger.info("FakeAIService initialized")
+
+    def _reply_for(self, message: str) -> str:
+        if self.reply is not None:
+            return self.reply
+        return f"This is a simulated Matchelor answer to: {message}"
+
+    async def stream_chat_with_ai(
+        self,
+        message: str,
+        chat_history: List[Dict[str, Any]] = None,
+        session_id: str = None,
+        model: str = "gpt-4o-mini",
+        context_summary: str = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[str]:
+        await asyncio.sleep(self.first_token_delay)
+        words = self._reply_for(message).split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield word if i == 0 else f" {word}"
+
+    async def chat_with_ai(
+        self,
+        message: str,
+        chat_history: List[Dict[str, Any]] = None,
+        session_id: str = None,
+        model: str = "gpt-4o-mini",
+        context_summary: str = None,
+        use_cache: bool = True
+    ) -> str:
+        chunks = []
+        async for chunk in self.stream_chat_with_ai(message, chat_history, session_id, model, context_summary):
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    async def summarize_conversation(self, chat_id: str, previous_summary: str, turns: List[Dict[str, Any]]) -> str:
+        await asyncio.sleep(self.first_token_delay)
+        new_points = "; ".join(turn["text"][:40] for turn in turns if turn["sender"] == "user")
+        summary = f"{previous_summary}; {new_points}" if previous_summary else new_points
+        # The real summary prompt caps replies at 150 words; keep the newest points
+        return " ".join(summary.split()[-150:])
+
+    async def warm_up(self):
+        pass
+
+    async def generate_chat_title(self, first_message: str) -> str:
+        await asyncio.sleep(self.first_token_delay)
+        return " ".join(first_message.split()[:4]) or "New Chat"
+
+    async def get_chat_title_suggestion(self, first_message: str) -> str:
+        return await self.generate_chat_title(first_message)
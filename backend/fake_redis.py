@@ -0,0 +1,28 @@
+import time
+from typing import Dict, Optional, Tuple
+
+class FakeRedis:
+    """
+    In-memory stand-in for the subset of redis.asyncio.Redis the chat cache
+    uses (get, set with ex, delete), for local runs and benchmarks.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+
+    async def get(self, name: str) -> Optional[bytes]:
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[name]
+            return None
+        return value
+
+    async def set(self, name: str, value: bytes, ex: Optional[int] = None) -> bool:
+        self._data[name] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._data.pop(name, None) is not None for name in names)
@@ -0,0 +1,199 @@
+"""
+Outbound LLM call limiting.
+
+Each provider gets a concurrency semaphore, a token-bucket rate limiter and a
+bounded wait queue. When the queue is full, or a slot or token would not be
+available within the queue timeout, LLMSaturatedError is raised immediately
+so the API can answer 429 with Retry-After instead of hanging.
+
+Identical in-flight prompts are coalesced (singleflight): later callers
+await the first caller's upstream request. The upstream request is cancelled
+only when every waiter has gone away.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROVIDERS = ("openai", "anthropic", "gemini")
+
+class LLMSaturatedError(Exception):
+    """Raised when a provider's limiter cannot take more work"""
+
+    def __init__(self, provider: str, retry_after: float):
+        super().__init__(f"LLM provider {provider} is saturated, retry after {retry_after:.1f}s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated_at = clock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Take one token, returning how long to wait before using it, or None
+        (without taking it) if that wait would exceed max_wait.
+        """
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def refund(self):
+        """Return a reserved token that was never used"""
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class ProviderLimiter:
+    def __init__(
+        self,
+        provider: str,
+        max_concurrency: int = 8,
+        rate: float = 5.0,
+        burst: int = 10,
+        max_queue: int = 32,
+        queue_timeout: float = 2.0
+    ):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.queued = 0
+        self.rejected = 0
+        self.completed = 0
+
+    def _saturated(self, retry_after: float) -> LLMSaturatedError:
+        self.rejected += 1
+        return LLMSaturatedError(self.provider, max(retry_after, 1.0))
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        if self.queued >= self.max_queue:
+            raise self._saturated(self.queue_timeout)
+
+        self.queued += 1
+        try:
+            wait = self.bucket.reserve(self.queue_timeout)
+            if wait is None:
+                raise self._saturated(1 / self.bucket.rate)
+            try:
+                if wait:
+                    await asyncio.sleep(wait)
+                if self.semaphore.locked():
+                    await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout - wait)
+                else:
+                    # A free slot is taken without yielding, so only callers
+                    # that really wait count against max_queue
+                    await self.semaphore.acquire()
+            except asyncio.TimeoutError:
+                self.bucket.refund()
+                raise self._saturated(self.queue_timeout)
+            except asyncio.CancelledError:
+                self.bucket.refund()
+                raise
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        try:
+            return await fn()
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "rejected": self.rejected,
+            "completed": self.completed
+        }
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class LLMLimiter:
+    def __init__(self, limiters: Dict[str, ProviderLimiter]):
+        self.limiters = limiters
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls) -> "LLMLimiter":
+        """
+        Build limiters from LLM_MAX_CONCURRENCY, LLM_RATE_PER_SEC, LLM_BURST,
+        LLM_MAX_QUEUE and LLM_QUEUE_TIMEOUT; a _<PROVIDER> suffix overrides
+        one provider (e.g. LLM_MAX_CONCURRENCY_ANTHROPIC=4).
+        """
+        def setting(name: str, provider: str, default: str) -> str:
+            return os.environ.get(f"{name}_{provider.upper()}", os.environ.get(name, default))
+
+        return cls({
+            provider: ProviderLimiter(
+                provider,
+                max_concurrency=int(setting("LLM_MAX_CONCURRENCY", provider, "8")),
+                rate=float(setting("LLM_RATE_PER_SEC", provider, "5")),
+                burst=int(setting("LLM_BURST", provider, "10")),
+                max_queue=int(setting("LLM_MAX_QUEUE", provider, "32")),
+                queue_timeout=float(setting("LLM_QUEUE_TIMEOUT", provider, "2"))
+            )
+            for provider in PROVIDERS
+        })
+
+    async def call(
+        self,
+        provider: str,
+        fn: Callable[[], Awaitable[Any]],
+        coalesce_key: Optional[Hashable] = None
+    ) -> Any:
+        """Run fn under the provider's limits, sharing it with identical in-flight calls"""
+        limiter = self.limiters[provider]
+        if coalesce_key is None:
+            return await limiter.run(fn)
+
+        flight = self._flights.get(coalesce_key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(limiter.run(fn)))
+            self._flights[coalesce_key] = flight
+            flight.task.add_done_callback(lambda _: self._land(coalesce_key, flight))
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Unlist it first: a caller arriving before the task has
+                # finished cancelling must start a new flight, not join this one
+                self._land(coalesce_key, flight)
+                flight.task.cancel()
+
+    def _land(self, coalesce_key: Hashable, flight: _Flight):
+        if self._flights.get(coalesce_key) is flight:
+            del self._flights[coalesce_key]
+
+    def stats(self) -> dict:
+        return {
+            "coalesced": self.coalesced,
+            "providers": {name: limiter.stats() for name, limiter in self.limiters.items()}
+        }
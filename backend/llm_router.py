@@ -0,0 +1,234 @@
+"""
+Provider routing for LLM calls: health tracking, failover and hedging.
+
+Each provider keeps an EWMA of its call latency and error rate. A request
+for a model goes to that model first and, when LLM_FALLBACK_MODELS names a
+backup, fails over to the backup if the first call raises. A provider whose
+error rate is over the threshold is tried second instead of first, except
+for one probe call every probe_interval seconds so it can recover.
+
+With hedging on, the backup is also started when the first call has not
+answered after the primary provider's p95 latency, and whichever succeeds
+first wins; the other call is cancelled. Hedging trades extra provider calls
+(bounded by the 5% of requests slower than p95) for a shorter tail.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from llm_limiter import LLMSaturatedError
+from circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+class ProviderHealth:
+    def __init__(
+        self,
+        provider: str,
+        alpha: float = 0.2,
+        error_threshold: float = 0.5,
+        probe_interval: float = 30.0,
+        window: int = 200,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.provider = provider
+        self.alpha = alpha
+        self.error_threshold = error_threshold
+        self.probe_interval = probe_interval
+        self.clock = clock
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.latencies = deque(maxlen=window)
+        self.last_probe = 0.0
+        self.calls = 0
+        self.errors = 0
+
+    def record_success(self, seconds: float):
+        self.calls += 1
+        self.latencies.append(seconds)
+        self.latency = seconds if self.latency is None else self.latency + self.alpha * (seconds - self.latency)
+        self.error_rate -= self.alpha * self.error_rate
+
+    def record_failure(self):
+        self.calls += 1
+        self.errors += 1
+        self.error_rate += self.alpha * (1.0 - self.error_rate)
+
+    @property
+    def healthy(self) -> bool:
+        return self.error_rate < self.error_threshold
+
+    def should_lead(self) -> bool:
+        """Whether to try this provider first; unhealthy ones get a periodic probe"""
+        if self.healthy:
+            return True
+        now = self.clock()
+        if now - self.last_probe >= self.probe_interval:
+            self.last_probe = now
+            return True
+        return False
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def stats(self) -> dict:
+        return {
+            "latency_ewma": self.latency or 0.0,
+            "error_rate": self.error_rate,
+            "healthy": self.healthy,
+            "calls": self.calls,
+            "errors": self.errors
+        }
+
+class LLMRouter:
+    def __init__(
+        self,
+        fallbacks: Dict[str, str],
+        resolve_provider: Callable[[str], str],
+        hedge: bool = False,
+        hedge_delay: float = 2.0,
+        min_hedge_delay: float = 0.25,
+        hedge_min_samples: int = 20,
+        health_options: Optional[dict] = None
+    ):
+        self.fallbacks = fallbacks
+        self.resolve_provider = resolve_provider
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.health_options = health_options or {}
+        self.health: Dict[str, ProviderHealth] = {}
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, resolve_provider: Callable[[str], str]) -> "LLMRouter":
+        """
+        LLM_FALLBACK_MODELS maps models to backups, e.g.
+        "gpt-4o-mini=claude-3-5-haiku-20241022,*=gpt-4o-mini" ("*" is any
+        other model). LLM_HEDGE=1 turns hedging on; LLM_HEDGE_DELAY is the
+        delay used until LLM_HEDGE_MIN_SAMPLES latencies are known, and
+        LLM_HEDGE_MIN_DELAY the floor under the measured p95.
+        LLM_UNHEALTHY_ERROR_RATE and LLM_PROBE_INTERVAL tune the health check.
+        """
+        env = os.environ
+        fallbacks = {}
+        for pair in filter(None, env.get('LLM_FALLBACK_MODELS', '').split(',')):
+            model, _, backup = pair.partition('=')
+            if model.strip() and backup.strip():
+                fallbacks[model.strip()] = backup.strip()
+        return cls(
+            fallbacks,
+            resolve_provider,
+            hedge=env.get('LLM_HEDGE') == '1',
+            hedge_delay=float(env.get('LLM_HEDGE_DELAY', 2.0)),
+            min_hedge_delay=float(env.get('LLM_HEDGE_MIN_DELAY', 0.25)),
+            hedge_min_samples=int(env.get('LLM_HEDGE_MIN_SAMPLES', 20)),
+            health_options={
+                "error_threshold": float(env.get('LLM_UNHEALTHY_ERROR_RATE', 0.5)),
+                "probe_interval": float(env.get('LLM_PROBE_INTERVAL', 30))
+            }
+        )
+
+    def provider_health(self, provider: str) -> ProviderHealth:
+        health = self.health.get(provider)
+        if health is None:
+            health = self.health[provider] = ProviderHealth(provider, **self.health_options)
+        return health
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        backup = self.fallbacks.get(model, self.fallbacks.get("*"))
+        return backup if backup and backup != model else None
+
+    def plan(self, model: str) -> List[str]:
+        """Models to try in order: the requested one and its backup, healthiest first"""
+        backup = self.fallback_for(model)
+        if backup is None:
+            return [model]
+        primary = self.provider_health(self.resolve_provider(model))
+        secondary = self.provider_health(self.resolve_provider(backup))
+        if not primary.should_lead() and secondary.healthy:
+            return [backup, model]
+        return [model, backup]
+
+    async def call(self, model: str, send: Callable[[str], Awaitable[Any]]) -> Any:
+        """Run send(model) under the routing policy and return the first successful result"""
+        models = self.plan(model)
+        if self.hedge and len(models) > 1:
+            return await self._hedged(models, send)
+
+        for i, candidate in enumerate(models):
+            try:
+                return await self._timed(candidate, send)
+            except Exception as e:
+                if i == len(models) - 1:
+                    raise
+                self.failovers += 1
+                logger.warning(f"LLM call to {candidate} failed ({str(e)}), failing over to {models[i + 1]}")
+
+    async def _timed(self, model: str, send: Callable[[str], Awaitable[Any]]) -> Any:
+        health = self.provider_health(self.resolve_provider(model))
+        started = time.perf_counter()
+        try:
+            result = await send(model)
+        except (LLMSaturatedError, CircuitOpenError):
+            # Rejected locally before reaching the provider; the breaker
+            # already accounts for the failures that opened it
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        health.record_success(time.perf_counter() - started)
+        return result
+
+    def _hedge_after(self, model: str) -> float:
+        p95 = self.provider_health(self.resolve_provider(model)).p95(self.hedge_min_samples)
+        return self.hedge_delay if p95 is None else max(p95, self.min_hedge_delay)
+
+    async def _hedged(self, models: List[str], send: Callable[[str], Awaitable[Any]]) -> Any:
+        primary, backup = models
+        tasks = {asyncio.ensure_future(self._timed(primary, send)): primary}
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_after(primary))
+            if not done or next(iter(done)).exception() is not None:
+                if done:
+                    error = next(iter(done)).exception()
+                    tasks.clear()
+                    self.failovers += 1
+                else:
+                    self.hedges += 1
+                tasks[asyncio.ensure_future(self._timed(backup, send))] = backup
+
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    winner = tasks.pop(task)
+                    if task.exception() is None:
+                        if winner == backup and tasks:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+                # A loser that already failed must not log "exception never retrieved"
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def stats(self) -> dict:
+        return {
+            "failovers": self.failovers,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "providers": {name: health.stats() for name, health in self.health.items()}
+        }
@@ -0,0 +1,176 @@
+"""
+Request latency instrumentation.
+
+TimingMiddleware opens a per-request timing record. Awaitables wrapped in
+timed("db", ...) / timed("llm", ...), and blocks under span("serialize"),
+add their durations to it. When the response starts, the breakdown is sent
+as a Server-Timing header. When it finishes, it is recorded in per-route
+Prometheus histograms that render_metrics() serves at /metrics.
+
+Everything is in-process and lock-free (single event loop); an observation
+is a bisect and two additions, cheap enough to leave on in production.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._series: Dict[Labels, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            # per-bucket counts (+Inf last), sum
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(labels)} {total}"
+            yield f"{self.name}_count{_format_labels(labels)} {cumulative}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels)
+    return "{" + inner + "}"
+
+REQUEST_SECONDS = Histogram(
+    "matchelor_request_duration_seconds",
+    "HTTP request latency by route, method and status"
+)
+COMPONENT_SECONDS = Histogram(
+    "matchelor_component_duration_seconds",
+    "Time spent per request in db, llm and serialize, by route"
+)
+
+# Gauge/counter collectors: callables returning (name, type, help, labels, value)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+def register_collector(collector: Callable[[], Iterable[Sample]]):
+    _collectors.append(collector)
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+def _record(component: str, seconds: float):
+    timings = _timings.get()
+    if timings is None:
+        # Outside a request (background workers)
+        COMPONENT_SECONDS.observe(seconds, route="background", component=component)
+    else:
+        timings[component] = timings.get(component, 0.0) + seconds
+
+async def timed(component: str, awaitable: Awaitable[T]) -> T:
+    """Await and charge the elapsed time to `component` for the current request"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        _record(component, time.perf_counter() - start)
+
+async def timed_iter(component: str, iterator: AsyncIterator[T]) -> AsyncIterator[T]:
+    """Iterate, charging only the time spent waiting for each item"""
+    iterator = iterator.__aiter__()
+    while True:
+        start = time.perf_counter()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            _record(component, time.perf_counter() - start)
+        yield item
+
+@contextmanager
+def span(component: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(component, time.perf_counter() - start)
+
+def server_timing(timings: Dict[str, float], total: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+class TimingMiddleware:
+    """Pure ASGI middleware so streamed responses are not buffered"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = server_timing(timings, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", header.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _timings.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, route=route_path, method=scope["method"], status=str(status))
+            for component, seconds in timings.items():
+                COMPONENT_SECONDS.observe(seconds, route=route_path, component=component)
+
+def render_metrics(*collectors: Callable[[], Iterable[Sample]]) -> str:
+    """Render the histograms, registered collectors and the given (per-app) collectors"""
+    lines = []
+    lines.extend(REQUEST_SECONDS.render())
+    lines.extend(COMPONENT_SECONDS.render())
+
+    # Samples of one metric must be contiguous in the exposition format
+    families: Dict[str, Tuple[str, str, List[str]]] = {}
+    for collector in [*_collectors, *collectors]:
+        for name, metric_type, help_text, labels, value in collector():
+            family = families.setdefault(name, (metric_type, help_text, []))
+            family[2].append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+
+    for name, (metric_type, help_text, samples) in families.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,120 @@
+"""
+Data migrations for the Matchelor backend.
+
+Run from the backend directory:
+
+    python migrations.py
+"""
+
+import asyncio
+import os
+import logging
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, DESCENDING
+
+from models import build_preview
+from context_builder import HISTORY_PROJECTION
+from auth import ANONYMOUS_USER_ID
+
+logger = logging.getLogger(__name__)
+
+async def backfill_last_message_preview(db, batch_size: int = 500) -> int:
+    """
+    Populate lastMessagePreview/lastMessageAt on chats created before the
+    preview was denormalized. Uses a single aggregation over messages.
+    """
+    pipeline = [
+        {"$sort": {"chatId": 1, "timestamp": -1}},
+        {"$group": {
+            "_id": "$chatId",
+            "text": {"$first": "$text"},
+            "timestamp": {"$first": "$timestamp"}
+        }}
+    ]
+
+    updated = 0
+    operations = []
+    async for latest in db.messages.aggregate(pipeline, allowDiskUse=True):
+        operations.append(UpdateOne(
+            {"id": latest["_id"], "lastMessageAt": None},
+            {"$set": {
+                "lastMessagePreview": build_preview(latest["text"]),
+                "lastMessageAt": latest["timestamp"]
+            }}
+        ))
+        if len(operations) >= batch_size:
+            result = await db.chats.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations = []
+
+    if operations:
+        result = await db.chats.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+
+    logger.info(f"Backfilled message previews on {updated} chats")
+    return updated
+
+async def backfill_recent_messages(db, window_size: int = 20) -> int:
+    """
+    Populate the recentMessages window that send_message reads its context
+    from, for chats created before the window was kept on the chat.
+    """
+    updated = 0
+    async for chat in db.chats.find({"recentMessages": {"$exists": False}}, {"id": 1}):
+        messages = await (
+            db.messages.find({"chatId": chat["id"]}, HISTORY_PROJECTION)
+            .sort([("timestamp", DESCENDING), ("id", DESCENDING)])
+            .limit(window_size)
+            .to_list(window_size)
+        )
+        messages.reverse()
+        result = await db.chats.update_one(
+            {"_id": chat["_id"], "recentMessages": {"$exists": False}},
+            {"$set": {"recentMessages": messages}}
+        )
+        updated += result.modified_count
+
+    logger.info(f"Backfilled recent message windows on {updated} chats")
+    return updated
+
+async def backfill_user_id(db) -> int:
+    """
+    Assign chats and messages created before multi-tenancy to
+    ANONYMOUS_USER_ID. Required once before deploying per-user scoping:
+    queries filter on userId, so unassigned documents would disappear.
+    """
+    missing = {"userId": {"$exists": False}}
+    chats = await db.chats.update_many(missing, {"$set": {"userId": ANONYMOUS_USER_ID}})
+    messages = await db.messages.update_many(missing, {"$set": {"userId": ANONYMOUS_USER_ID}})
+    logger.info(f"Assigned {chats.modified_count} chats and {messages.modified_count} messages to {ANONYMOUS_USER_ID}")
+    return chats.modified_count
+
+MIGRATIONS = [
+    backfill_last_message_preview,
+    backfill_recent_messages,
+    backfill_user_id,
+]
+
+async def run_migrations(db):
+    """Run every migration in order; each one is idempotent"""
+    for migration in MIGRATIONS:
+        logger.info(f"Running migration {migration.__name__}")
+        await migration(db)
+
+async def main():
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        await run_migrations(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(main())
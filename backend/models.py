@@ -1,11 +1,29 @@
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 
+PREVIEW_LENGTH = 100
+EMPTY_PREVIEW = "Start a conversation..."
+
+def build_preview(text: str) -> str:
+    """Truncate message text for the sidebar preview"""
+    preview = text[:PREVIEW_LENGTH]
+    if len(preview) == PREVIEW_LENGTH:
+        preview += "..."
+    return preview
+
+def reply_timestamp(question_at: datetime) -> datetime:
+    """
+    Now, but at least 1ms after the question: Mongo keeps milliseconds, so a
+    reply from the response cache could otherwise tie with it and sort first
+    """
+    return max(datetime.utcnow(), question_at + timedelta(milliseconds=1))
+
 class MessageModel(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     chatId: str
+    userId: Optional[str] = None  # copied from the chat so search can filter by owner
     text: str
     sender: str  # 'user' or 'ai'
     timestamp: datetime = Field(default_factory=datetime.utcnow)
@@ -13,10 +31,14 @@ class MessageModel(BaseModel):
 
 class ChatModel(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    userId: Optional[str] = None
     title: str
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
     messageCount: int = Field(default=0)
+    lastMessagePreview: Optional[str] = None
+    lastMessageAt: Optional[datetime] = None
+    deletedAt: Optional[datetime] = None  # set on soft delete, until the purge removes the chat
 
 class ChatCreateRequest(BaseModel):
     title: Optional[str] = Field(default="New Chat")
@@ -24,16 +46,23 @@ class ChatCreateRequest(BaseModel):
 class ChatUpdateRequest(BaseModel):
     title: str
 
+MAX_BULK_DELETE = 1000
+
+class ChatBulkDeleteRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_DELETE)
+
 class MessageCreateRequest(BaseModel):
     message: str
     sessionId: Optional[str] = None
     model: Optional[str] = Field(default="gpt-4o-mini")
+    bypassCache: bool = False  # skip the AI response cache for this message
 
 class ChatResponse(BaseModel):
     id: str
     title: str
     preview: str
     timestamp: str
+    timestampMs: Optional[int] = None
     messageCount: int
 
 class MessageResponse(BaseModel):
@@ -41,8 +70,19 @@ class MessageResponse(BaseModel):
     text: str
     sender: str
     timestamp: str
+    timestampMs: Optional[int] = None
     chatId: str
 
 class AIResponse(BaseModel):
     userMessage: MessageResponse
-    aiResponse: MessageResponse
\ No newline at end of file
+    aiResponse: MessageResponse
+
+class SearchHit(BaseModel):
+    chatId: str
+    chatTitle: str
+    messageId: Optional[str] = None  # None when the chat title matched
+    sender: Optional[str] = None
+    snippet: str
+    highlights: List[List[int]]  # [start, end) offsets into snippet
+    score: float
+    timestampMs: Optional[int] = None
@@ -0,0 +1,83 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is "<isoformat timestamp>,<id>" taken from the last item of a page.
+Pages are read newest first on (timestamp, id), so the next page is every
+item strictly before the cursor in that ordering. Deltas (?since=) go the
+other way: every item strictly after an anchor item, oldest first.
+"""
+
+from datetime import datetime
+from typing import Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+DEFAULT_CHAT_PAGE_SIZE = 100
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class InvalidCursorError(ValueError):
+    """Raised when a ?before= cursor cannot be parsed"""
+
+def encode_cursor(timestamp: datetime, item_id: str) -> str:
+    return f"{timestamp.isoformat()},{item_id}"
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        timestamp, item_id = cursor.split(",", 1)
+        return datetime.fromisoformat(timestamp), item_id
+    except ValueError:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+
+def keyset_query(query: dict, field: str, before: Optional[str]) -> dict:
+    """Restrict query to items strictly older than the cursor on (field, id)"""
+    if not before:
+        return query
+    timestamp, item_id = decode_cursor(before)
+    return {
+        **query,
+        "$or": [
+            {field: {"$lt": timestamp}},
+            {field: timestamp, "id": {"$lt": item_id}}
+        ]
+    }
+
+def keyset_after_query(query: dict, field: str, timestamp: datetime, item_id: str) -> dict:
+    """Restrict query to items strictly newer than (timestamp, item_id)"""
+    return {
+        **query,
+        "$or": [
+            {field: {"$gt": timestamp}},
+            {field: timestamp, "id": {"$gt": item_id}}
+        ]
+    }
+
+def keyset_sort(field: str):
+    return [(field, DESCENDING), ("id", DESCENDING)]
+
+def keyset_sort_ascending(field: str):
+    return [(field, ASCENDING), ("id", ASCENDING)]
+
+async def fetch_page(collection, query: dict, field: str, before: Optional[str], limit: int, projection=None):
+    """
+    Fetch one page newest first. Returns (items, next_cursor) where
+    next_cursor is None on the last page.
+    """
+    cursor = collection.find(keyset_query(query, field, before), projection)
+    items = await cursor.sort(keyset_sort(field)).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1][field], items[-1]["id"])
+    return items, next_cursor
+
+async def fetch_since(collection, query: dict, field: str, anchor: dict, limit: int, projection=None):
+    """
+    Fetch up to `limit` items after `anchor`, oldest first. A full page means
+    more may follow; ask again with the last item as the anchor.
+    """
+    cursor = collection.find(keyset_after_query(query, field, anchor[field], anchor["id"]), projection)
+    return await cursor.sort(keyset_sort_ascending(field)).limit(limit).to_list(limit)
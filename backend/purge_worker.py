@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Live chats have no deletedAt (or null); every list query filters on this
+LIVE_CHATS = {"deletedAt": None}
+DELETED_CHATS = {"deletedAt": {"$ne": None}}
+
+class ChatPurgeWorker:
+    """
+    Background task that removes soft-deleted chats. Deleting a chat only
+    sets its deletedAt; the worker then deletes the chat's messages in
+    batches of `batch_size`, pausing between batches so a long history
+    never ties up the database or the event loop, and finally the chat
+    document itself. Chats left over from a restart are picked up by the
+    sweep that runs on start and every `sweep_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        db,
+        batch_size: int = 500,
+        pause: float = 0.01,
+        sweep_interval: float = 300.0
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause = pause
+        self.sweep_interval = sweep_interval
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.purged_chats = 0
+        self.purged_messages = 0
+        self.failed = 0
+
+    def start(self):
+        if self.task:
+            return
+        self.wakeup.set()  # sweep anything left by a previous process
+        self.task = asyncio.create_task(self._run(), name="chat-purge-worker")
+        logger.info("Chat purge worker started")
+
+    async def stop(self):
+        """Cancel the worker; an interrupted purge resumes on the next start"""
+        if not self.task:
+            return
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+
+    def wake(self):
+        """Ask for a purge pass soon, e.g. right after a delete"""
+        self.wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "chats": self.purged_chats,
+            "messages": self.purged_messages,
+            "failed": self.failed
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.purge_deleted()
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Chat purge pass failed: {str(e)}")
+
+    async def purge_deleted(self) -> int:
+        """Purge every soft-deleted chat, oldest deletion first; returns the chat count"""
+        purged = 0
+        while True:
+            chats = await (
+                self.db.chats.find(DELETED_CHATS, {"_id": 0, "id": 1})
+                .sort("deletedAt", 1)
+                .limit(self.batch_size)
+                .to_list(self.batch_size)
+            )
+            if not chats:
+                return purged
+            for chat in chats:
+                await self.purge_chat(chat["id"])
+                purged += 1
+
+    async def purge_chat(self, chat_id: str) -> int:
+        """Delete a soft-deleted chat's messages batch by batch, then the chat"""
+        removed = 0
+        while True:
+            batch = await (
+                self.db.messages.find({"chatId": chat_id}, {"_id": 1})
+                .limit(self.batch_size)
+                .to_list(self.batch_size)
+            )
+            if not batch:
+                break
+            result = await self.db.messages.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            removed += result.deleted_count
+            self.purged_messages += result.deleted_count
+            await asyncio.sleep(self.pause)
+
+        result = await self.db.chats.delete_one({"id": chat_id, **DELETED_CHATS})
+        self.purged_chats += result.deleted_count
+        logger.info(f"Purged chat {chat_id} and {removed} messages")
+        return removed
@@ -0,0 +1,140 @@
+"""
+Response cache for standalone questions sent to the LLM.
+
+Entries are keyed on the normalized prompt plus model and system message.
+Lookups try an exact hash first; with a similarity threshold set, they fall
+back to cosine similarity over character n-grams, using an inverted n-gram
+index so only entries sharing n-grams with the prompt are scored.
+"""
+
+import hashlib
+import math
+import re
+from collections import Counter
+from typing import Dict, Optional, Set, Tuple
+
+from ttl_cache import TTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(text: str) -> str:
+    text = _PUNCTUATION.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+def ngram_vector(text: str, n: int) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+def cosine(a: Counter, a_norm: float, b: Counter, b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(count * b.get(gram, 0) for gram, count in a.items()) / (a_norm * b_norm)
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl: float = 3600,
+        similarity_threshold: Optional[float] = None,
+        ngram_size: int = 3
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ngram_size = ngram_size
+        self.entries = TTLCache(max_size=max_size, ttl=ttl, on_evict=self._unindex)
+        # partition -> n-gram -> entry keys, for similarity candidates
+        self._ngram_index: Dict[Tuple[str, str], Dict[str, Set[str]]] = {}
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _partition(self, model: str, system_message: str) -> Tuple[str, str]:
+        return model, hashlib.sha256(system_message.encode()).hexdigest()[:16]
+
+    def _key(self, normalized: str, partition: Tuple[str, str]) -> str:
+        return hashlib.sha256(f"{partition[0]}\0{partition[1]}\0{normalized}".encode()).hexdigest()
+
+    def get(self, prompt: str, model: str, system_message: str) -> Optional[str]:
+        normalized = normalize_prompt(prompt)
+        partition = self._partition(model, system_message)
+
+        entry = self.entries.get(self._key(normalized, partition), record=False)
+        if entry is not None:
+            self.exact_hits += 1
+            return entry["response"]
+
+        if self.similarity_threshold is not None:
+            response = self._similar(normalized, partition)
+            if response is not None:
+                self.similar_hits += 1
+                return response
+
+        self.misses += 1
+        return None
+
+    def set(self, prompt: str, model: str, system_message: str, response: str):
+        normalized = normalize_prompt(prompt)
+        partition = self._partition(model, system_message)
+        key = self._key(normalized, partition)
+
+        vector = ngram_vector(normalized, self.ngram_size)
+        self.entries.set(key, {
+            "response": response,
+            "partition": partition,
+            "vector": vector,
+            "norm": math.sqrt(sum(c * c for c in vector.values()))
+        })
+        if self.similarity_threshold is not None:
+            index = self._ngram_index.setdefault(partition, {})
+            for gram in vector:
+                index.setdefault(gram, set()).add(key)
+
+    def _similar(self, normalized: str, partition: Tuple[str, str]) -> Optional[str]:
+        index = self._ngram_index.get(partition)
+        if not index:
+            return None
+
+        vector = ngram_vector(normalized, self.ngram_size)
+        norm = math.sqrt(sum(c * c for c in vector.values()))
+        candidates = set()
+        for gram in vector:
+            candidates.update(index.get(gram, ()))
+
+        best_score, best_key = 0.0, None
+        for key in candidates:
+            entry = self.entries.peek(key)
+            if entry is None:
+                continue
+            score = cosine(vector, norm, entry["vector"], entry["norm"])
+            if score > best_score:
+                best_score, best_key = score, key
+
+        if best_key is not None and best_score >= self.similarity_threshold:
+            # get() also refreshes the entry's LRU position
+            return self.entries.get(best_key, record=False)["response"]
+        return None
+
+    def _unindex(self, key: str, entry: dict):
+        index = self._ngram_index.get(entry["partition"])
+        if not index:
+            return
+        for gram in entry["vector"]:
+            keys = index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[gram]
+
+    def stats(self) -> dict:
+        entry_stats = self.entries.stats()
+        return {
+            "size": entry_stats["size"],
+            "hits": self.exact_hits + self.similar_hits,
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "evictions": entry_stats["evictions"],
+            "expirations": entry_stats["expirations"]
+        }
@@ -0,0 +1,274 @@
+"""
+Full-text search over message text and chat titles.
+
+MongoTextSearch queries the text indexes declared in db_indexes.py
+(messages.text, chats.title, each prefixed by userId so a search only reads
+one user's entries) and ranks by textScore. InMemorySearchIndex is
+a pure-Python BM25 inverted index with the same interface, used with
+SEARCH_BACKEND=memory (tests, mongomock). The server reports writes to the
+backend; Mongo keeps its own indexes current, so there they are no-ops.
+
+Hits carry a plain-text snippet plus [start, end) highlight ranges within
+it, so clients can mark matches without rendering server HTML.
+"""
+
+import heapq
+import math
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from serializers import epoch_ms
+from purge_worker import LIVE_CHATS
+
+SNIPPET_LENGTH = 160
+MAX_SEARCH_OFFSET = 1000
+
+# Mongo's english text index drops stop words too; keep the two close
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have how i in is it its of on "
+    "or so that the this to was we what when where which who will with you your".split()
+)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_SUFFIXES = ("ing", "ies", "ed", "es", "ly", "s", "e", "y")
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so "house", "houses" and "housing" share a term"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def tokenize(text: str) -> List[str]:
+    return [stem(word) for word in _WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+def query_terms(query: str) -> List[str]:
+    """Distinct search terms, ignoring Mongo's -negated words"""
+    positive = " ".join(word for word in query.split() if not word.startswith("-"))
+    return list(dict.fromkeys(tokenize(positive)))
+
+def highlight(text: str, terms: Iterable[str], length: int = SNIPPET_LENGTH) -> Tuple[str, List[List[int]]]:
+    """
+    Return (snippet, ranges): a window of `length` characters around the
+    first matching word, and the [start, end) offsets of matches within it.
+    """
+    wanted = set(terms)
+    matches = [
+        (match.start(), match.end()) for match in _WORD.finditer(text)
+        if stem(match.group().lower()) in wanted
+    ]
+
+    start = 0
+    if matches and len(text) > length:
+        start = max(0, min(matches[0][0] - length // 4, len(text) - length))
+    end = min(len(text), start + length)
+
+    snippet = text[start:end]
+    ranges = [[s - start, e - start] for s, e in matches if s >= start and e <= end]
+    if start > 0:
+        snippet = "…" + snippet
+        ranges = [[s + 1, e + 1] for s, e in ranges]
+    if end < len(text):
+        snippet += "…"
+    return snippet, ranges
+
+def make_hit(
+    chat_id: str,
+    chat_title: str,
+    message: Optional[Dict[str, Any]],
+    terms: List[str],
+    score: float
+) -> Dict[str, Any]:
+    text = message["text"] if message else chat_title
+    snippet, ranges = highlight(text, terms)
+    return {
+        "chatId": chat_id,
+        "chatTitle": chat_title,
+        "messageId": message["id"] if message else None,
+        "sender": message["sender"] if message else None,
+        "snippet": snippet,
+        "highlights": ranges,
+        "score": round(score, 4),
+        "timestampMs": epoch_ms(message["timestamp"]) if message else None
+    }
+
+class MongoTextSearch:
+    MESSAGE_PROJECTION = {
+        "_id": 0, "id": 1, "chatId": 1, "text": 1, "sender": 1, "timestamp": 1,
+        "score": {"$meta": "textScore"}
+    }
+    SCORE_SORT = [("score", {"$meta": "textScore"})]
+
+    async def search(self, db, user_id: str, query: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Up to `limit` + 1 of the user's hits from `offset`, best first (the
+        extra one signals a next page)
+        """
+        terms = query_terms(query)
+        window = offset + limit + 1
+        text_query = {"userId": user_id, "$text": {"$search": query}}
+        # Soft-deleted chats drop out here; their messages fall out below for lack of a title
+
+        messages = await (
+            db.messages.find(text_query, self.MESSAGE_PROJECTION)
+            .sort(self.SCORE_SORT).limit(window).to_list(window)
+        )
+        titled = await (
+            db.chats.find({**text_query, **LIVE_CHATS}, {"_id": 0, "id": 1, "title": 1, "score": {"$meta": "textScore"}})
+            .sort(self.SCORE_SORT).limit(window).to_list(window)
+        )
+
+        ranked = sorted(
+            [("message", doc) for doc in messages] + [("chat", doc) for doc in titled],
+            key=lambda item: item[1]["score"],
+            reverse=True
+        )[offset:window]
+
+        chat_ids = list({doc["chatId"] for kind, doc in ranked if kind == "message"})
+        titles = {chat["id"]: chat["title"] for chat in titled}
+        missing = [chat_id for chat_id in chat_ids if chat_id not in titles]
+        if missing:
+            async for chat in db.chats.find({"id": {"$in": missing}, **LIVE_CHATS}, {"_id": 0, "id": 1, "title": 1}):
+                titles[chat["id"]] = chat["title"]
+
+        hits = []
+        for kind, doc in ranked:
+            if kind == "chat":
+                hits.append(make_hit(doc["id"], doc["title"], None, terms, doc["score"]))
+            elif doc["chatId"] in titles:
+                hits.append(make_hit(doc["chatId"], titles[doc["chatId"]], doc, terms, doc["score"]))
+        return hits
+
+    async def rebuild(self, db):
+        pass
+
+    def index_chat(self, chat: Dict[str, Any]):
+        pass
+
+    def index_messages(self, messages: Iterable[Dict[str, Any]]):
+        pass
+
+    def remove_chat(self, chat_id: str):
+        pass
+
+    def remove_messages(self, message_ids: Iterable[str]):
+        pass
+
+class InMemorySearchIndex:
+    """BM25 over an in-process inverted index; documents are messages and chat titles"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[Tuple[str, str], int]] = defaultdict(dict)
+        self.lengths: Dict[Tuple[str, str], int] = {}
+        self.messages: Dict[str, Dict[str, Any]] = {}
+        self.chat_titles: Dict[str, str] = {}
+        self.chat_users: Dict[str, Optional[str]] = {}
+        self.chat_messages: Dict[str, List[str]] = defaultdict(list)
+        self.total_length = 0
+
+    async def rebuild(self, db):
+        """Load every live chat and its messages; only meant for small (test) databases"""
+        async for chat in db.chats.find(LIVE_CHATS, {"_id": 0, "id": 1, "userId": 1, "title": 1}):
+            self.index_chat(chat)
+        async for message in db.messages.find({}, {"_id": 0, "id": 1, "chatId": 1, "text": 1, "sender": 1, "timestamp": 1}):
+            if message["chatId"] in self.chat_titles:
+                self.index_messages([message])
+
+    def _add(self, key: Tuple[str, str], text: str):
+        tokens = tokenize(text)
+        counts: Dict[str, int] = defaultdict(int)
+        for token in tokens:
+            counts[token] += 1
+        for token, count in counts.items():
+            self.postings[token][key] = count
+        self.lengths[key] = len(tokens)
+        self.total_length += len(tokens)
+
+    def _remove(self, key: Tuple[str, str], text: str):
+        for token in set(tokenize(text)):
+            postings = self.postings.get(token)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self.postings[token]
+        self.total_length -= self.lengths.pop(key, 0)
+
+    def index_chat(self, chat: Dict[str, Any]):
+        """Add or re-title a chat; title-only updates keep the known owner"""
+        chat_id = chat["id"]
+        if chat_id in self.chat_titles:
+            self._remove(("chat", chat_id), self.chat_titles[chat_id])
+        self.chat_titles[chat_id] = chat["title"]
+        self.chat_users[chat_id] = chat.get("userId", self.chat_users.get(chat_id))
+        self._add(("chat", chat_id), chat["title"])
+
+    def index_messages(self, messages: Iterable[Dict[str, Any]]):
+        for message in messages:
+            if message["id"] in self.messages:
+                continue
+            self.messages[message["id"]] = {
+                key: message[key] for key in ("id", "chatId", "text", "sender", "timestamp")
+            }
+            self.chat_messages[message["chatId"]].append(message["id"])
+            self._add(("message", message["id"]), message["text"])
+
+    def remove_chat(self, chat_id: str):
+        for message_id in self.chat_messages.pop(chat_id, []):
+            message = self.messages.pop(message_id)
+            self._remove(("message", message_id), message["text"])
+        self.chat_users.pop(chat_id, None)
+        title = self.chat_titles.pop(chat_id, None)
+        if title is not None:
+            self._remove(("chat", chat_id), title)
+
+    def remove_messages(self, message_ids: Iterable[str]):
+        for message_id in message_ids:
+            message = self.messages.pop(message_id, None)
+            if message is None:
+                continue
+            self.chat_messages[message["chatId"]].remove(message_id)
+            self._remove(("message", message_id), message["text"])
+
+    def _owner(self, key: Tuple[str, str]) -> Optional[str]:
+        kind, item_id = key
+        chat_id = item_id if kind == "chat" else self.messages[item_id]["chatId"]
+        return self.chat_users.get(chat_id)
+
+    async def search(self, db, user_id: str, query: str, limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        terms = query_terms(query)
+        if not self.lengths or not terms:
+            return []
+
+        document_count = len(self.lengths)
+        average_length = self.total_length / document_count or 1
+        scores: Dict[Tuple[str, str], float] = defaultdict(float)
+        for term in terms:
+            postings = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + (document_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for key, frequency in postings.items():
+                if self._owner(key) != user_id:
+                    continue
+                norm = 1 - self.B + self.B * self.lengths[key] / average_length
+                scores[key] += idf * frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+
+        def recency(key: Tuple[str, str]) -> datetime:
+            message = self.messages.get(key[1]) if key[0] == "message" else None
+            return message["timestamp"] if message else datetime.min
+
+        ranked = heapq.nlargest(offset + limit + 1, scores, key=lambda key: (scores[key], recency(key)))
+        hits = []
+        for kind, item_id in ranked[offset:]:
+            if kind == "chat":
+                hits.append(make_hit(item_id, self.chat_titles[item_id], None, terms, scores[(kind, item_id)]))
+            else:
+                message = self.messages[item_id]
+                title = self.chat_titles.get(message["chatId"], "")
+                hits.append(make_hit(message["chatId"], title, message, terms, scores[(kind, item_id)]))
+        return hits
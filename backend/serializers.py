@@ -0,0 +1,76 @@
+"""
+Fast-path serialization for list endpoints.
+
+List responses are built as plain dicts and rendered with orjson
+(ORJSONResponse) instead of constructing and re-validating a Pydantic model
+per item. Each item carries timestampMs (epoch milliseconds, UTC) so the
+client can render relative or local times itself; the formatted strings are
+kept for older clients.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from models import EMPTY_PREVIEW
+
+# "%I:%M %p" for every minute of the day, so messages skip strftime
+CLOCK_LABELS = [
+    f"{(hour % 12) or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+    for hour in range(24)
+    for minute in range(60)
+]
+
+EPOCH = datetime(1970, 1, 1)
+MILLISECOND = timedelta(milliseconds=1)
+
+def epoch_ms(dt: datetime) -> int:
+    """Milliseconds since the epoch for a naive UTC datetime"""
+    return (dt - EPOCH) // MILLISECOND
+
+def format_clock(dt: datetime) -> str:
+    return CLOCK_LABELS[dt.hour * 60 + dt.minute]
+
+def format_timestamp(dt: datetime, now: Optional[datetime] = None) -> str:
+    """Format datetime for frontend display, relative to `now` (default: utcnow)"""
+    seconds = ((now or datetime.utcnow()) - dt).total_seconds()
+
+    if seconds < 60:
+        return "now"
+    elif seconds < 3600:
+        return f"{int(seconds // 60)} min ago"
+    elif seconds < 86400:
+        hours = int(seconds // 3600)
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    else:
+        days = int(seconds // 86400)
+        return f"{days} day{'s' if days > 1 else ''} ago"
+
+def chat_summaries(chats: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """ChatResponse-shaped dicts; the clock is read once for the whole page"""
+    now = datetime.utcnow()
+    return [
+        {
+            "id": chat["id"],
+            "title": chat["title"],
+            # Preview is denormalized onto the chat by send_message
+            "preview": chat.get("lastMessagePreview") or EMPTY_PREVIEW,
+            "timestamp": format_timestamp(chat["updatedAt"], now),
+            "timestampMs": epoch_ms(chat["updatedAt"]),
+            "messageCount": chat.get("messageCount", 0)
+        }
+        for chat in chats
+    ]
+
+def message_summaries(messages: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """MessageResponse-shaped dicts"""
+    return [
+        {
+            "id": message["id"],
+            "text": message["text"],
+            "sender": message["sender"],
+            "timestamp": format_clock(message["timestamp"]),
+            "timestampMs": epoch_ms(message["timestamp"]),
+            "chatId": message["chatId"]
+        }
+        for message in messages
+    ]
@@ -1,36 +1,53 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.requests import HTTPConnection
 from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse, ORJSONResponse
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from pymongo import ReturnDocument
+import json
+import math
+import time
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import List
-from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional, Tuple
+from datetime import datetime
+
+from pydantic import ValidationError
 
 from models import (
     ChatModel, MessageModel, ChatCreateRequest, ChatUpdateRequest, 
-    MessageCreateRequest, ChatResponse, MessageResponse, AIResponse
+    ChatBulkDeleteRequest, MessageCreateRequest, ChatResponse, MessageResponse, AIResponse, SearchHit,
+    build_preview, reply_timestamp
 )
 from ai_service import AIService
+from fake_ai_service import FakeAIService
+from llm_limiter import LLMSaturatedError
+from circuit_breaker import CircuitOpenError, STATE_VALUES
+from db_indexes import ensure_indexes
+from settings import Settings
+from auth import JWTAuthenticator, ANONYMOUS_USER_ID
+from title_worker import TitleWorkerPool
+from purge_worker import ChatPurgeWorker, LIVE_CHATS
+from chat_cache import ChatCache
+from chat_events import ChatEvents, Subscription, chat_topic, user_topic
+from search import MongoTextSearch, InMemorySearchIndex, MAX_SEARCH_OFFSET
+from backup import export_records, import_records, iter_lines, ImportFormatError
+from context_builder import ContextBuilder, ConversationContext
+from pagination import (
+    fetch_page, fetch_since, InvalidCursorError, DEFAULT_CHAT_PAGE_SIZE,
+    DEFAULT_MESSAGE_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER
+)
+from serializers import chat_summaries, message_summaries, format_clock, epoch_ms
+from conditional import make_etag, etag_matches, not_modified, page_version, chat_version
+from metrics import TimingMiddleware, timed, timed_iter, span, render_metrics
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Initialize AI service
-ai_service = AIService()
-
-# Create the main app without a prefix
-app = FastAPI()
-
-# Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -38,22 +55,111 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def format_timestamp(dt: datetime) -> str:
-    """Format datetime for frontend display"""
-    now = datetime.utcnow()
-    diff = now - dt
-    
-    if diff.total_seconds() < 60:
-        return "now"
-    elif diff.total_seconds() < 3600:
-        minutes = int(diff.total_seconds() / 60)
-        return f"{minutes} min ago"
-    elif diff.total_seconds() < 86400:
-        hours = int(diff.total_seconds() / 3600)
-        return f"{hours} hour{'s' if hours > 1 else ''} ago"
-    else:
-        days = int(diff.total_seconds() / 86400)
-        return f"{days} day{'s' if days > 1 else ''} ago"
+class Services:
+    """
+    One app's Mongo client, AI service, caches and background workers.
+    create_app keeps them on app.state.services; routes get them through
+    the get_services dependency and pass them to the helpers below.
+    """
+
+    def __init__(self, settings: Settings):
+        if settings.workers > 1 and settings.search_backend == 'memory':
+            raise ValueError("SEARCH_BACKEND=memory only sees one worker's writes; use the Mongo text search")
+
+        # MongoDB connection; Motor connects lazily, so this is safe before a fork
+        self.client = AsyncIOMotorClient(
+            settings.mongo_url,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            maxIdleTimeMS=settings.mongo_max_idle_ms,
+            serverSelectionTimeoutMS=settings.mongo_timeout_ms
+        )
+        self.db = self.client[settings.db_name]
+
+        # Initialize AI service (AI_BACKEND=fake streams canned replies without an LLM key)
+        self.ai_service = FakeAIService() if settings.ai_backend == 'fake' else AIService()
+
+        # Chat documents (metadata + recent messages) are served from a read-through cache
+        self.chat_cache = ChatCache.from_env(settings.chat_cache_redis_url, shared=settings.workers > 1)
+
+        # Live updates for WebSocket subscribers (all tabs and devices of a user)
+        self.chat_events = ChatEvents.from_env(settings.chat_events_redis_url, shared=settings.workers > 1)
+
+        # Full-text search (SEARCH_BACKEND=memory keeps an in-process index, e.g. with mongomock)
+        self.search_index = InMemorySearchIndex() if settings.search_backend == 'memory' else MongoTextSearch()
+
+        # Chat titles are generated in the background so the first message costs one LLM call
+        self.title_worker = TitleWorkerPool(
+            self.db,
+            self.ai_service.generate_chat_title,
+            concurrency=settings.title_workers,
+            on_title=partial(title_generated, self)
+        )
+
+        # Deleted chats are hidden at once and their messages purged in the background
+        self.purge_worker = ChatPurgeWorker(self.db, batch_size=settings.purge_batch_size)
+
+        # Conversation history sent to the LLM is packed into a token budget
+        self.context_builder = ContextBuilder(
+            token_budget=settings.context_token_budget,
+            window_size=settings.recent_messages_window,
+            summarize=self.ai_service.summarize_conversation if settings.context_summaries else None,
+            summarize_after=settings.context_summary_after,
+            summary_batch=settings.context_summary_batch
+        )
+
+        # Every chat belongs to the user in the request's bearer token
+        self.authenticator = JWTAuthenticator(
+            settings.auth_jwt_key,
+            settings.auth_jwt_algorithms,
+            settings.auth_jwt_audience,
+            ticket_key=settings.ws_ticket_key,
+            ticket_ttl=settings.ws_ticket_ttl
+        )
+
+        # Tasks that must outlive the request that started them
+        self.background_tasks = set()
+        self.summarizing_chats = set()
+
+def get_services(connection: HTTPConnection) -> Services:
+    return connection.app.state.services
+
+async def title_generated(services: Services, chat_id: str, title: str):
+    await services.chat_cache.invalidate(chat_id)
+    services.search_index.index_chat({"id": chat_id, "title": title})
+    chat = await services.db.chats.find_one({"id": chat_id, **LIVE_CHATS}, CHAT_SUMMARY_PROJECTION)
+    if chat:
+        await services.chat_events.publish(user_topic(chat["userId"]), "chat", chat=chat_summaries([chat])[0])
+
+# Create a router with the /api prefix
+api_router = APIRouter(prefix="/api")
+
+# Chat fields needed for list/detail responses (skips the embedded history)
+CHAT_SUMMARY_PROJECTION = {"recentMessages": 0, "contextSummary": 0}
+
+async def current_user(
+    authorization: Optional[str] = Header(None),
+    services: Services = Depends(get_services)
+) -> str:
+    """The requesting user's id (see auth.py); every chat query is scoped to it"""
+    return services.authenticator.user_id(authorization)
+
+async def find_chat(services: Services, chat_id: str, user_id: str) -> Optional[dict]:
+    """The user's chat document (without _id), from the cache when possible"""
+    chat = await services.chat_cache.get_or_load(
+        chat_id, lambda: timed("db", services.db.chats.find_one({"id": chat_id, **LIVE_CHATS}, {"_id": 0}))
+    )
+    # Cached by id alone, so ownership is checked on every read
+    if chat and chat.get("userId") != user_id:
+        return None
+    return chat
+
+def list_response(items: list, next_cursor: Optional[str], etag: Optional[str] = None) -> ORJSONResponse:
+    # no-cache: browsers may store the body but must revalidate with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"} if etag else {}
+    if next_cursor:
+        headers[NEXT_CURSOR_HEADER] = next_cursor
+    return ORJSONResponse(items, headers=headers)
 
 @api_router.get("/")
 async def root():
@@ -61,12 +167,21 @@ async def root():
 
 # Chat Management Endpoints
 @api_router.post("/chats", response_model=ChatModel)
-async def create_chat(request: ChatCreateRequest):
+async def create_chat(
+    request: ChatCreateRequest,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
     """Create a new chat session"""
     try:
-        chat = ChatModel(title=request.title)
+        chat = ChatModel(userId=user_id, title=request.title)
         chat_dict = chat.dict()
-        await db.chats.insert_one(chat_dict)
+        chat_dict["recentMessages"] = []
+        await timed("db", services.db.chats.insert_one(chat_dict))
+        chat_dict.pop("_id")
+        await services.chat_cache.set(chat.id, chat_dict)
+        services.search_index.index_chat(chat_dict)
+        await services.chat_events.publish(user_topic(user_id), "chat", chat=chat_summaries([chat_dict])[0])
         logger.info(f"Created new chat: {chat.id}")
         return chat
     except Exception as e:
@@ -74,80 +189,125 @@ async def create_chat(request: ChatCreateRequest):
         raise HTTPException(status_code=500, detail="Failed to create chat")
 
 @api_router.get("/chats", response_model=List[ChatResponse])
-async def get_chats():
-    """Get all chat sessions"""
+async def get_chats(
+    before: Optional[str] = None,
+    limit: int = Query(DEFAULT_CHAT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """Get a page of chat sessions, most recently updated first"""
     try:
-        chats_cursor = db.chats.find().sort("updatedAt", -1)
-        chats = await chats_cursor.to_list(1000)
-        
-        chat_responses = []
-        for chat in chats:
-            # Get the latest message for preview
-            latest_message = await db.messages.find_one(
-                {"chatId": chat["id"]}, 
-                sort=[("timestamp", -1)]
-            )
-            
-            preview = "Start a conversation..." if not latest_message else latest_message["text"][:100]
-            if len(preview) == 100:
-                preview += "..."
-                
-            chat_response = ChatResponse(
-                id=chat["id"],
-                title=chat["title"],
-                preview=preview,
-                timestamp=format_timestamp(chat["updatedAt"]),
-                messageCount=chat.get("messageCount", 0)
-            )
-            chat_responses.append(chat_response)
-            
-        return chat_responses
+        chats, next_cursor = await timed("db", fetch_page(
+            services.db.chats, {"userId": user_id, **LIVE_CHATS}, "updatedAt", before, limit, CHAT_SUMMARY_PROJECTION
+        ))
+        etag = make_etag("chats", before, limit, next_cursor, *page_version(chats))
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        # Returned as a response so FastAPI skips per-item model validation
+        with span("serialize"):
+            return list_response(chat_summaries(chats), next_cursor, etag)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching chats: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch chats")
 
 @api_router.get("/chats/{chat_id}")
-async def get_chat(chat_id: str):
-    """Get specific chat details"""
+async def get_chat(
+    chat_id: str,
+    before: Optional[str] = None,
+    limit: int = Query(DEFAULT_MESSAGE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """Get specific chat details with a page of its most recent messages"""
     try:
-        chat = await db.chats.find_one({"id": chat_id})
+        chat = await find_chat(services, chat_id, user_id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
-            
-        messages_cursor = db.messages.find({"chatId": chat_id}).sort("timestamp", 1)
-        messages = await messages_cursor.to_list(1000)
-        
-        # Remove MongoDB ObjectId fields to avoid serialization issues
-        clean_messages = []
-        for msg in messages:
-            if '_id' in msg:
-                del msg['_id']
-            clean_messages.append(msg)
-        
-        return {
-            "id": chat["id"],
-            "title": chat["title"],
-            "messages": clean_messages
-        }
+
+        # Exclude MongoDB ObjectId fields to avoid serialization issues
+        messages, next_cursor = await timed("db", fetch_page(
+            services.db.messages, {"chatId": chat_id}, "timestamp", before, limit, {"_id": 0}
+        ))
+        messages.reverse()  # Chronological order within the page
+
+        with span("serialize"):
+            return ORJSONResponse({
+                "id": chat["id"],
+                "title": chat["title"],
+                "messages": messages,
+                "nextCursor": next_cursor
+            })
     except HTTPException:
         raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching chat {chat_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch chat")
 
+async def soft_delete_chats(services: Services, user_id: str, chat_ids: Optional[List[str]]) -> int:
+    """
+    Mark the user's chats (all of them when chat_ids is None) deleted so
+    every read skips them, and leave their messages to the purge worker.
+    Returns how many live chats were marked.
+    """
+    owned = {"userId": user_id, **LIVE_CHATS}
+    if chat_ids is not None:
+        owned["id"] = {"$in": chat_ids}
+    owned_ids = [chat["id"] async for chat in services.db.chats.find(owned, {"_id": 0, "id": 1})]
+    if not owned_ids:
+        return 0
+
+    now = datetime.utcnow()
+    result = await timed("db", services.db.chats.update_many(
+        {"id": {"$in": owned_ids}, **LIVE_CHATS},
+        {"$set": {"deletedAt": now, "updatedAt": now}}
+    ))
+    for chat_id in owned_ids:
+        await services.chat_cache.invalidate(chat_id)
+        services.search_index.remove_chat(chat_id)
+    services.purge_worker.wake()
+    await services.chat_events.publish(user_topic(user_id), "deleted", chatIds=owned_ids)
+    return result.modified_count
+
+@api_router.delete("/chats")
+async def delete_chats(
+    request: Optional[ChatBulkDeleteRequest] = None,
+    all_chats: bool = Query(False, alias="all"),
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    Delete several chats at once; ids that do not exist (for this user) are
+    ignored. With ?all=true and no body, delete every chat of the user,
+    including pages the client has not loaded.
+    """
+    if request is None and not all_chats:
+        raise HTTPException(status_code=422, detail="Pass ids in the body or ?all=true")
+    try:
+        chat_ids = None if all_chats else list(dict.fromkeys(request.ids))
+        deleted = await soft_delete_chats(services, user_id, chat_ids)
+        logger.info(f"Deleted {deleted} chats")
+        return {"success": True, "deleted": deleted}
+    except Exception as e:
+        logger.error(f"Error deleting chats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to delete chats")
+
 @api_router.delete("/chats/{chat_id}")
-async def delete_chat(chat_id: str):
-    """Delete a chat and all its messages"""
+async def delete_chat(
+    chat_id: str,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """Delete a chat; its messages are purged in the background"""
     try:
-        # Delete all messages in the chat
-        await db.messages.delete_many({"chatId": chat_id})
-        
-        # Delete the chat
-        result = await db.chats.delete_one({"id": chat_id})
-        
-        if result.deleted_count == 0:
+        if not await soft_delete_chats(services, user_id, [chat_id]):
             raise HTTPException(status_code=404, detail="Chat not found")
-            
+
         logger.info(f"Deleted chat: {chat_id}")
         return {"success": True}
     except HTTPException:
@@ -157,7 +317,12 @@ async def delete_chat(chat_id: str):
         raise HTTPException(status_code=500, detail="Failed to delete chat")
 
 @api_router.put("/chats/{chat_id}", response_model=ChatModel)
-async def update_chat(chat_id: str, request: ChatUpdateRequest):
+async def update_chat(
+    chat_id: str,
+    request: ChatUpdateRequest,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
     """Update chat title"""
     try:
         update_data = {
@@ -165,15 +330,19 @@ async def update_chat(chat_id: str, request: ChatUpdateRequest):
             "updatedAt": datetime.utcnow()
         }
         
-        result = await db.chats.update_one(
-            {"id": chat_id}, 
-            {"$set": update_data}
-        )
+        updated_chat = await timed("db", services.db.chats.find_one_and_update(
+            {"id": chat_id, "userId": user_id, **LIVE_CHATS},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        ))
         
-        if result.matched_count == 0:
+        if not updated_chat:
             raise HTTPException(status_code=404, detail="Chat not found")
-            
-        updated_chat = await db.chats.find_one({"id": chat_id})
+
+        await services.chat_cache.set(chat_id, updated_chat)
+        services.search_index.index_chat(updated_chat)
+        await services.chat_events.publish(user_topic(user_id), "chat", chat=chat_summaries([updated_chat])[0])
         return ChatModel(**updated_chat)
     except HTTPException:
         raise
@@ -182,14 +351,180 @@ async def update_chat(chat_id: str, request: ChatUpdateRequest):
         raise HTTPException(status_code=500, detail="Failed to update chat")
 
 # Message Management Endpoints
+def to_message_response(message: MessageModel) -> MessageResponse:
+    return MessageResponse(
+        id=message.id,
+        text=message.text,
+        sender=message.sender,
+        timestamp=format_clock(message.timestamp),
+        timestampMs=epoch_ms(message.timestamp),
+        chatId=message.chatId
+    )
+
+async def load_chat_context(services: Services, chat_id: str, user_id: str):
+    """
+    Fetch the chat and its conversation context in one (usually cached)
+    read: the chat document carries its most recent messages (recentMessages)
+    """
+    chat = await find_chat(services, chat_id, user_id)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+    # Only reads when the chat has no recentMessages window yet
+    context = await timed("db", services.context_builder.context_for(services.db, chat))
+    return chat, context
+
+async def summarize_older_turns(services: Services, chat: dict):
+    """Fold turns that fell out of the context window into the cached summary"""
+    if chat["id"] in services.summarizing_chats:
+        return
+    services.summarizing_chats.add(chat["id"])
+    try:
+        await services.context_builder.refresh_summary(services.db, chat)
+        await services.chat_cache.invalidate(chat["id"])
+    except Exception as e:
+        logger.warning(f"Failed to summarize chat {chat['id']}: {str(e)}")
+    finally:
+        services.summarizing_chats.discard(chat["id"])
+
+async def save_user_message(services: Services, chat: dict, user_message: MessageModel):
+    """
+    Insert the user's message before the LLM call, so a crash or deploy
+    during the call does not lose what they typed
+    """
+    user_message.userId = chat["userId"]
+    document = user_message.dict()
+    await timed("db", services.db.messages.insert_one(document))
+    services.search_index.index_messages([document])
+    await bump_history_version(services, chat["id"])
+
+async def discard_user_message(services: Services, user_message: MessageModel):
+    """Remove a saved user message whose request was rejected (the client resends it)"""
+    await timed("db", services.db.messages.delete_one({"id": user_message.id}))
+    services.search_index.remove_messages([user_message.id])
+    await bump_history_version(services, user_message.chatId)
+
+async def bump_history_version(services: Services, chat_id: str):
+    """
+    Move the chat's historyVersion (part of its messages ETag, see
+    conditional.chat_version) for a history change that leaves messageCount
+    and updatedAt alone, and drop the cached copy that still has the old one
+    """
+    await timed("db", services.db.chats.update_one({"id": chat_id}, {"$inc": {"historyVersion": 1}}))
+    await services.chat_cache.invalidate(chat_id)
+
+async def save_exchange(
+    services: Services,
+    chat: dict,
+    user_message: MessageModel,
+    ai_message: Optional[MessageModel]
+):
+    """
+    Complete an exchange whose user message save_user_message already
+    inserted: insert the reply (if any), then one chat update that bumps
+    messageCount and the recentMessages window and returns the chat for
+    the cache
+    """
+    chat_id = chat["id"]
+    new_messages = [user_message] + ([ai_message] if ai_message else [])
+    for message in new_messages:
+        message.userId = chat["userId"]
+    documents = [message.dict() for message in new_messages]
+    if ai_message:
+        await timed("db", services.db.messages.insert_one(documents[-1]))
+        services.search_index.index_messages(documents[-1:])
+
+    last_message = new_messages[-1]
+    updated_chat = await timed("db", services.db.chats.find_one_and_update(
+        {"id": chat_id, **LIVE_CHATS},
+        {
+            "$inc": {"messageCount": len(new_messages), "historyVersion": 1},
+            "$set": {
+                "updatedAt": datetime.utcnow(),
+                "lastMessagePreview": build_preview(last_message.text),
+                "lastMessageAt": last_message.timestamp
+            },
+            "$push": {"recentMessages": {
+                "$each": [services.context_builder.window_entry(doc) for doc in documents],
+                "$slice": -services.context_builder.window_size
+            }}
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    ))
+    if not updated_chat:
+        # Deleted while the reply was generated; don't leave orphans behind
+        await timed("db", services.db.messages.delete_many({"id": {"$in": [doc["id"] for doc in documents]}}))
+        services.search_index.remove_chat(chat_id)
+        return
+    await services.chat_cache.set(chat_id, updated_chat)
+    await services.chat_events.publish(chat_topic(chat_id), "messages", messages=message_summaries(documents))
+    await services.chat_events.publish(user_topic(chat["userId"]), "chat", chat=chat_summaries([updated_chat])[0])
+
+    # Title the chat after its first exchange; the current title stays until then
+    if updated_chat["messageCount"] <= 2:
+        services.title_worker.submit(chat_id, user_message.text, chat["title"])
+
+    # Long chats fold older turns into the rolling summary every few messages
+    if services.context_builder.needs_summary(updated_chat, len(new_messages)):
+        run_in_background(services, summarize_older_turns(services, updated_chat))
+
+def run_in_background(services: Services, coro) -> asyncio.Task:
+    """Run a coroutine that must finish even if the request is cancelled"""
+    task = asyncio.create_task(coro)
+    services.background_tasks.add(task)
+    task.add_done_callback(services.background_tasks.discard)
+    return task
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready"""
+
+async def wait_for_disconnect(request: Request):
+    # The body has been read, so the next ASGI message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def cancel_on_disconnect(request: Request, coro):
+    """
+    Await coro, cancelling it (and the LLM call under it) as soon as the
+    client disconnects; raises ClientDisconnected in that case
+    """
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        watcher.cancel()
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if task.cancelled():
+        raise ClientDisconnected()
+    return task.result()
+
+def llm_session_id(chat: dict, client_session: Optional[str]) -> str:
+    """
+    The LLM session for a reply, always inside the owner's chat: a
+    client-sent sessionId only names a session within it, so it can never
+    reach another chat's or user's session, or the summarizer's
+    """
+    session_id = f"chat_{chat['userId']}_{chat['id']}"
+    return f"{session_id}_{client_session}" if client_session else session_id
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
 @api_router.post("/chats/{chat_id}/messages", response_model=AIResponse)
-async def send_message(chat_id: str, request: MessageCreateRequest):
-    """Send a message and get AI response"""
+async def send_message(
+    chat_id: str,
+    request: MessageCreateRequest,
+    http_request: Request,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """Send a message and get AI response; a client disconnect cancels the LLM call"""
     try:
-        # Check if chat exists
-        chat = await db.chats.find_one({"id": chat_id})
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat not found")
+        chat, context = await load_chat_context(services, chat_id, user_id)
 
         # Create user message
         user_message = MessageModel(
@@ -197,118 +532,594 @@ async def send_message(chat_id: str, request: MessageCreateRequest):
             text=request.message,
             sender="user"
         )
-
-        # Save user message to database
-        await db.messages.insert_one(user_message.dict())
-
-        # Get chat history for context (last 10 messages)
-        messages_cursor = db.messages.find({"chatId": chat_id}).sort("timestamp", -1).limit(10)
-        recent_messages = await messages_cursor.to_list(10)
-        recent_messages.reverse()  # Reverse to get chronological order
+        await save_user_message(services, chat, user_message)
 
         # Get AI response
-        ai_response_text = await ai_service.chat_with_ai(
-            message=request.message,
-            chat_history=recent_messages,
-            session_id=request.sessionId or chat_id,
-            model=request.model
-        )
+        try:
+            ai_response_text = await timed("llm", cancel_on_disconnect(http_request, services.ai_service.chat_with_ai(
+                message=request.message,
+                chat_history=context.messages,
+                session_id=llm_session_id(chat, request.sessionId),
+                model=request.model,
+                context_summary=context.summary,
+                use_cache=not request.bypassCache
+            )))
+        except (LLMSaturatedError, CircuitOpenError):
+            # Rejected before reaching the provider; the client resends the message
+            await discard_user_message(services, user_message)
+            raise
+        except BaseException:
+            # Client gone, shutdown deadline passed or the call failed: keep
+            # the user's message
+            run_in_background(services, save_exchange(services, chat, user_message, None))
+            raise
 
         # Create AI message
         ai_message = MessageModel(
             chatId=chat_id,
             text=ai_response_text,
-            sender="ai"
+            sender="ai",
+            timestamp=reply_timestamp(user_message.timestamp)
         )
 
-        # Save AI message to database
-        await db.messages.insert_one(ai_message.dict())
+        await asyncio.shield(run_in_background(services, save_exchange(services, chat, user_message, ai_message)))
 
-        # Update chat metadata
-        message_count = await db.messages.count_documents({"chatId": chat_id})
-        
-        # Update chat title if this is the first message
-        update_data = {
-            "messageCount": message_count,
-            "updatedAt": datetime.utcnow()
+        logger.info(f"Message exchange completed for chat {chat_id}")
+        with span("serialize"):
+            return AIResponse(
+                userMessage=to_message_response(user_message),
+                aiResponse=to_message_response(ai_message)
+            )
+
+    except (HTTPException, LLMSaturatedError, CircuitOpenError, ClientDisconnected):
+        raise
+    except Exception as e:
+        logger.error(f"Error processing message for chat {chat_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to process message")
+
+async def reply_events(
+    services: Services,
+    chat: dict,
+    context: ConversationContext,
+    request: MessageCreateRequest,
+    user_message: MessageModel,
+    ai_message: MessageModel
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Generate and save a streamed reply, yielding (event, data) for start,
+    token..., then done or error. start and token are also published to the
+    chat's subscribers, and a failure as "failed". If the generator is
+    cancelled or fails mid-reply, the user message and the partial reply
+    are saved with metadata.partial so they show up in the chat history.
+    """
+    topic = chat_topic(chat["id"])
+    chunks = []
+    user_saved = False
+    completed = False
+    rejected = False
+    error = None
+    try:
+        await save_user_message(services, chat, user_message)
+        user_saved = True
+        start = {
+            "userMessage": to_message_response(user_message).dict(),
+            "aiMessageId": ai_message.id
         }
-        
-        if message_count <= 2:  # First user message and AI response
-            try:
-                suggested_title = await ai_service.get_chat_title_suggestion(request.message)
-                update_data["title"] = suggested_title
-            except Exception as e:
-                logger.warning(f"Failed to generate title: {str(e)}")
-
-        await db.chats.update_one({"id": chat_id}, {"$set": update_data})
-
-        # Format response
-        user_response = MessageResponse(
-            id=user_message.id,
-            text=user_message.text,
-            sender=user_message.sender,
-            timestamp=user_message.timestamp.strftime("%I:%M %p"),
-            chatId=user_message.chatId
-        )
+        await services.chat_events.publish(topic, "start", **start)
+        yield "start", start
+        async for chunk in timed_iter("llm", services.ai_service.stream_chat_with_ai(
+            message=request.message,
+            chat_history=context.messages,
+            session_id=llm_session_id(chat, request.sessionId),
+            model=request.model,
+            context_summary=context.summary,
+            use_cache=not request.bypassCache
+        )):
+            chunks.append(chunk)
+            await services.chat_events.publish(topic, "token", messageId=ai_message.id, text=chunk)
+            yield "token", {"text": chunk}
+        completed = True
+    except LLMSaturatedError as e:
+        # Nothing was generated; the client retries the whole message
+        rejected = True
+        logger.warning(str(e))
+        error = {
+            "detail": "AI service is busy, please retry",
+            "status": 429,
+            "retryAfter": math.ceil(e.retry_after)
+        }
+    except CircuitOpenError as e:
+        rejected = True
+        logger.warning(str(e))
+        error = {
+            "detail": "AI service is unavailable, please retry later",
+            "status": 503,
+            "retryAfter": math.ceil(e.retry_after)
+        }
+    except Exception as e:
+        logger.error(f"Error streaming message for chat {chat['id']}: {str(e)}")
+        error = {"detail": "Failed to process message"}
+    finally:
+        if user_saved and rejected:
+            run_in_background(services, discard_user_message(services, user_message))
+        elif user_saved and not completed:
+            # Keep the user message and whatever was generated so the
+            # reply is recoverable
+            partial_message = None
+            if chunks:
+                ai_message.text = "".join(chunks)
+                ai_message.timestamp = reply_timestamp(user_message.timestamp)
+                ai_message.metadata = {"partial": True}
+                partial_message = ai_message
+            run_in_background(services, save_exchange(services, chat, user_message, partial_message))
+            logger.info(f"Saved partial exchange for chat {chat['id']}")
 
-        ai_response = MessageResponse(
-            id=ai_message.id,
-            text=ai_message.text,
-            sender=ai_message.sender,
-            timestamp=ai_message.timestamp.strftime("%I:%M %p"),
-            chatId=ai_message.chatId
+    if error:
+        # Other tabs drop what start/token showed; saved parts come back as "messages"
+        await services.chat_events.publish(
+            topic, "failed",
+            aiMessageId=ai_message.id,
+            userMessageId=user_message.id,
+            saved=not rejected
         )
+        yield "error", error
+        return
 
-        logger.info(f"Message exchange completed for chat {chat_id}")
-        return AIResponse(userMessage=user_response, aiResponse=ai_response)
+    ai_message.text = "".join(chunks)
+    ai_message.timestamp = reply_timestamp(user_message.timestamp)
+    await asyncio.shield(run_in_background(services, save_exchange(services, chat, user_message, ai_message)))
+
+    logger.info(f"Streamed message exchange completed for chat {chat['id']}")
+    yield "done", AIResponse(
+        userMessage=to_message_response(user_message),
+        aiResponse=to_message_response(ai_message)
+    ).dict()
 
+@api_router.post("/chats/{chat_id}/messages/stream")
+async def stream_message(
+    chat_id: str,
+    request: MessageCreateRequest,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    Send a message and stream the AI response as Server-Sent Events:
+    start (user message), token (text chunk)..., then done (AIResponse)
+    or error. If the client disconnects mid-stream, the partial reply is
+    saved with metadata.partial so it shows up in the chat history, and
+    cancelling the stream cancels the LLM call.
+    """
+    try:
+        chat, context = await load_chat_context(services, chat_id, user_id)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error processing message for chat {chat_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to process message")
 
+    user_message = MessageModel(chatId=chat_id, text=request.message, sender="user")
+    ai_message = MessageModel(chatId=chat_id, text="", sender="ai")
+
+    async def event_stream():
+        events = reply_events(services, chat, context, request, user_message, ai_message)
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        finally:
+            # Runs the partial save now rather than when the generator is collected
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/ws-ticket")
+async def create_socket_ticket(
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    A short-lived ticket to open a chat WebSocket with (?ticket=), so the
+    bearer token stays out of URLs and access logs. ticket is null when
+    auth is off.
+    """
+    authenticator = services.authenticator
+    return {"ticket": authenticator.issue_ticket(user_id), "expiresIn": authenticator.ticket_ttl}
+
+# WebSocket close codes
+WS_POLICY_VIOLATION = 1008
+WS_TRY_AGAIN_LATER = 1013
+
+async def forward_events(websocket: WebSocket, subscription: Subscription):
+    """The socket's only writer: sends every event of its subscription as JSON"""
+    async for event in subscription:
+        await websocket.send_text(json.dumps(event))
+    # Fell too far behind; the client reconnects and catches up with ?since=
+    await websocket.close(code=WS_TRY_AGAIN_LATER)
+
+async def socket_reply(services: Services, subscription: Subscription, chat_id: str, user_id: str, frame: dict):
+    """Generate the reply to a send frame; its events reach the socket through the chat topic"""
+    try:
+        request = MessageCreateRequest(**{key: value for key, value in frame.items() if key != "type"})
+        chat, context = await load_chat_context(services, chat_id, user_id)
+    except ValidationError as e:
+        subscription.deliver({"type": "error", "detail": str(e), "status": 422})
+        return
+    except HTTPException as e:
+        subscription.deliver({"type": "error", "detail": e.detail, "status": e.status_code})
+        return
+    except Exception as e:
+        logger.error(f"Error processing message for chat {chat_id}: {str(e)}")
+        subscription.deliver({"type": "error", "detail": "Failed to process message"})
+        return
+
+    user_message = MessageModel(chatId=chat_id, text=request.message, sender="user")
+    ai_message = MessageModel(chatId=chat_id, text="", sender="ai")
+    events = reply_events(services, chat, context, request, user_message, ai_message)
+    try:
+        async for event, data in events:
+            if event == "error":
+                # Only the sender hears why; subscribers got "failed"
+                subscription.deliver({"type": "error", **data})
+    finally:
+        await events.aclose()
+
+@api_router.websocket("/ws/chats/{chat_id}")
+async def chat_socket(websocket: WebSocket, chat_id: str, ticket: Optional[str] = None):
+    """
+    Live channel for one chat. Pushes the chat's events (reply start and
+    tokens, saved messages, failures) and the user's chat list changes
+    (chat upserts, deletions) as JSON frames. The client may send
+    {"type": "send", "message": ...} with the MessageCreateRequest fields;
+    the reply streams to every subscriber, and closing the socket cancels
+    it. Browsers cannot set headers on a WebSocket, so they authenticate
+    with ?ticket= from POST /api/ws-ticket; other clients may send the
+    bearer token as a header.
+    """
+    services = get_services(websocket)
+    authorization = websocket.headers.get("authorization")
+    try:
+        if authorization:
+            user_id = services.authenticator.user_id(authorization)
+        else:
+            user_id = services.authenticator.ticket_user_id(ticket)
+        chat = await find_chat(services, chat_id, user_id)
+    except HTTPException:
+        chat = None
+    if not chat:
+        await websocket.close(code=WS_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = services.chat_events.subscribe(chat_topic(chat_id), user_topic(user_id))
+    forwarder = asyncio.create_task(forward_events(websocket, subscription))
+    reply: Optional[asyncio.Task] = None
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+            except ValueError:
+                subscription.deliver({"type": "error", "detail": "Frames must be JSON", "status": 400})
+                continue
+            if not isinstance(frame, dict):
+                subscription.deliver({"type": "error", "detail": "Frames must be JSON objects", "status": 400})
+            elif frame.get("type") == "send":
+                if reply and not reply.done():
+                    subscription.deliver({"type": "error", "detail": "A reply is already being generated", "status": 409})
+                else:
+                    reply = asyncio.create_task(socket_reply(services, subscription, chat_id, user_id, frame))
+            elif frame.get("type") == "ping":
+                subscription.deliver({"type": "pong"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        subscription.close()
+        tasks = [forwarder] + ([reply] if reply else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
 @api_router.get("/chats/{chat_id}/messages", response_model=List[MessageResponse])
-async def get_messages(chat_id: str):
-    """Get all messages in a chat"""
+async def get_messages(
+    chat_id: str,
+    before: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_MESSAGE_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(None),
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    Get a page of messages in a chat, oldest first within the page, or with
+    ?since=<messageId> only the messages after that one
+    """
+    if before and since:
+        raise HTTPException(status_code=400, detail="Use either before or since, not both")
     try:
-        # Check if chat exists
-        chat = await db.chats.find_one({"id": chat_id})
+        # The chat's historyVersion (with updatedAt/messageCount) versions its messages
+        chat = await find_chat(services, chat_id, user_id)
         if not chat:
             raise HTTPException(status_code=404, detail="Chat not found")
 
-        messages_cursor = db.messages.find({"chatId": chat_id}).sort("timestamp", 1)
-        messages = await messages_cursor.to_list(1000)
-
-        message_responses = []
-        for message in messages:
-            message_response = MessageResponse(
-                id=message["id"],
-                text=message["text"],
-                sender=message["sender"],
-                timestamp=message["timestamp"].strftime("%I:%M %p"),
-                chatId=message["chatId"]
-            )
-            message_responses.append(message_response)
+        etag = make_etag("messages", *chat_version(chat), before, since, limit)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+
+        if since:
+            anchor = await timed("db", services.db.messages.find_one(
+                {"id": since, "chatId": chat_id}, {"_id": 0, "id": 1, "timestamp": 1}
+            ))
+            if not anchor:
+                raise HTTPException(status_code=400, detail=f"Unknown message: {since}")
+            messages = await timed("db", fetch_since(
+                services.db.messages, {"chatId": chat_id}, "timestamp", anchor, limit
+            ))
+            next_cursor = None
+        else:
+            messages, next_cursor = await timed("db", fetch_page(
+                services.db.messages, {"chatId": chat_id}, "timestamp", before, limit
+            ))
+            messages.reverse()  # Chronological order within the page
 
-        return message_responses
+        with span("serialize"):
+            return list_response(message_summaries(messages), next_cursor, etag)
     except HTTPException:
         raise
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching messages for chat {chat_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to fetch messages")
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/search", response_model=List[SearchHit])
+async def search_chats(
+    q: str = Query(..., min_length=1, max_length=200),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=50),
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    Search the user's message text and chat titles, best match first. Pass the
+    X-Next-Cursor header back as ?cursor= for the next page.
+    """
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        offset = -1
+    if not 0 <= offset <= MAX_SEARCH_OFFSET:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    try:
+        hits = await timed("db", services.search_index.search(services.db, user_id, q, limit, offset))
+    except Exception as e:
+        logger.error(f"Error searching for {q!r}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search")
+
+    next_cursor = str(offset + limit) if len(hits) > limit else None
+    with span("serialize"):
+        return list_response(hits[:limit], next_cursor)
+
+# Backup and migration
+@api_router.get("/export")
+async def export_chats(
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """Stream the user's chats and their messages as NDJSON (see backup.py for the format)"""
+    return StreamingResponse(
+        export_records(services.db, user_id),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="matchelor-export.ndjson"'}
+    )
+
+def index_imported(services: Services, record_type: str, documents: List[dict]):
+    if record_type == "chat":
+        for chat in documents:
+            services.search_index.index_chat(chat)
+    else:
+        services.search_index.index_messages(documents)
+
+@api_router.post("/import")
+async def import_chats(
+    request: Request,
+    user_id: str = Depends(current_user),
+    services: Services = Depends(get_services)
+):
+    """
+    Import an NDJSON export from the request body into the user's account.
+    Chats and messages whose id already exists are skipped, so an
+    interrupted import can be re-run.
+    """
+    try:
+        stats = await import_records(services.db, iter_lines(request.stream()), user_id, on_batch=partial(index_imported, services))
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing chats: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to import chats")
+
+    logger.info(f"Imported {stats['chats']} chats and {stats['messages']} messages "
+                f"({stats['messagesPerSecond']} messages/s)")
+    return stats
+
+async def metrics(request: Request):
+    """Prometheus scrape endpoint"""
+    services = get_services(request)
+    return PlainTextResponse(render_metrics(lambda: service_metrics(services)), media_type="text/plain; version=0.0.4")
+
+def service_metrics(services: Services):
+    """Gauges from the response cache, limiter, chat cache and background workers"""
+    cache = services.ai_service.cache_stats() if hasattr(services.ai_service, "cache_stats") else {}
+    for result in ("exact_hits", "similar_hits", "misses") if cache else ():
+        yield ("matchelor_response_cache_lookups_total", "counter",
+               "LLM response cache lookups by result", {"result": result}, cache[result])
+    if hasattr(services.ai_service, "limiter_stats"):
+        limiter = services.ai_service.limiter_stats()
+        yield ("matchelor_llm_coalesced_total", "counter", "LLM calls served by an identical in-flight call",
+               {}, limiter["coalesced"])
+        for provider, stats in limiter["providers"].items():
+            labels = {"provider": provider}
+            yield ("matchelor_llm_in_flight", "gauge", "LLM calls in flight", labels, stats["in_flight"])
+            yield ("matchelor_llm_queued", "gauge", "LLM calls waiting for a slot", labels, stats["queued"])
+            yield ("matchelor_llm_rejected_total", "counter", "LLM calls rejected with 429", labels, stats["rejected"])
+    if hasattr(services.ai_service, "router_stats"):
+        router = services.ai_service.router_stats()
+        yield ("matchelor_llm_failovers_total", "counter", "LLM calls retried on the backup model", {}, router["failovers"])
+        yield ("matchelor_llm_hedges_total", "counter", "Hedged LLM calls sent to the backup model", {}, router["hedges"])
+        yield ("matchelor_llm_hedge_wins_total", "counter", "Hedged LLM calls answered by the backup first",
+               {}, router["hedge_wins"])
+        for provider, health in router["providers"].items():
+            labels = {"provider": provider}
+            yield ("matchelor_llm_latency_ewma_seconds", "gauge", "EWMA of LLM call latency", labels,
+                   health["latency_ewma"])
+            yield ("matchelor_llm_error_rate", "gauge", "EWMA of the LLM call error rate", labels, health["error_rate"])
+    if hasattr(services.ai_service, "breaker_stats"):
+        for provider, breaker in services.ai_service.breaker_stats().items():
+            labels = {"provider": provider}
+            yield ("matchelor_llm_breaker_state", "gauge", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)",
+                   labels, STATE_VALUES[breaker["state"]])
+            yield ("matchelor_llm_breaker_trips_total", "counter", "Times the LLM circuit breaker opened",
+                   labels, breaker["trips"])
+            yield ("matchelor_llm_breaker_rejected_total", "counter", "LLM calls failed fast by an open breaker",
+                   labels, breaker["rejected"])
+    chats = services.chat_cache.stats()
+    for result in ("hits", "misses"):
+        yield ("matchelor_chat_cache_lookups_total", "counter", "Chat cache lookups by result",
+               {"result": result}, chats[result])
+    yield ("matchelor_chat_cache_errors_total", "counter", "Chat cache backend errors", {}, chats["errors"])
+    yield ("matchelor_chat_cache_hit_ratio", "gauge", "Chat cache hit ratio since start", {}, chats["hit_rate"])
+    events = services.chat_events.stats()
+    yield ("matchelor_ws_subscriptions", "gauge", "Open WebSocket chat subscriptions", {}, events["subscriptions"])
+    yield ("matchelor_chat_events_published_total", "counter", "Chat events published to subscribers",
+           {}, events["published"])
+    yield ("matchelor_chat_events_overflows_total", "counter", "Subscribers dropped for falling behind",
+           {}, events["overflows"])
+    yield ("matchelor_chat_events_errors_total", "counter", "Chat events the broker failed to publish",
+           {}, events["errors"])
+    titles = services.title_worker.stats()
+    yield ("matchelor_title_jobs_queued", "gauge", "Title jobs waiting for a worker", {}, titles["queued"])
+    for outcome in ("completed", "failed", "dropped"):
+        yield ("matchelor_title_jobs_total", "counter", "Title jobs by outcome", {"outcome": outcome}, titles[outcome])
+    purged = services.purge_worker.stats()
+    for kind in ("chats", "messages"):
+        yield ("matchelor_purged_documents_total", "counter", "Documents removed after a soft delete",
+               {"kind": kind}, purged[kind])
+    yield ("matchelor_purge_failures_total", "counter", "Failed chat purge passes", {}, purged["failed"])
+
+async def llm_saturated_handler(request, exc: LLMSaturatedError):
+    logger.warning(str(exc))
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "AI service is busy, please retry"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+async def llm_unavailable_handler(request, exc: CircuitOpenError):
+    logger.warning(str(exc))
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "AI service is unavailable, please retry later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+async def client_disconnected_handler(request, exc: ClientDisconnected):
+    # Never delivered; 499 (as nginx logs it) keeps these apart in /metrics
+    return JSONResponse(status_code=499, content={"detail": "Client disconnected"})
+
+async def warm_up(services: Services):
+    """
+    Fill the Mongo pool up to minPoolSize and run the chat list query once,
+    so a fresh worker's first requests are not the slow ones. The LLM SDK
+    loads in the background; startup does not wait for it.
+    """
+    started = time.perf_counter()
+    run_in_background(services, services.ai_service.warm_up())
+    await services.db.command("ping")
+    await fetch_page(services.db.chats, {"userId": ANONYMOUS_USER_ID, **LIVE_CHATS}, "updatedAt", None, 1, CHAT_SUMMARY_PROJECTION)
+    logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+async def drain(services: Services, settings: Settings):
+    """
+    Shutdown. The server has already given in-flight requests up to
+    DRAIN_TIMEOUT after SIGTERM; streams it cancelled save their partial
+    reply in the background. Give those writes and queued title jobs up to
+    FLUSH_TIMEOUT, then stop the workers and close the Mongo client.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.flush_timeout
+    # Background writes can start more of them (e.g. summaries), so re-check
+    while services.background_tasks and loop.time() < deadline:
+        logger.info(f"Waiting for {len(services.background_tasks)} background writes")
+        await asyncio.wait(list(services.background_tasks), timeout=deadline - loop.time())
+    if services.background_tasks:
+        logger.warning(f"Shutting down with {len(services.background_tasks)} background writes unfinished")
+
+    await services.title_worker.stop(timeout=max(deadline - loop.time(), 0))
+    await services.purge_worker.stop()
+    await services.chat_events.close()
+    services.client.close()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings: Settings = app.state.settings
+    services: Services = app.state.services
+    await ensure_indexes(services.db)
+    await services.search_index.rebuild(services.db)
+    if settings.warmup:
+        await warm_up(services)
+    services.title_worker.start()
+    services.purge_worker.start()
+    yield
+    await drain(services, settings)
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Build the app with its own services (settings default to the
+    environment). Nothing is built when server.py is imported: uvicorn
+    (--factory server:create_app) and gunicorn ('server:create_app()') call
+    this in each worker, so every worker gets its own connection pool and
+    background workers, and apps built side by side (tests) share nothing.
+    """
+    settings = settings or Settings.from_env()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+    app.state.services = Services(settings)
+    app.include_router(api_router)
+    app.add_api_route("/metrics", metrics, include_in_schema=False)
+    app.add_exception_handler(LLMSaturatedError, llm_saturated_handler)
+    app.add_exception_handler(CircuitOpenError, llm_unavailable_handler)
+    app.add_exception_handler(ClientDisconnected, client_disconnected_handler)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Retry-After", "Server-Timing"],
+    )
+
+    # Outermost, so the breakdown covers CORS and exception handling too
+    app.add_middleware(TimingMiddleware)
+    return app
+
+def main():
+    """Serve with the configured workers; in-flight requests get DRAIN_TIMEOUT on SIGTERM"""
+    import uvicorn
+
+    settings = Settings.from_env()
+    uvicorn.run(
+        "server:create_app",
+        factory=True,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        timeout_graceful_shutdown=settings.drain_timeout
+    )
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
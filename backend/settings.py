@@ -0,0 +1,96 @@
+"""
+Process settings for the API server, read once from the environment.
+
+Each worker process builds its own app by calling the create_app factory
+(importing server.py builds nothing), so uvicorn and gunicorn can both run
+several workers:
+
+    python server.py                                  # uses the settings below
+    uvicorn --factory server:create_app --workers 4 --timeout-graceful-shutdown 30
+    gunicorn 'server:create_app()' -k uvicorn.workers.UvicornWorker -w 4 --graceful-timeout 30
+
+WEB_CONCURRENCY is the worker count python server.py starts (uvicorn and
+gunicorn read it too). A -w/--workers flag never reaches the app, so state
+that would go stale across workers is opt-in rather than keyed off this
+count: the in-process chat cache is off unless CHAT_CACHE_SIZE is set (for
+a single process) and shared workers use CHAT_CACHE_REDIS_URL.
+SEARCH_BACKEND=memory is for one process too, and is refused when
+WEB_CONCURRENCY > 1. WebSocket events need CHAT_EVENTS_REDIS_URL to reach
+sockets connected to other workers.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+@dataclass
+class Settings:
+    mongo_url: str
+    db_name: str
+    # Connections per worker process; the deployment total is workers * max
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 5
+    mongo_max_idle_ms: int = 60_000
+    mongo_timeout_ms: int = 5_000
+    workers: int = 1
+    host: str = "0.0.0.0"
+    port: int = 8001
+    # Seconds in-flight requests (LLM streams included) get after SIGTERM
+    drain_timeout: float = 30.0
+    # Seconds the shutdown then waits for background writes (partial replies, titles)
+    flush_timeout: float = 10.0
+    warmup: bool = True
+    ai_backend: Optional[str] = None
+    search_backend: Optional[str] = None
+    chat_cache_redis_url: Optional[str] = None
+    chat_events_redis_url: Optional[str] = None
+    title_workers: int = 2
+    purge_batch_size: int = 500
+    context_token_budget: int = 3000
+    recent_messages_window: int = 20
+    # Rolling summary of turns older than the window, refreshed every
+    # context_summary_batch messages once a chat has context_summary_after
+    context_summaries: bool = True
+    context_summary_after: int = 40
+    context_summary_batch: int = 10
+    # Bearer JWT verification (see auth.py); unset keeps the API single-tenant
+    auth_jwt_key: Optional[str] = None
+    auth_jwt_algorithms: List[str] = field(default_factory=lambda: ["HS256"])
+    auth_jwt_audience: Optional[str] = None
+    # WebSocket tickets (see auth.py); the key defaults to an HS* AUTH_JWT_KEY
+    ws_ticket_key: Optional[str] = None
+    ws_ticket_ttl: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        env = os.environ
+        return cls(
+            mongo_url=env['MONGO_URL'],
+            db_name=env['DB_NAME'],
+            mongo_max_pool_size=int(env.get('MONGO_MAX_POOL_SIZE', 50)),
+            mongo_min_pool_size=int(env.get('MONGO_MIN_POOL_SIZE', 5)),
+            mongo_max_idle_ms=int(env.get('MONGO_MAX_IDLE_MS', 60_000)),
+            mongo_timeout_ms=int(env.get('MONGO_TIMEOUT_MS', 5_000)),
+            workers=int(env.get('WEB_CONCURRENCY', 1)),
+            host=env.get('HOST', "0.0.0.0"),
+            port=int(env.get('PORT', 8001)),
+            drain_timeout=float(env.get('DRAIN_TIMEOUT', 30)),
+            flush_timeout=float(env.get('FLUSH_TIMEOUT', 10)),
+            warmup=env.get('WARMUP', '1') != '0',
+            ai_backend=env.get('AI_BACKEND'),
+            search_backend=env.get('SEARCH_BACKEND'),
+            chat_cache_redis_url=env.get('CHAT_CACHE_REDIS_URL'),
+            chat_events_redis_url=env.get('CHAT_EVENTS_REDIS_URL'),
+            title_workers=int(env.get('TITLE_WORKERS', 2)),
+            purge_batch_size=int(env.get('PURGE_BATCH_SIZE', 500)),
+            context_token_budget=int(env.get('CONTEXT_TOKEN_BUDGET', 3000)),
+            recent_messages_window=int(env.get('RECENT_MESSAGES_WINDOW', 20)),
+            context_summaries=env.get('CONTEXT_SUMMARIES', '1') != '0',
+            context_summary_after=int(env.get('CONTEXT_SUMMARY_AFTER', 40)),
+            context_summary_batch=int(env.get('CONTEXT_SUMMARY_BATCH', 10)),
+            auth_jwt_key=env.get('AUTH_JWT_KEY'),
+            auth_jwt_algorithms=env.get('AUTH_JWT_ALGORITHMS', 'HS256').split(','),
+            auth_jwt_audience=env.get('AUTH_JWT_AUDIENCE'),
+            ws_ticket_key=env.get('WS_TICKET_KEY'),
+            ws_ticket_ttl=float(env.get('WS_TICKET_TTL', 30)),
+        )
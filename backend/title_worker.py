@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class TitleWorkerPool:
+    """
+    In-process asyncio worker pool that generates chat titles off the
+    request path. Jobs are retried with exponential backoff; the chat keeps
+    its placeholder title until a job succeeds, and a title the user has
+    changed in the meantime is never overwritten.
+    """
+
+    def __init__(
+        self,
+        db,
+        generate_title: Callable[[str], Awaitable[str]],
+        concurrency: int = 2,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        max_queue_size: int = 1000,
+        on_title: Optional[Callable[[str, str], Awaitable[None]]] = None
+    ):
+        self.db = db
+        self.generate_title = generate_title
+        self.on_title = on_title
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.workers = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.workers:
+            return
+        self.workers = [
+            asyncio.create_task(self._worker(), name=f"title-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Title worker pool started with {self.concurrency} workers")
+
+    async def stop(self, timeout: Optional[float] = 10.0):
+        """Let queued jobs finish for up to `timeout` seconds, then cancel workers"""
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Title worker pool stopped with {self.queue.qsize()} jobs pending")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def submit(self, chat_id: str, first_message: str, placeholder_title: str) -> bool:
+        """Queue a title job; returns False if the queue is full"""
+        try:
+            self.queue.put_nowait((chat_id, first_message, placeholder_title))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Title queue full, keeping placeholder title for chat {chat_id}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._process(*job)
+            except Exception as e:
+                logger.error(f"Unexpected error in title worker: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, chat_id: str, first_message: str, placeholder_title: str):
+        for attempt in range(self.max_retries + 1):
+            try:
+                title = await self.generate_title(first_message)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.failed += 1
+                    logger.warning(f"Giving up on title for chat {chat_id}: {str(e)}")
+                    return
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+
+        # Only replace the placeholder; a rename (or delete) in the meantime wins
+        result = await self.db.chats.update_one(
+            {"id": chat_id, "title": placeholder_title, "deletedAt": None},
+            {"$set": {"title": title, "updatedAt": datetime.utcnow()}}
+        )
+        if result.modified_count and self.on_title:
+            await self.on_title(chat_id, title)
+        self.completed += 1
+        logger.info(f"Generated title for chat {chat_id}")
@@ -8,16 +8,43 @@ import { Card, CardContent } from "./ui/card";
 import { Sheet, SheetContent, SheetTrigger } from "./ui/sheet";
 import { DropdownMenu, DropdownMenuContent, DropdownMenuItem, DropdownMenuTrigger, DropdownMenuSeparator } from "./ui/dropdown-menu";
 import { AlertDialog, AlertDialogAction, AlertDialogCancel, AlertDialogContent, AlertDialogDescription, AlertDialogFooter, AlertDialogHeader, AlertDialogTitle, AlertDialogTrigger } from "./ui/alert-dialog";
-import { chatAPI } from "../utils/api";
+import { chatAPI, openChatSocket } from "../utils/api";
+import { formatMessageTime } from "../lib/utils";
 import { useToast } from "../hooks/use-toast";
 import SettingsModal from "./SettingsModal";
 import UserProfileModal from "./UserProfileModal";
 
+// Wrap the [start, end) ranges the search API returns in <mark>
+const renderHighlights = (snippet, ranges) => {
+  const parts = [];
+  let last = 0;
+  ranges.forEach(([start, end], index) => {
+    if (start > last) parts.push(snippet.slice(last, start));
+    parts.push(<mark key={index} className="bg-yellow-100 rounded-sm">{snippet.slice(start, end)}</mark>);
+    last = end;
+  });
+  parts.push(snippet.slice(last));
+  return parts;
+};
+
+const toMessage = (message) => ({
+  id: message.id,
+  text: message.text,
+  sender: message.sender,
+  timestamp: message.timestamp,
+  timestampMs: message.timestampMs
+});
+
 const ChatInterface = () => {
   const [messages, setMessages] = useState([]);
   const [inputValue, setInputValue] = useState("");
   const [isTyping, setIsTyping] = useState(false);
   const [chatHistory, setChatHistory] = useState([]);
+  const [chatsCursor, setChatsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+  const [searchQuery, setSearchQuery] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
   const [currentChatId, setCurrentChatId] = useState(null);
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [isLoading, setIsLoading] = useState(false);
@@ -32,6 +59,12 @@ const ChatInterface = () => {
   const fileInputRef = useRef(null);
   const imageInputRef = useRef(null);
   const messagesEndRef = useRef(null);
+  // Live channel for the open chat, and the send it is waiting on
+  const socketRef = useRef(null);
+  const pendingSendRef = useRef(null);
+  // Reply being streamed over SSE; the socket's copy of its events is skipped
+  const streamingIdRef = useRef(null);
+  const lastMessageIdRef = useRef(null);
   const { toast } = useToast();
 
   const suggestionCards = [
@@ -57,20 +90,179 @@ const ChatInterface = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Only follow new messages; prepending earlier history keeps the scroll position
+  const lastMessageId = messages[messages.length - 1]?.id;
   useEffect(() => {
+    lastMessageIdRef.current = lastMessageId;
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
+
+  // Insert or replace messages by id, keeping their order
+  const upsertMessages = (incoming) => {
+    setMessages(prev => {
+      const byId = new Map(incoming.map(message => [message.id, toMessage(message)]));
+      const known = new Set(prev.map(msg => msg.id));
+      return [
+        ...prev.map(msg => byId.get(msg.id) || msg),
+        ...incoming.filter(message => !known.has(message.id)).map(toMessage)
+      ];
+    });
+  };
+
+  const appendToken = (messageId, text) => {
+    setMessages(prev => prev.some(msg => msg.id === messageId)
+      ? prev.map(msg =>
+          msg.id === messageId ? { ...msg, text: msg.text + text } : msg
+        )
+      : [...prev, { id: messageId, text, sender: "ai", timestamp: "" }]
+    );
+  };
+
+  // Merge a pushed chat summary; chats with newer activity move to the top
+  const upsertChat = (chat) => {
+    setChatHistory(prev => {
+      const existing = prev.find(item => item.id === chat.id);
+      if (!existing) return [chat, ...prev];
+      const merged = { ...existing, ...chat };
+      return merged.timestampMs > existing.timestampMs
+        ? [merged, ...prev.filter(item => item.id !== chat.id)]
+        : prev.map(item => (item.id === chat.id ? merged : item));
+    });
+  };
+
+  // Every tab and device with the chat open gets the same events, so the
+  // view stays in sync without refetching after each action
+  useEffect(() => {
+    if (!currentChatId) return;
+    const chatId = currentChatId;
+
+    const handleEvent = (event) => {
+      switch (event.type) {
+        case "start":
+          if (pendingSendRef.current?.text === event.userMessage.text) pendingSendRef.current.started = true;
+          if (event.aiMessageId !== streamingIdRef.current) upsertMessages([event.userMessage]);
+          break;
+        case "token":
+          if (event.messageId === streamingIdRef.current) break;
+          setIsTyping(false);
+          appendToken(event.messageId, event.text);
+          break;
+        case "messages":
+          upsertMessages(event.messages);
+          if (event.messages.some(message => message.sender === "ai")) {
+            pendingSendRef.current = null;
+            setIsTyping(false);
+          }
+          break;
+        case "failed":
+          setMessages(prev => prev.filter(msg =>
+            msg.id !== event.aiMessageId && (event.saved || msg.id !== event.userMessageId)
+          ));
+          break;
+        case "error": {
+          // Only the sending tab gets these
+          const pending = pendingSendRef.current;
+          pendingSendRef.current = null;
+          setIsTyping(false);
+          if (pending?.restoreInput) setInputValue(pending.text);
+          toast({
+            title: "Error",
+            description: event.detail || "Failed to send message. Please try again.",
+            variant: "destructive"
+          });
+          break;
+        }
+        case "chat":
+          upsertChat(event.chat);
+          break;
+        case "deleted":
+          setChatHistory(prev => prev.filter(chat => !event.chatIds.includes(chat.id)));
+          if (event.chatIds.includes(chatId)) {
+            setCurrentChatId(null);
+            setMessages([]);
+            setMessagesCursor(null);
+          }
+          break;
+        default:
+          break;
+      }
+    };
+
+    // Catch up on whatever was pushed while the socket was down
+    const catchUp = async () => {
+      try {
+        const since = lastMessageIdRef.current;
+        const { messages: missed } = await chatAPI.getMessages(chatId, since ? { since } : {});
+        upsertMessages(missed);
+        const { chats, nextCursor } = await chatAPI.getChats();
+        setChatHistory(chats);
+        setChatsCursor(nextCursor);
+      } catch (error) {
+        console.error('Error catching up after reconnect:', error);
+      }
+    };
+
+    // Closing the socket cancels its reply: stop waiting for it. Once the
+    // reply started the server keeps the question and catchUp brings it
+    // back; before that, hand the text back to the input.
+    const dropPendingSend = () => {
+      const pending = pendingSendRef.current;
+      if (!pending) return;
+      pendingSendRef.current = null;
+      setIsTyping(false);
+      if (!pending.started && pending.restoreInput) setInputValue(pending.text);
+      toast({
+        title: "Connection lost",
+        description: "The reply was interrupted. Please send your message again.",
+        variant: "destructive"
+      });
+    };
+
+    const socket = openChatSocket(chatId, {
+      onEvent: handleEvent,
+      onReconnect: catchUp,
+      onDisconnect: dropPendingSend
+    });
+    socketRef.current = socket;
+    return () => {
+      socket.close();
+      if (socketRef.current === socket) socketRef.current = null;
+    };
+  }, [currentChatId]);
 
   // Load chat history on component mount
   useEffect(() => {
     loadChatHistory();
   }, []);
 
+  // Debounced search; an empty query goes back to the chat list
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const { hits } = await chatAPI.searchChats(query);
+        if (!cancelled) setSearchResults(hits);
+      } catch (error) {
+        console.error('Error searching chats:', error);
+      }
+    }, 250);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
   const loadChatHistory = async () => {
     try {
       setIsLoadingChats(true);
-      const chats = await chatAPI.getChats();
+      const { chats, nextCursor } = await chatAPI.getChats();
       setChatHistory(chats);
+      setChatsCursor(nextCursor);
       
       // If we have chats but no current chat selected, select the first one
       if (chats.length > 0 && !currentChatId) {
@@ -93,35 +285,60 @@ const ChatInterface = () => {
     if (!textToSend.trim() || isTyping) return;
 
     // If no current chat, create one first
-    if (!currentChatId) {
-      await startNewChat();
-    }
+    const chatId = currentChatId || await startNewChat();
+    if (!chatId) return;
 
     if (!messageText) setInputValue("");
     setIsTyping(true);
 
+    // Over the socket the reply streams to every open tab, this one included
+    pendingSendRef.current = { text: textToSend, restoreInput: !messageText };
+    if (chatId === currentChatId && socketRef.current?.send({ type: "send", message: textToSend })) {
+      return;
+    }
+    pendingSendRef.current = null;
+
     try {
-      const response = await chatAPI.sendMessage(currentChatId, textToSend);
-      
-      // Add both user message and AI response to messages
-      setMessages(prev => [
-        ...prev,
-        {
-          id: response.userMessage.id,
-          text: response.userMessage.text,
-          sender: response.userMessage.sender,
-          timestamp: response.userMessage.timestamp
+      let aiMessageId = null;
+      const response = await chatAPI.streamMessage(chatId, textToSend, {
+        onStart: ({ userMessage, aiMessageId: id }) => {
+          aiMessageId = id;
+          streamingIdRef.current = id;
+          setMessages(prev => [
+            ...prev,
+            {
+              id: userMessage.id,
+              text: userMessage.text,
+              sender: userMessage.sender,
+              timestamp: userMessage.timestamp,
+              timestampMs: userMessage.timestampMs
+            }
+          ]);
         },
-        {
-          id: response.aiResponse.id,
-          text: response.aiResponse.text,
-          sender: response.aiResponse.sender,
-          timestamp: response.aiResponse.timestamp
+        onToken: (text) => {
+          // First token replaces the typing indicator with the streamed reply
+          setIsTyping(false);
+          setMessages(prev => prev.some(msg => msg.id === aiMessageId)
+            ? prev.map(msg =>
+                msg.id === aiMessageId ? { ...msg, text: msg.text + text } : msg
+              )
+            : [...prev, { id: aiMessageId, text, sender: "ai", timestamp: "" }]
+          );
         }
-      ]);
+      });
 
-      // Refresh chat history to update message counts and titles
-      await loadChatHistory();
+      // Replace the streamed placeholder with the persisted AI message
+      setMessages(prev => prev.map(msg =>
+        msg.id === aiMessageId
+          ? {
+              id: response.aiResponse.id,
+              text: response.aiResponse.text,
+              sender: response.aiResponse.sender,
+              timestamp: response.aiResponse.timestamp,
+              timestampMs: response.aiResponse.timestampMs
+            }
+          : msg
+      ));
 
     } catch (error) {
       console.error('Error sending message:', error);
@@ -134,6 +351,7 @@ const ChatInterface = () => {
       // Put the message back in the input field if it was typed
       if (!messageText) setInputValue(textToSend);
     } finally {
+      streamingIdRef.current = null;
       setIsTyping(false);
     }
   };
@@ -160,6 +378,7 @@ const ChatInterface = () => {
       // Switch to new chat
       setCurrentChatId(newChat.id);
       setMessages([]);
+      setMessagesCursor(null);
       setSidebarOpen(false);
       
       toast({
@@ -185,9 +404,10 @@ const ChatInterface = () => {
       setIsLoading(true);
       setCurrentChatId(chatId);
       
-      // Load messages for the selected chat
-      const messages = await chatAPI.getMessages(chatId);
+      // Load the latest page of messages for the selected chat
+      const { messages, nextCursor } = await chatAPI.getMessages(chatId);
       setMessages(messages);
+      setMessagesCursor(nextCursor);
       setSidebarOpen(false);
       
     } catch (error) {
@@ -202,6 +422,46 @@ const ChatInterface = () => {
     }
   };
 
+  const loadMoreChats = async () => {
+    if (!chatsCursor || isLoadingMore) return;
+    try {
+      setIsLoadingMore(true);
+      const { chats, nextCursor } = await chatAPI.getChats({ before: chatsCursor });
+      setChatHistory(prev => [...prev, ...chats]);
+      setChatsCursor(nextCursor);
+    } catch (error) {
+      console.error('Error loading more chats:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load more chats",
+        variant: "destructive"
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
+  const loadEarlierMessages = async () => {
+    if (!currentChatId || !messagesCursor || isLoadingMore) return;
+    try {
+      setIsLoadingMore(true);
+      const { messages: earlier, nextCursor } = await chatAPI.getMessages(currentChatId, {
+        before: messagesCursor
+      });
+      setMessages(prev => [...earlier, ...prev]);
+      setMessagesCursor(nextCursor);
+    } catch (error) {
+      console.error('Error loading earlier messages:', error);
+      toast({
+        title: "Error",
+        description: "Failed to load earlier messages",
+        variant: "destructive"
+      });
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const deleteChat = async (chatId, e) => {
     if (e) e.stopPropagation();
     
@@ -212,6 +472,7 @@ const ChatInterface = () => {
       if (currentChatId === chatId) {
         setCurrentChatId(null);
         setMessages([]);
+        setMessagesCursor(null);
       }
       
       toast({
@@ -245,14 +506,15 @@ const ChatInterface = () => {
 
   const deleteAllChats = async () => {
     try {
-      // Delete all chats
-      const deletePromises = chatHistory.map(chat => chatAPI.deleteChat(chat.id));
-      await Promise.all(deletePromises);
+      // The server deletes every chat, including pages not loaded yet
+      await chatAPI.deleteAllChats();
       
       // Clear local state
       setChatHistory([]);
+      setChatsCursor(null);
       setCurrentChatId(null);
       setMessages([]);
+      setMessagesCursor(null);
       
       toast({
         title: "All chats deleted",
@@ -364,9 +626,42 @@ const ChatInterface = () => {
         </div>
       </div>
       
+      {/* Search */}
+      <div className="px-2 pt-2">
+        <Input
+          value={searchQuery}
+          onChange={(e) => setSearchQuery(e.target.value)}
+          placeholder="Search chats..."
+          className="h-8 text-sm"
+        />
+      </div>
+
       {/* Chat History */}
       <ScrollArea className="flex-1">
-        {isLoadingChats ? (
+        {searchResults !== null ? (
+          <div className="p-2">
+            {searchResults.map((hit) => (
+              <div
+                key={hit.messageId || hit.chatId}
+                onClick={() => {
+                  setSearchQuery("");
+                  selectChat(hit.chatId);
+                }}
+                className="px-3 py-2 rounded-lg cursor-pointer transition-colors text-sm mb-1 hover:bg-gray-50"
+              >
+                <p className="text-gray-900 truncate font-medium">{hit.chatTitle}</p>
+                {hit.messageId && (
+                  <p className="text-xs text-gray-500 line-clamp-2">
+                    {renderHighlights(hit.snippet, hit.highlights)}
+                  </p>
+                )}
+              </div>
+            ))}
+            {searchResults.length === 0 && (
+              <p className="text-center py-8 text-sm text-gray-500">No matches</p>
+            )}
+          </div>
+        ) : isLoadingChats ? (
           <div className="flex items-center justify-center py-8">
             <Loader2 className="animate-spin" size={20} />
           </div>
@@ -401,6 +696,18 @@ const ChatInterface = () => {
                 </div>
               </div>
             ))}
+
+            {chatsCursor && (
+              <Button
+                variant="ghost"
+                size="sm"
+                className="w-full text-xs text-gray-500"
+                onClick={loadMoreChats}
+                disabled={isLoadingMore}
+              >
+                {isLoadingMore ? <Loader2 className="animate-spin" size={14} /> : "Load more chats"}
+              </Button>
+            )}
             
             {chatHistory.length === 0 && (
               <div className="text-center py-8 text-gray-500">
@@ -700,6 +1007,19 @@ const ChatInterface = () => {
             <ScrollArea className="h-full">
               <div className="max-w-4xl mx-auto px-4 py-4">
                 <div className="space-y-4">
+                  {messagesCursor && (
+                    <div className="text-center">
+                      <Button
+                        variant="ghost"
+                        size="sm"
+                        className="text-xs text-gray-500"
+                        onClick={loadEarlierMessages}
+                        disabled={isLoadingMore}
+                      >
+                        {isLoadingMore ? <Loader2 className="animate-spin" size={14} /> : "Load earlier messages"}
+                      </Button>
+                    </div>
+                  )}
                   {messages.map((message) => (
                     <div
                       key={message.id}
@@ -737,7 +1057,7 @@ const ChatInterface = () => {
                             {message.text}
                           </p>
                           <span className="text-xs opacity-70 mt-1 block">
-                            {message.timestamp}
+                            {formatMessageTime(message)}
                           </span>
                         </div>
                       </div>
@@ -4,3 +4,9 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Local wall-clock time for an epoch-ms timestamp from the API
+export function formatMessageTime(message) {
+  if (!message.timestampMs) return message.timestamp;
+  return new Date(message.timestampMs).toLocaleTimeString([], { hour: "2-digit", minute: "2-digit" });
+}
@@ -2,6 +2,9 @@ import axios from 'axios';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+const WS_API = API.replace(/^http/, 'ws');
+
+const authToken = () => localStorage.getItem('authToken');
 
 // Create axios instance with default config
 const apiClient = axios.create({
@@ -12,9 +15,13 @@ const apiClient = axios.create({
   },
 });
 
-// Request interceptor for logging
+// Request interceptor for auth and logging
 apiClient.interceptors.request.use(
   (config) => {
+    const token = authToken();
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
     console.log(`API Request: ${config.method?.toUpperCase()} ${config.url}`);
     return config;
   },
@@ -43,9 +50,13 @@ export const chatAPI = {
     return response.data;
   },
 
-  getChats: async () => {
-    const response = await apiClient.get('/chats');
-    return response.data;
+  // Paginated: pass the returned nextCursor as `before` to load older chats
+  getChats: async ({ before = null, limit } = {}) => {
+    const response = await apiClient.get('/chats', { params: { before, limit } });
+    return {
+      chats: response.data,
+      nextCursor: response.headers['x-next-cursor'] || null
+    };
   },
 
   getChat: async (chatId) => {
@@ -58,6 +69,18 @@ export const chatAPI = {
     return response.data;
   },
 
+  // Delete several chats in one request
+  deleteChats: async (chatIds) => {
+    const response = await apiClient.delete('/chats', { data: { ids: chatIds } });
+    return response.data;
+  },
+
+  // Delete every chat of the user, not just the loaded pages
+  deleteAllChats: async () => {
+    const response = await apiClient.delete('/chats', { params: { all: true } });
+    return response.data;
+  },
+
   updateChat: async (chatId, title) => {
     const response = await apiClient.put(`/chats/${chatId}`, { title });
     return response.data;
@@ -72,10 +95,143 @@ export const chatAPI = {
     return response.data;
   },
 
-  getMessages: async (chatId) => {
-    const response = await apiClient.get(`/chats/${chatId}/messages`);
-    return response.data;
+  // Streams the AI reply over Server-Sent Events. Callbacks:
+  //   onStart({ userMessage, aiMessageId }), onToken(text)
+  // Resolves with the final { userMessage, aiResponse } payload.
+  streamMessage: async (chatId, message, { sessionId = null, onStart, onToken, signal } = {}) => {
+    const response = await fetch(`${API}/chats/${chatId}/messages/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(authToken() ? { Authorization: `Bearer ${authToken()}` } : {}),
+      },
+      body: JSON.stringify({ message, sessionId }),
+      signal,
+    });
+    if (!response.ok) {
+      throw new Error(`Stream request failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach((line) => {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        });
+        const payload = data ? JSON.parse(data) : {};
+
+        if (event === 'start') onStart?.(payload);
+        else if (event === 'token') onToken?.(payload.text);
+        else if (event === 'done') result = payload;
+        else if (event === 'error') throw new Error(payload.detail || 'Stream failed');
+      }
+    }
+
+    if (!result) {
+      throw new Error('Stream ended before completion');
+    }
+    return result;
+  },
+
+  // Ranked hits over message text and chat titles; pass nextCursor as
+  // `cursor` for the next page
+  searchChats: async (q, { cursor = null, limit } = {}) => {
+    const response = await apiClient.get('/search', { params: { q, cursor, limit } });
+    return {
+      hits: response.data,
+      nextCursor: response.headers['x-next-cursor'] || null
+    };
+  },
+
+  // Paginated: returns the latest page first; pass nextCursor as `before`
+  // to load earlier history incrementally;
+  // Pass `since` (a message id) to fetch only the messages after it
+  getMessages: async (chatId, { before = null, since = null, limit } = {}) => {
+    const response = await apiClient.get(`/chats/${chatId}/messages`, {
+      params: { before, since, limit }
+    });
+    return {
+      messages: response.data,
+      nextCursor: response.headers['x-next-cursor'] || null
+    };
   },
 };
 
+// Live channel for one chat: onEvent receives every pushed event (start,
+// token, messages, failed, error for this chat; chat and deleted for the
+// chat list). Reconnects with backoff; onDisconnect runs when the socket
+// drops and onReconnect once it is back, so the caller can reset what was
+// in flight and catch up on what it missed. send() returns false while
+// disconnected.
+export const openChatSocket = (chatId, { onEvent, onReconnect, onDisconnect } = {}) => {
+  let socket = null;
+  let closed = false;
+  let attempts = 0;
+  let retryTimer = null;
+
+  const retry = () => {
+    attempts += 1;
+    retryTimer = setTimeout(connect, Math.min(1000 * 2 ** (attempts - 1), 30000));
+  };
+
+  const connect = async () => {
+    // A short-lived ticket keeps the bearer token out of the URL (and logs)
+    let query = '';
+    if (authToken()) {
+      try {
+        const response = await apiClient.post('/ws-ticket');
+        query = `?ticket=${encodeURIComponent(response.data.ticket)}`;
+      } catch (error) {
+        if (!closed) retry();
+        return;
+      }
+    }
+    if (closed) return;
+
+    socket = new WebSocket(`${WS_API}/ws/chats/${chatId}${query}`);
+    socket.onopen = () => {
+      if (attempts > 0) onReconnect?.();
+      attempts = 0;
+    };
+    socket.onmessage = (message) => onEvent?.(JSON.parse(message.data));
+    socket.onclose = (event) => {
+      if (closed) return;
+      onDisconnect?.();
+      // 1008: unknown chat or bad ticket, retrying will not help
+      if (event.code === 1008) return;
+      retry();
+    };
+  };
+  connect();
+
+  return {
+    send: (payload) => {
+      if (socket?.readyState !== WebSocket.OPEN) return false;
+      socket.send(JSON.stringify(payload));
+      return true;
+    },
+    close: () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket?.close();
+    },
+  };
+};
+
 export default apiClient;
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Raw ASGI requests for tests that need the client to disconnect mid-request,
+which TestClient and httpx cannot do.
+"""
+
+import asyncio
+import json
+from typing import Callable, Optional
+
+async def request_until_disconnect(
+    app,
+    method: str,
+    path: str,
+    json_body: Optional[dict] = None,
+    headers: Optional[dict] = None,
+    disconnect: Optional[asyncio.Event] = None,
+    on_body: Optional[Callable[[str], None]] = None
+) -> dict:
+    """
+    Send one request and return {"status", "chunks"}. After the request body,
+    receive() reports http.disconnect as soon as `disconnect` is set (the
+    caller sets it from on_body, a timer, ...).
+    """
+    body = json.dumps(json_body).encode() if json_body is not None else b""
+    disconnect = disconnect or asyncio.Event()
+    raw_headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+    }
+    body_sent = False
+    response = {"status": None, "chunks": []}
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            chunk = message.get("body", b"").decode()
+            response["chunks"].append(chunk)
+            if on_body:
+                on_body(chunk)
+
+    await app(scope, receive, send)
+    return response
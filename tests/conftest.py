@@ -0,0 +1,101 @@
+"""
+Shared fixtures. The backend runs against mongomock (mongomock-motor) and
+the fake AI backend, so the suite needs neither mongod nor an LLM key:
+
+    pip install -r backend/requirements-dev.txt
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "matchelor_test")
+# One process, so the in-process chat cache is safe (it is opt-in)
+os.environ.setdefault("CHAT_CACHE_SIZE", "10000")
+
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from fake_ai_service import FakeAIService
+from settings import Settings
+
+JWT_KEY = "matchelor-test-signing-secret-0123456789"
+
+def make_settings(**overrides) -> Settings:
+    options = {
+        "mongo_url": os.environ["MONGO_URL"],
+        "db_name": os.environ["DB_NAME"],
+        "ai_backend": "fake",
+        "search_backend": "memory",
+        "warmup": False,
+        **overrides
+    }
+    return Settings(**options)
+
+def make_token(user_id: str, expires_in: float = 3600) -> str:
+    claims = {"sub": user_id, "exp": datetime.utcnow() + timedelta(seconds=expires_in)}
+    return jwt.encode(claims, JWT_KEY, algorithm="HS256")
+
+def auth_headers(user_id: str) -> dict:
+    return {"Authorization": f"Bearer {make_token(user_id)}"}
+
+def socket_ticket(client, user_id: str) -> str:
+    """A WebSocket ticket for the user, as the browser gets one"""
+    response = client.post("/api/ws-ticket", headers=auth_headers(user_id))
+    assert response.status_code == 200
+    return response.json()["ticket"]
+
+async def finish_background_tasks(services: server.Services):
+    """Wait for partial saves, summaries and other writes started with run_in_background"""
+    while services.background_tasks:
+        await asyncio.gather(*list(services.background_tasks), return_exceptions=True)
+
+@pytest.fixture
+def anyio_backend():
+    """The backend is asyncio-only (Motor, asyncio tasks and queues)"""
+    return "asyncio"
+
+@pytest.fixture
+def make_app():
+    """
+    Build an app with create_app (so the services are wired as in
+    production), then point it at a fresh mongomock database and a fake AI
+    backend without artificial latency
+    """
+    def build(**overrides):
+        app = server.create_app(make_settings(**overrides))
+        services = app.state.services
+        db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+        services.db = db
+        services.title_worker.db = db
+        services.purge_worker.db = db
+        services.ai_service = FakeAIService(first_token_delay=0, token_delay=0)
+        services.title_worker.generate_title = services.ai_service.generate_chat_title
+        return app
+    return build
+
+@pytest.fixture
+def app(make_app):
+    """App for direct ASGI calls; the lifespan (indexes, workers) does not run"""
+    return make_app()
+
+@pytest.fixture
+def client(make_app):
+    with TestClient(make_app()) as test_client:
+        yield test_client
+
+@pytest.fixture
+def auth_client(make_app):
+    """Client for an app that requires bearer JWTs signed with JWT_KEY"""
+    with TestClient(make_app(auth_jwt_key=JWT_KEY)) as test_client:
+        yield test_client
@@ -0,0 +1,62 @@
+"""AIService client sessions, against a stand-in for the LLM SDK"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+from ai_service import AIService
+
+class RecordingLlmChat:
+    created = []
+
+    def __init__(self, api_key, session_id, system_message):
+        self.session_id = session_id
+        self.sent = []
+        RecordingLlmChat.created.append(self)
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        self.sent.append(message.text)
+        return f"summary for {self.session_id}"
+
+@pytest.fixture
+def service(monkeypatch):
+    RecordingLlmChat.created = []
+    sdk = SimpleNamespace(LlmChat=RecordingLlmChat, UserMessage=lambda text: SimpleNamespace(text=text))
+    monkeypatch.setattr(ai_service, "llm_sdk", lambda: sdk)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    return AIService()
+
+@pytest.mark.anyio
+async def test_summaries_use_a_fresh_session_per_chat(service):
+    turns = [{"sender": "user", "text": "Budget is 400k in Denver"}]
+
+    first = await service.summarize_conversation("chat-a", None, turns)
+    await service.summarize_conversation("chat-b", "Looking in Denver", turns)
+    await service.summarize_conversation("chat-a", first, turns)
+
+    assert [chat.session_id for chat in RecordingLlmChat.created] == ["summary_chat-a", "summary_chat-b", "summary_chat-a"]
+    assert all(len(chat.sent) == 1 for chat in RecordingLlmChat.created)
+
+@pytest.mark.anyio
+async def test_warm_up_creates_no_client(service):
+    await service.warm_up()
+
+    assert RecordingLlmChat.created == []
+
+@pytest.mark.anyio
+async def test_replies_and_titles_do_not_reuse_client_history(service):
+    history = [{"sender": "user", "text": "Budget is 400k"}, {"sender": "ai", "text": "Noted"}]
+
+    for question in ("What about Denver?", "And Austin?"):
+        await service.chat_with_ai(question, chat_history=history, session_id="chat_alice_chat-a")
+    for _ in range(2):
+        await service.generate_chat_title("Is escrow refundable?")
+
+    # One client per call, each sending only the prompt built for it
+    assert [len(chat.sent) for chat in RecordingLlmChat.created] == [1, 1, 1, 1]
+    assert RecordingLlmChat.created[1].sent[0].endswith("Current user message:\nAnd Austin?")
+    assert "What about Denver?" not in RecordingLlmChat.created[1].sent[0]
@@ -0,0 +1,108 @@
+"""Bearer JWT auth: every chat route is scoped to the token's user"""
+
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from fastapi.testclient import TestClient
+
+from tests.conftest import JWT_KEY, auth_headers, make_token, socket_ticket
+
+ALICE, BOB = "alice", "bob"
+
+@pytest.fixture
+def alice_chat(auth_client):
+    headers = auth_headers(ALICE)
+    chat_id = auth_client.post("/api/chats", json={}, headers=headers).json()["id"]
+    response = auth_client.post(f"/api/chats/{chat_id}/messages", json={"message": "My budget is 400k"}, headers=headers)
+    assert response.status_code == 200
+    return chat_id
+
+def export_records(client, user_id: str) -> list:
+    response = client.get("/api/export", headers=auth_headers(user_id))
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_other_users_chat_is_404_on_every_route(auth_client, alice_chat):
+    bob = auth_headers(BOB)
+
+    assert auth_client.get(f"/api/chats/{alice_chat}", headers=bob).status_code == 404
+    assert auth_client.get(f"/api/chats/{alice_chat}/messages", headers=bob).status_code == 404
+    assert auth_client.post(f"/api/chats/{alice_chat}/messages", json={"message": "hi"}, headers=bob).status_code == 404
+    assert auth_client.post(
+        f"/api/chats/{alice_chat}/messages/stream", json={"message": "hi"}, headers=bob
+    ).status_code == 404
+    assert auth_client.put(f"/api/chats/{alice_chat}", json={"title": "Mine now"}, headers=bob).status_code == 404
+    assert auth_client.delete(f"/api/chats/{alice_chat}", headers=bob).status_code == 404
+
+    # Bulk deletes skip ids the user does not own
+    auth_client.request("DELETE", "/api/chats", json={"ids": [alice_chat]}, headers=bob)
+    auth_client.delete("/api/chats", params={"all": True}, headers=bob)
+
+    alice = auth_headers(ALICE)
+    chat = auth_client.get(f"/api/chats/{alice_chat}", headers=alice).json()
+    assert chat["title"] != "Mine now"
+    assert len(chat["messages"]) == 2
+
+def test_lists_search_and_export_only_show_own_chats(auth_client, alice_chat):
+    bob = auth_headers(BOB)
+
+    assert auth_client.get("/api/chats", headers=bob).json() == []
+    assert auth_client.get("/api/search", params={"q": "budget"}, headers=bob).json() == []
+    assert [record["type"] for record in export_records(auth_client, BOB)] == ["header"]
+
+    assert auth_client.get("/api/search", params={"q": "budget"}, headers=auth_headers(ALICE)).json() != []
+    alice_records = export_records(auth_client, ALICE)
+    assert [record["data"]["id"] for record in alice_records if record["type"] == "chat"] == [alice_chat]
+
+def test_other_users_chat_socket_is_refused(auth_client, alice_chat):
+    with pytest.raises(WebSocketDisconnect) as refused:
+        with auth_client.websocket_connect(f"/api/ws/chats/{alice_chat}?ticket={socket_ticket(auth_client, BOB)}") as socket:
+            socket.receive_text()
+    assert refused.value.code == 1008
+
+    with auth_client.websocket_connect(f"/api/ws/chats/{alice_chat}?ticket={socket_ticket(auth_client, ALICE)}") as socket:
+        socket.send_text(json.dumps({"type": "ping"}))
+        assert json.loads(socket.receive_text()) == {"type": "pong"}
+
+@pytest.mark.parametrize("headers", [
+    {},
+    {"Authorization": "Basic YWxpY2U6c2VjcmV0"},
+    {"Authorization": f"Bearer {make_token(ALICE, expires_in=-60)}"},
+    {"Authorization": "Bearer not-a-jwt"},
+], ids=["missing", "not-bearer", "expired", "malformed"])
+def test_requests_without_a_valid_token_are_401(auth_client, headers):
+    for method, path in [("GET", "/api/chats"), ("POST", "/api/chats"), ("GET", "/api/export")]:
+        response = auth_client.request(method, path, json={} if method == "POST" else None, headers=headers)
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+def test_socket_without_a_valid_ticket_is_refused(auth_client, alice_chat):
+    # A bearer token is not a ticket, even a valid one
+    for query in ("", "?ticket=not-a-jwt", f"?ticket={make_token(ALICE)}", f"?token={make_token(ALICE)}"):
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with auth_client.websocket_connect(f"/api/ws/chats/{alice_chat}{query}") as socket:
+                socket.receive_text()
+        assert refused.value.code == 1008
+
+def test_ticket_is_not_a_bearer_token(auth_client):
+    ticket = socket_ticket(auth_client, ALICE)
+
+    response = auth_client.get("/api/chats", headers={"Authorization": f"Bearer {ticket}"})
+
+    assert response.status_code == 401
+    assert auth_client.post("/api/ws-ticket").status_code == 401
+
+def test_expired_ticket_is_refused(make_app):
+    with TestClient(make_app(auth_jwt_key=JWT_KEY, ws_ticket_ttl=-60)) as client:
+        chat_id = client.post("/api/chats", json={}, headers=auth_headers(ALICE)).json()["id"]
+
+        with pytest.raises(WebSocketDisconnect) as refused:
+            with client.websocket_connect(f"/api/ws/chats/{chat_id}?ticket={socket_ticket(client, ALICE)}") as socket:
+                socket.receive_text()
+        assert refused.value.code == 1008
+
+def test_public_key_auth_needs_a_ticket_key(make_app):
+    with pytest.raises(ValueError, match="WS_TICKET_KEY"):
+        make_app(auth_jwt_key="-----BEGIN PUBLIC KEY-----", auth_jwt_algorithms=["RS256"])
@@ -0,0 +1,107 @@
+"""NDJSON export/import: round trips, duplicate ids and messages of chats the user does not own"""
+
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from mongomock_motor import AsyncMongoMockClient
+
+from backup import EXPORT_VERSION, encode_record, import_records, iter_lines
+from tests.conftest import JWT_KEY, auth_headers
+
+CREATED = datetime(2024, 5, 1, 12, 0, 0)
+
+def chat_record(chat_id: str) -> bytes:
+    return encode_record("chat", {"id": chat_id, "title": chat_id, "createdAt": CREATED, "updatedAt": CREATED})
+
+def message_record(message_id: str, chat_id: str) -> bytes:
+    return encode_record("message", {
+        "id": message_id, "chatId": chat_id, "text": f"text of {message_id}", "sender": "user", "timestamp": CREATED
+    })
+
+async def chunks(*records: bytes):
+    yield encode_record("header", {"version": EXPORT_VERSION})
+    for record in records:
+        yield record
+
+async def unique_id_db():
+    db = AsyncMongoMockClient()["backup_test"]
+    await db.chats.create_index("id", unique=True)
+    await db.messages.create_index("id", unique=True)
+    return db
+
+@pytest.mark.anyio
+async def test_messages_after_a_chat_batch_boundary_are_kept():
+    db = await unique_id_db()
+    written = []
+
+    stats = await import_records(
+        db, iter_lines(chunks(chat_record("chat-1"), *(message_record(f"m{i}", "chat-1") for i in range(5)))),
+        "alice", batch_size=2, on_batch=lambda record_type, docs: written.append((record_type, len(docs)))
+    )
+
+    assert (stats["chats"], stats["messages"], stats["skipped"]) == (1, 5, 0)
+    assert written == [("chat", 1), ("message", 2), ("message", 2), ("message", 1)]
+    assert {m["userId"] for m in await db.messages.find({}).to_list(None)} == {"alice"}
+
+@pytest.mark.anyio
+async def test_existing_ids_are_skipped_and_a_rerun_finishes_the_import():
+    db = await unique_id_db()
+    await import_records(db, iter_lines(chunks(chat_record("chat-1"), message_record("m1", "chat-1"))), "alice")
+
+    stats = await import_records(
+        db, iter_lines(chunks(chat_record("chat-1"), message_record("m1", "chat-1"), message_record("m2", "chat-1"))),
+        "alice"
+    )
+
+    # chat-1 is already alice's, so its new message still goes in
+    assert (stats["chats"], stats["messages"], stats["skipped"]) == (0, 1, 2)
+    assert await db.messages.count_documents({"chatId": "chat-1"}) == 2
+
+@pytest.mark.anyio
+async def test_messages_of_other_users_chats_are_skipped():
+    db = await unique_id_db()
+    await import_records(db, iter_lines(chunks(chat_record("chat-1"))), "alice")
+
+    stats = await import_records(
+        db, iter_lines(chunks(chat_record("chat-1"), message_record("m1", "chat-1"), message_record("m2", "nowhere"))),
+        "bob"
+    )
+
+    assert (stats["chats"], stats["messages"], stats["skipped"]) == (0, 0, 3)
+    assert await db.messages.count_documents({}) == 0
+    assert (await db.chats.find_one({"id": "chat-1"}))["userId"] == "alice"
+
+def test_export_round_trips_into_another_database(auth_client, make_app):
+    chat_id = auth_client.post("/api/chats", json={"title": "Denver condos"}, headers=auth_headers("alice")).json()["id"]
+    auth_client.post(f"/api/chats/{chat_id}/messages", json={"message": "HOA fees?"}, headers=auth_headers("alice"))
+    exported = auth_client.get("/api/export", headers=auth_headers("alice")).content
+
+    with TestClient(make_app(auth_jwt_key=JWT_KEY)) as other:
+        stats = other.post("/api/import", content=exported, headers=auth_headers("bob")).json()
+        chats = other.get("/api/chats", headers=auth_headers("bob")).json()
+        restored = other.get(f"/api/chats/{chat_id}/messages", headers=auth_headers("bob")).json()
+
+    assert (stats["chats"], stats["messages"], stats["skipped"]) == (1, 2, 0)
+    assert [chat["id"] for chat in chats] == [chat_id]
+    assert [m["sender"] for m in restored] == ["user", "ai"]
+    assert restored[0]["text"] == "HOA fees?"
+
+def test_importing_someone_elses_export_adds_nothing(auth_client):
+    chat_id = auth_client.post("/api/chats", json={"title": "Denver condos"}, headers=auth_headers("alice")).json()["id"]
+    auth_client.post(f"/api/chats/{chat_id}/messages", json={"message": "HOA fees?"}, headers=auth_headers("alice"))
+    exported = auth_client.get("/api/export", headers=auth_headers("alice")).content
+
+    stats = auth_client.post("/api/import", content=exported, headers=auth_headers("bob")).json()
+
+    assert (stats["chats"], stats["messages"], stats["skipped"]) == (0, 0, 3)
+    assert auth_client.get("/api/chats", headers=auth_headers("bob")).json() == []
+    assert auth_client.get(f"/api/chats/{chat_id}/messages", headers=auth_headers("bob")).status_code == 404
+
+def test_malformed_line_is_400_with_its_number(client):
+    body = chat_record("chat-1") + b"{not json}\n"
+
+    response = client.post("/api/import", content=encode_record("header", {"version": EXPORT_VERSION}) + body)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Line 3:")
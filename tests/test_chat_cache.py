@@ -0,0 +1,110 @@
+"""ChatCache over the Redis backend, with FakeRedis standing in for the server"""
+
+from datetime import datetime
+
+import pytest
+
+import fake_redis
+from chat_cache import ChatCache, RedisCacheBackend
+from fake_redis import FakeRedis
+
+CHAT = {"id": "chat-1", "title": "Denver condos", "updatedAt": datetime(2024, 5, 1, 12, 30, 15, 250000)}
+
+class Loader:
+    def __init__(self, document):
+        self.document = document
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.document
+
+@pytest.fixture
+def redis_cache():
+    return ChatCache(RedisCacheBackend(FakeRedis(), ttl=60))
+
+@pytest.mark.anyio
+async def test_second_read_is_a_hit_and_round_trips_datetimes(redis_cache):
+    load = Loader(CHAT)
+
+    first = await redis_cache.get_or_load("chat-1", load)
+    second = await redis_cache.get_or_load("chat-1", load)
+
+    assert first == second == CHAT
+    assert isinstance(second["updatedAt"], datetime)
+    assert load.calls == 1
+    assert redis_cache.stats() == {"hits": 1, "misses": 1, "errors": 0, "hit_rate": 0.5}
+
+@pytest.mark.anyio
+async def test_missing_chat_is_not_cached(redis_cache):
+    load = Loader(None)
+
+    assert await redis_cache.get_or_load("gone", load) is None
+    assert await redis_cache.get_or_load("gone", load) is None
+    assert load.calls == 2
+
+@pytest.mark.anyio
+async def test_invalidate_forces_a_reload(redis_cache):
+    await redis_cache.get_or_load("chat-1", Loader(CHAT))
+    await redis_cache.invalidate("chat-1")
+
+    renamed = {**CHAT, "title": "Denver townhomes"}
+    load = Loader(renamed)
+
+    assert await redis_cache.get_or_load("chat-1", load) == renamed
+    assert load.calls == 1
+
+@pytest.mark.anyio
+async def test_entries_expire_after_the_ttl(redis_cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fake_redis.time, "monotonic", lambda: now[0])
+    load = Loader(CHAT)
+
+    await redis_cache.get_or_load("chat-1", load)
+    now[0] += 59
+    await redis_cache.get_or_load("chat-1", load)
+    assert load.calls == 1
+
+    now[0] += 2
+    await redis_cache.get_or_load("chat-1", load)
+    assert load.calls == 2
+
+class BrokenRedis(FakeRedis):
+    async def get(self, name):
+        raise ConnectionError("redis is down")
+
+@pytest.mark.anyio
+async def test_cache_outage_falls_back_to_the_loader():
+    cache = ChatCache(RedisCacheBackend(BrokenRedis()))
+    load = Loader(CHAT)
+
+    assert await cache.get_or_load("chat-1", load) == CHAT
+    assert load.calls == 1
+    assert cache.stats()["errors"] == 1
+
+def test_routes_keep_the_shared_cache_current(client):
+    redis = FakeRedis()
+    services = client.app.state.services
+    services.chat_cache = ChatCache(RedisCacheBackend(redis, ttl=60))
+    chat_id = client.post("/api/chats", json={"title": "Denver condos"}).json()["id"]
+
+    client.put(f"/api/chats/{chat_id}", json={"title": "Denver townhomes"})
+    assert client.get(f"/api/chats/{chat_id}").json()["title"] == "Denver townhomes"
+    assert services.chat_cache.stats()["hits"] >= 1
+
+    client.delete(f"/api/chats/{chat_id}")
+    assert client.get(f"/api/chats/{chat_id}").status_code == 404
+    assert redis._data == {}
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("size, shared, cached", [(None, False, False), ("100", False, True), ("100", True, False)])
+async def test_in_process_cache_is_opt_in_and_single_worker_only(monkeypatch, size, shared, cached):
+    if size is None:
+        monkeypatch.delenv("CHAT_CACHE_SIZE", raising=False)
+    else:
+        monkeypatch.setenv("CHAT_CACHE_SIZE", size)
+    cache = ChatCache.from_env(shared=shared)
+
+    await cache.set("chat-1", CHAT)
+
+    assert (await cache.backend.get("chat-1") is not None) == cached
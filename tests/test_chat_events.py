@@ -0,0 +1,121 @@
+"""Chat event fan-out through the local broker and /api/ws/chats/{id}"""
+
+import json
+
+import pytest
+
+from chat_events import ChatEvents, LocalBroker, chat_topic, user_topic
+from tests.conftest import auth_headers, socket_ticket
+
+def pending(subscription) -> list:
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+@pytest.mark.anyio
+async def test_chat_events_reach_every_subscriber_of_the_chat():
+    events = ChatEvents(LocalBroker())
+    first = events.subscribe(chat_topic("chat-1"), user_topic("alice"))
+    second = events.subscribe(chat_topic("chat-1"), user_topic("alice"))
+    elsewhere = events.subscribe(chat_topic("chat-2"), user_topic("alice"))
+
+    await events.publish(chat_topic("chat-1"), "token", messageId="m1", text="Escrow")
+
+    expected = [{"type": "token", "messageId": "m1", "text": "Escrow"}]
+    assert pending(first) == pending(second) == expected
+    assert pending(elsewhere) == []
+    assert events.stats()["published"] == 1
+
+@pytest.mark.anyio
+async def test_user_events_stay_with_their_user():
+    events = ChatEvents(LocalBroker())
+    alice = events.subscribe(chat_topic("chat-a"), user_topic("alice"))
+    bob = events.subscribe(chat_topic("chat-b"), user_topic("bob"))
+
+    await events.publish(user_topic("alice"), "deleted", chatIds=["chat-a"])
+
+    assert pending(alice) == [{"type": "deleted", "chatIds": ["chat-a"]}]
+    assert pending(bob) == []
+
+@pytest.mark.anyio
+async def test_closed_subscription_is_unsubscribed():
+    events = ChatEvents(LocalBroker())
+    subscription = events.subscribe(chat_topic("chat-1"), user_topic("alice"))
+    assert events.stats()["subscriptions"] == 1
+
+    subscription.close()
+    await events.publish(chat_topic("chat-1"), "token", text="late")
+
+    assert events.stats()["subscriptions"] == 0
+    assert events.broker.subscribers == {}
+    assert pending(subscription) == []
+
+@pytest.mark.anyio
+async def test_subscriber_that_falls_behind_is_ended():
+    events = ChatEvents(LocalBroker(), max_queue=2)
+    subscription = events.subscribe(chat_topic("chat-1"))
+
+    for i in range(4):
+        await events.publish(chat_topic("chat-1"), "token", text=str(i))
+
+    received = [event["text"] async for event in subscription]
+    assert received == ["0", "1"]
+    assert events.stats()["overflows"] == 1
+
+class BrokenBroker(LocalBroker):
+    async def publish(self, topic, event):
+        raise ConnectionError("redis is down")
+
+@pytest.mark.anyio
+async def test_publish_failures_are_counted_not_raised():
+    events = ChatEvents(BrokenBroker())
+
+    await events.publish(chat_topic("chat-1"), "token", text="lost")
+
+    assert events.stats()["errors"] == 1
+
+def receive_until(socket, event_type: str) -> list:
+    events = []
+    while not events or events[-1]["type"] != event_type:
+        events.append(json.loads(socket.receive_text()))
+    return events
+
+def test_reply_streams_to_every_socket_on_the_chat(client):
+    services = client.app.state.services
+    services.ai_service.reply = "Escrow holds the deposit"
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    with client.websocket_connect(f"/api/ws/chats/{chat_id}") as sender, \
+            client.websocket_connect(f"/api/ws/chats/{chat_id}") as watcher:
+        assert services.chat_events.stats()["subscriptions"] == 2
+        sender.send_text(json.dumps({"type": "send", "message": "What is escrow?"}))
+
+        seen = [
+            [event for event in receive_until(socket, "messages") if event["type"] != "chat"]
+            for socket in (sender, watcher)
+        ]
+
+    assert seen[0] == seen[1]
+    types = [event["type"] for event in seen[0]]
+    assert types[0] == "start" and types[-1] == "messages"
+    assert set(types[1:-1]) == {"token"}
+    assert "".join(event["text"] for event in seen[0] if event["type"] == "token") == "Escrow holds the deposit"
+    saved = seen[0][-1]["messages"]
+    assert [(m["sender"], m["text"]) for m in saved] == [("user", "What is escrow?"), ("ai", "Escrow holds the deposit")]
+    assert services.chat_events.stats()["subscriptions"] == 0
+
+def test_sockets_only_hear_their_own_users_changes(auth_client):
+    alice_chat = auth_client.post("/api/chats", json={}, headers=auth_headers("alice")).json()["id"]
+    bob_chat = auth_client.post("/api/chats", json={}, headers=auth_headers("bob")).json()["id"]
+
+    with auth_client.websocket_connect(f"/api/ws/chats/{alice_chat}?ticket={socket_ticket(auth_client, 'alice')}") as alice, \
+            auth_client.websocket_connect(f"/api/ws/chats/{bob_chat}?ticket={socket_ticket(auth_client, 'bob')}") as bob:
+        auth_client.put(f"/api/chats/{alice_chat}", json={"title": "Denver condos"}, headers=auth_headers("alice"))
+
+        renamed = json.loads(alice.receive_text())
+        assert (renamed["type"], renamed["chat"]["title"]) == ("chat", "Denver condos")
+
+        # Nothing was queued for bob ahead of his pong
+        bob.send_text(json.dumps({"type": "ping"}))
+        assert json.loads(bob.receive_text()) == {"type": "pong"}
@@ -0,0 +1,223 @@
+"""Circuit breakers, LLM deadlines and cancelling the LLM call when the client goes away"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+import server
+from ai_service import AIService, FALLBACK_RESPONSE, LLMTimeoutError
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from fake_ai_service import FakeAIService
+from tests.asgi import request_until_disconnect
+from tests.conftest import finish_background_tasks
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class Calls:
+    """Async callables that succeed or fail, counting how often they ran"""
+
+    def __init__(self):
+        self.count = 0
+
+    async def ok(self):
+        self.count += 1
+        return "ok"
+
+    async def fail(self):
+        self.count += 1
+        raise RuntimeError("provider error")
+
+async def fail_times(breaker: CircuitBreaker, calls: Calls, times: int):
+    for _ in range(times):
+        with pytest.raises(RuntimeError):
+            await breaker.call(calls.fail)
+
+@pytest.mark.anyio
+async def test_breaker_cycles_closed_open_half_open_closed():
+    clock = FakeClock()
+    breaker = CircuitBreaker("openai", failure_threshold=3, reset_timeout=30, clock=clock)
+    calls = Calls()
+
+    # Failures must be consecutive
+    await fail_times(breaker, calls, 2)
+    assert await breaker.call(calls.ok) == "ok"
+    await fail_times(breaker, calls, 2)
+    assert breaker.state == CLOSED
+
+    await fail_times(breaker, calls, 1)
+    assert breaker.state == OPEN
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as rejected:
+        await breaker.call(calls.ok)
+    assert rejected.value.retry_after == pytest.approx(20)
+    assert calls.count == 6
+
+    clock.now += 20
+    assert breaker.state == HALF_OPEN
+    assert await breaker.call(calls.ok) == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {"state": CLOSED, "failures": 0, "trips": 1, "rejected": 1}
+
+@pytest.mark.anyio
+async def test_failed_trial_reopens_for_another_reset_timeout():
+    clock = FakeClock()
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout=30, clock=clock)
+    calls = Calls()
+
+    await fail_times(breaker, calls, 1)
+    clock.now += 30
+    await fail_times(breaker, calls, 1)
+
+    assert breaker.state == OPEN
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+    assert breaker.stats()["trips"] == 2
+
+@pytest.mark.anyio
+async def test_half_open_lets_one_trial_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker("openai", failure_threshold=1, reset_timeout=30, clock=clock)
+    await fail_times(breaker, Calls(), 1)
+    clock.now += 30
+
+    release = asyncio.Event()
+
+    async def slow_trial():
+        await release.wait()
+        return "recovered"
+
+    trial = asyncio.ensure_future(breaker.call(slow_trial))
+    await asyncio.sleep(0)
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(Calls().ok)
+
+    # A cancelled trial frees the slot for the next caller
+    trial.cancel()
+    await asyncio.gather(trial, return_exceptions=True)
+    assert await breaker.call(Calls().ok) == "ok"
+    assert breaker.state == CLOSED
+
+@pytest.mark.anyio
+async def test_ignored_errors_do_not_count():
+    breaker = CircuitBreaker("openai", failure_threshold=1)
+
+    with pytest.raises(RuntimeError):
+        await breaker.call(Calls().fail, ignore=(RuntimeError,))
+    assert breaker.state == CLOSED
+
+@pytest.mark.anyio
+async def test_deadline_raises_llm_timeout_and_cancels_the_call():
+    cancelled = asyncio.Event()
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(LLMTimeoutError) as expired:
+        await AIService._with_timeout(hang(), "openai", 0.05)
+
+    assert (expired.value.target, expired.value.seconds) == ("openai", 0.05)
+    assert cancelled.is_set()
+
+@pytest.mark.anyio
+async def test_breaker_counts_timeouts():
+    breaker = CircuitBreaker("openai", failure_threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(LLMTimeoutError):
+            await breaker.call(lambda: AIService._with_timeout(asyncio.sleep(10), "openai", 0.01))
+
+    assert breaker.state == OPEN
+
+class HangingLlmChat:
+    """LlmChat stand-in whose provider never answers"""
+
+    sent = 0
+
+    def __init__(self, api_key, session_id, system_message):
+        pass
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        HangingLlmChat.sent += 1
+        await asyncio.sleep(10)
+
+@pytest.fixture
+def hanging_service(monkeypatch):
+    HangingLlmChat.sent = 0
+    sdk = SimpleNamespace(LlmChat=HangingLlmChat, UserMessage=lambda text: SimpleNamespace(text=text))
+    monkeypatch.setattr(ai_service, "llm_sdk", lambda: sdk)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    service = AIService()
+    service.call_timeout = 0.02
+    service.request_deadline = 0.1
+    service.breakers["openai"] = CircuitBreaker("openai", failure_threshold=2, reset_timeout=30)
+    return service
+
+@pytest.mark.anyio
+async def test_hung_provider_times_out_then_trips_its_breaker(hanging_service):
+    assert await hanging_service.chat_with_ai("What is escrow?") == FALLBACK_RESPONSE
+    assert await hanging_service.chat_with_ai("What are closing costs?") == FALLBACK_RESPONSE
+    assert hanging_service.breaker_stats()["openai"]["state"] == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await hanging_service.chat_with_ai("Is the provider back?")
+    assert HangingLlmChat.sent == 2
+
+def test_open_breaker_is_503_and_keeps_no_message(client, hanging_service):
+    client.app.state.services.ai_service = hanging_service
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+    for question in ("What is escrow?", "What are closing costs?"):
+        assert client.post(f"/api/chats/{chat_id}/messages", json={"message": question}).status_code == 200
+
+    response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "Is the provider back?"})
+
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 29
+    texts = [m["text"] for m in client.get(f"/api/chats/{chat_id}/messages").json()]
+    assert "Is the provider back?" not in texts
+
+class HangingAIService(FakeAIService):
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def chat_with_ai(self, message, *args, **kwargs):
+        self.started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+@pytest.mark.anyio
+async def test_client_disconnect_cancels_the_llm_call_with_499(app):
+    services = app.state.services
+    services.ai_service = HangingAIService()
+    chat = await server.create_chat(server.ChatCreateRequest(), user_id=server.ANONYMOUS_USER_ID, services=services)
+
+    response = await request_until_disconnect(
+        app, "POST", f"/api/chats/{chat.id}/messages", {"message": "Is escrow refundable?"},
+        disconnect=services.ai_service.started
+    )
+    await finish_background_tasks(services)
+
+    assert response["status"] == 499
+    assert services.ai_service.cancelled
+    messages = await services.db.messages.find({"chatId": chat.id}, {"_id": 0}).to_list(None)
+    assert [(m["sender"], m["text"]) for m in messages] == [("user", "Is escrow refundable?")]
@@ -0,0 +1,88 @@
+"""ETag / If-None-Match on GET /api/chats and GET /api/chats/{id}/messages"""
+
+import json
+
+import server
+from fake_ai_service import FakeAIService
+from llm_limiter import LLMSaturatedError
+
+
+def revalidate(client, etag: str, **params):
+    return client.get("/api/chats", params=params, headers={"If-None-Match": etag})
+
+def test_unchanged_chat_list_is_304(client):
+    client.post("/api/chats", json={"title": "Denver condos"})
+
+    first = client.get("/api/chats")
+    etag = first.headers["ETag"]
+    again = revalidate(client, etag)
+
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+    assert revalidate(client, etag, limit=5).status_code == 200
+
+def test_chat_list_etag_moves_with_every_change(client):
+    chat_id = client.post("/api/chats", json={"title": "Denver condos"}).json()["id"]
+    other_id = client.post("/api/chats", json={"title": "Austin lofts"}).json()["id"]
+    etags = [client.get("/api/chats").headers["ETag"]]
+
+    client.put(f"/api/chats/{chat_id}", json={"title": "Denver townhomes"})
+    etags.append(client.get("/api/chats").headers["ETag"])
+    client.post(f"/api/chats/{chat_id}/messages", json={"message": "HOA fees?"})
+    etags.append(client.get("/api/chats").headers["ETag"])
+    client.delete(f"/api/chats/{other_id}")
+    etags.append(client.get("/api/chats").headers["ETag"])
+
+    assert len(set(etags)) == len(etags)
+    for stale in etags[:-1]:
+        assert revalidate(client, stale).status_code == 200
+    assert revalidate(client, etags[-1]).status_code == 304
+
+def test_page_etag_covers_its_cursor(client):
+    for title in ("one", "two", "three"):
+        client.post("/api/chats", json={"title": title})
+    page = client.get("/api/chats", params={"limit": 2})
+    etag = page.headers["ETag"]
+
+    # Deleting the chat on the next page ends the list after this one
+    oldest = client.get("/api/chats").json()[-1]["id"]
+    client.delete(f"/api/chats/{oldest}")
+
+    refreshed = revalidate(client, etag, limit=2)
+    assert "X-Next-Cursor" in page.headers
+    assert refreshed.status_code == 200
+    assert "X-Next-Cursor" not in refreshed.headers
+
+class RevalidatingAIService(FakeAIService):
+    """Revalidates the chat's messages while the LLM call is in flight, then rejects the call"""
+
+    def __init__(self, services: server.Services, chat_id: str, etag: str):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.services, self.chat_id, self.etag = services, chat_id, etag
+        self.during = None
+
+    async def chat_with_ai(self, message, *args, **kwargs):
+        self.during = await server.get_messages(
+            self.chat_id, None, None, 50, self.etag, server.ANONYMOUS_USER_ID, self.services
+        )
+        raise LLMSaturatedError("openai", retry_after=1)
+
+def test_messages_etag_moves_with_the_saved_and_discarded_question(client):
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+    before = client.get(f"/api/chats/{chat_id}/messages").headers["ETag"]
+    services = client.app.state.services
+    services.ai_service = RevalidatingAIService(services, chat_id, before)
+
+    response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "What is escrow?"})
+
+    # The question was already saved mid-call, and removed again after the 429
+    assert response.status_code == 429
+    during = services.ai_service.during
+    assert during.status_code == 200
+    assert [m["text"] for m in json.loads(during.body)] == ["What is escrow?"]
+    after = client.get(f"/api/chats/{chat_id}/messages", headers={"If-None-Match": before})
+    assert after.status_code == 200
+    assert after.json() == []
+    assert after.headers["ETag"] != before
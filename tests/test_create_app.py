@@ -0,0 +1,56 @@
+"""create_app builds each app's own services; importing server.py builds none"""
+
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from chat_cache import RedisCacheBackend
+from chat_events import RedisBroker
+from fake_redis import FakeRedis
+from tests.conftest import BACKEND_DIR
+
+def test_importing_server_needs_no_environment():
+    env = {key: value for key, value in os.environ.items()
+           if key not in ("MONGO_URL", "DB_NAME", "EMERGENT_LLM_KEY", "AI_BACKEND")}
+
+    result = subprocess.run(
+        [sys.executable, "-c", "import server; assert not hasattr(server, 'app')"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+
+def test_apps_built_side_by_side_share_no_services(make_app):
+    first, second = make_app(), make_app()
+    assert first.state.services is not second.state.services
+
+    with TestClient(first) as first_client, TestClient(second) as second_client:
+        chat_id = first_client.post("/api/chats", json={"title": "Denver condos"}).json()["id"]
+
+        assert [chat["id"] for chat in first_client.get("/api/chats").json()] == [chat_id]
+        assert second_client.get("/api/chats").json() == []
+        assert second_client.get(f"/api/chats/{chat_id}").status_code == 404
+
+def test_redis_urls_come_from_the_settings(make_app, monkeypatch):
+    connected = []
+
+    def from_url(url):
+        connected.append(url)
+        return FakeRedis()
+
+    # Only the client factory is replaced; neither backend connects until used
+    client_module = SimpleNamespace(from_url=from_url)
+    monkeypatch.setitem(sys.modules, "redis", SimpleNamespace(asyncio=client_module))
+    monkeypatch.setitem(sys.modules, "redis.asyncio", client_module)
+
+    services = make_app(
+        chat_cache_redis_url="redis://cache:6379/0",
+        chat_events_redis_url="redis://events:6379/1"
+    ).state.services
+
+    assert connected == ["redis://cache:6379/0", "redis://events:6379/1"]
+    assert isinstance(services.chat_cache.backend, RedisCacheBackend)
+    assert isinstance(services.chat_events.broker, RedisBroker)
@@ -0,0 +1,189 @@
+"""Per-provider LLM limits (token bucket, concurrency, wait queue) and singleflight coalescing"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ai_service
+from ai_service import AIService
+from llm_limiter import LLMLimiter, LLMSaturatedError, ProviderLimiter, TokenBucket
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+class Upstream:
+    """A provider call that answers when released, counting starts and cancellations"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+        self.cancelled = 0
+
+    async def call(self):
+        self.started += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return "answer"
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_token_bucket_allows_a_burst_then_paces():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=3, clock=clock)
+
+    assert [bucket.reserve(max_wait=1.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(0.5)
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(1.0)
+    # Too long a wait takes nothing
+    assert bucket.reserve(max_wait=1.0) is None
+    assert bucket.tokens == pytest.approx(-2)
+
+    clock.now += 10
+    assert bucket.reserve(max_wait=0) == 0.0
+    assert bucket.tokens == pytest.approx(2)
+
+@pytest.mark.anyio
+async def test_full_queue_is_rejected_at_once():
+    limiter = ProviderLimiter("openai", max_concurrency=1, max_queue=1, queue_timeout=5)
+    upstream = Upstream()
+    running = asyncio.ensure_future(limiter.run(upstream.call))
+    queued = asyncio.ensure_future(limiter.run(upstream.call))
+    await settle()
+
+    with pytest.raises(LLMSaturatedError) as rejected:
+        await limiter.run(upstream.call)
+
+    assert rejected.value.retry_after == 5
+    assert limiter.stats()["rejected"] == 1
+    upstream.release.set()
+    assert await asyncio.gather(running, queued) == ["answer", "answer"]
+    assert limiter.stats()["completed"] == 2
+
+@pytest.mark.anyio
+async def test_slot_wait_timeout_is_rejected_and_refunds_its_token():
+    limiter = ProviderLimiter("openai", max_concurrency=1, rate=1, burst=5, queue_timeout=0.05)
+    upstream = Upstream()
+    running = asyncio.ensure_future(limiter.run(upstream.call))
+    await settle()
+    tokens = limiter.bucket.tokens
+
+    with pytest.raises(LLMSaturatedError):
+        await limiter.run(upstream.call)
+
+    assert limiter.bucket.tokens == pytest.approx(tokens, abs=0.1)
+    assert limiter.stats()["queued"] == 0
+    upstream.release.set()
+    await running
+
+@pytest.mark.anyio
+async def test_rate_limit_rejects_when_the_next_token_is_too_far():
+    limiter = ProviderLimiter("openai", rate=0.1, burst=1, queue_timeout=1)
+
+    async def answer():
+        return "answer"
+
+    assert await limiter.run(answer) == "answer"
+    with pytest.raises(LLMSaturatedError) as rejected:
+        await limiter.run(answer)
+
+    assert rejected.value.retry_after == pytest.approx(10)
+
+def limiter_for(**options) -> LLMLimiter:
+    return LLMLimiter({"openai": ProviderLimiter("openai", **options)})
+
+@pytest.mark.anyio
+async def test_identical_calls_share_one_upstream_request():
+    limiter = limiter_for()
+    upstream = Upstream()
+
+    calls = [asyncio.ensure_future(limiter.call("openai", upstream.call, coalesce_key="same")) for _ in range(3)]
+    await settle()
+    upstream.release.set()
+
+    assert await asyncio.gather(*calls) == ["answer"] * 3
+    assert upstream.started == 1
+    assert limiter.stats()["coalesced"] == 2
+    assert limiter._flights == {}
+
+@pytest.mark.anyio
+async def test_upstream_survives_until_its_last_waiter_leaves():
+    limiter = limiter_for()
+    upstream = Upstream()
+    first = asyncio.ensure_future(limiter.call("openai", upstream.call, coalesce_key="same"))
+    second = asyncio.ensure_future(limiter.call("openai", upstream.call, coalesce_key="same"))
+    await settle()
+
+    first.cancel()
+    await settle()
+    assert upstream.cancelled == 0
+
+    second.cancel()
+    await settle()
+    assert upstream.cancelled == 1
+    assert limiter._flights == {}
+
+@pytest.mark.anyio
+async def test_caller_after_a_cancelled_flight_starts_a_new_one():
+    limiter = limiter_for()
+    upstream = Upstream()
+    abandoned = asyncio.ensure_future(limiter.call("openai", upstream.call, coalesce_key="same"))
+    await settle()
+
+    # The last waiter leaves and a new caller arrives in the same loop turn
+    abandoned.cancel()
+    await asyncio.sleep(0)
+    retry = asyncio.ensure_future(limiter.call("openai", upstream.call, coalesce_key="same"))
+    await settle()
+    upstream.release.set()
+
+    assert await retry == "answer"
+    assert upstream.started == 2
+
+@pytest.mark.anyio
+async def test_upstream_error_reaches_every_waiter():
+    limiter = limiter_for()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider error")
+
+    results = await asyncio.gather(
+        *(limiter.call("openai", fail, coalesce_key="same") for _ in range(2)), return_exceptions=True
+    )
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+class InstantLlmChat:
+    def __init__(self, api_key, session_id, system_message):
+        pass
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        return "answer"
+
+def test_saturated_provider_is_a_429_with_retry_after(client, monkeypatch):
+    sdk = SimpleNamespace(LlmChat=InstantLlmChat, UserMessage=lambda text: SimpleNamespace(text=text))
+    monkeypatch.setattr(ai_service, "llm_sdk", lambda: sdk)
+    monkeypatch.setenv("EMERGENT_LLM_KEY", "test-key")
+    service = AIService()
+    service.limiter = limiter_for(max_queue=0, queue_timeout=2.5)
+    client.app.state.services.ai_service = service
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "What is escrow?"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert service.limiter_stats()["providers"]["openai"]["rejected"] == 1
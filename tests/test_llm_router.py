@@ -0,0 +1,186 @@
+"""LLMRouter failover, hedging and provider health, with scripted fake providers"""
+
+import asyncio
+
+import pytest
+
+from ai_service import AIService
+from llm_limiter import LLMSaturatedError
+from llm_router import LLMRouter, ProviderHealth
+
+PRIMARY, BACKUP = "gpt-4o-mini", "claude-3-5-haiku-20241022"
+
+def provider_of(model: str) -> str:
+    return "openai" if model.startswith("gpt-") else "anthropic"
+
+class FakeProviders:
+    """send(model) sleeps for the model's delay, then raises its error or answers"""
+
+    def __init__(self, delays=None, errors=None):
+        self.delays = delays or {}
+        self.errors = errors or {}
+        self.started = []
+        self.cancelled = []
+
+    async def send(self, model: str) -> str:
+        self.started.append(model)
+        try:
+            await asyncio.sleep(self.delays.get(model, 0))
+        except asyncio.CancelledError:
+            self.cancelled.append(model)
+            raise
+        if model in self.errors:
+            raise self.errors[model]
+        return f"answer from {model}"
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def make_router(**options) -> LLMRouter:
+    return LLMRouter({PRIMARY: BACKUP}, provider_of, **options)
+
+@pytest.mark.anyio
+async def test_error_fails_over_to_the_backup():
+    router = make_router()
+    providers = FakeProviders(errors={PRIMARY: RuntimeError("500 from provider")})
+
+    assert await router.call(PRIMARY, providers.send) == f"answer from {BACKUP}"
+    assert providers.started == [PRIMARY, BACKUP]
+    stats = router.stats()
+    assert stats["failovers"] == 1
+    assert stats["providers"]["openai"]["errors"] == 1
+    assert stats["providers"]["anthropic"]["errors"] == 0
+
+@pytest.mark.anyio
+async def test_timeout_fails_over_to_the_backup():
+    router = make_router()
+    providers = FakeProviders(delays={PRIMARY: 10})
+
+    async def send(model):
+        return await AIService._with_timeout(providers.send(model), provider_of(model), 0.05)
+
+    assert await router.call(PRIMARY, send) == f"answer from {BACKUP}"
+    assert providers.cancelled == [PRIMARY]
+    assert router.stats()["failovers"] == 1
+
+@pytest.mark.anyio
+async def test_last_error_propagates_when_every_model_fails():
+    router = make_router()
+    providers = FakeProviders(errors={PRIMARY: RuntimeError("primary down"), BACKUP: RuntimeError("backup down")})
+
+    with pytest.raises(RuntimeError, match="backup down"):
+        await router.call(PRIMARY, providers.send)
+
+@pytest.mark.anyio
+async def test_local_rejections_do_not_count_against_provider_health():
+    router = make_router()
+    providers = FakeProviders(errors={PRIMARY: LLMSaturatedError("openai", retry_after=1)})
+
+    assert await router.call(PRIMARY, providers.send) == f"answer from {BACKUP}"
+    assert router.stats()["providers"]["openai"]["errors"] == 0
+
+@pytest.mark.anyio
+async def test_hedge_starts_after_the_delay_and_cancels_the_loser():
+    router = make_router(hedge=True, hedge_delay=0.05)
+    providers = FakeProviders(delays={PRIMARY: 10, BACKUP: 0.01})
+
+    started = asyncio.get_running_loop().time()
+    result = await router.call(PRIMARY, providers.send)
+    elapsed = asyncio.get_running_loop().time() - started
+    await asyncio.sleep(0)
+
+    assert result == f"answer from {BACKUP}"
+    assert 0.05 <= elapsed < 1
+    assert providers.started == [PRIMARY, BACKUP]
+    assert providers.cancelled == [PRIMARY]
+    stats = router.stats()
+    assert (stats["hedges"], stats["hedge_wins"], stats["failovers"]) == (1, 1, 0)
+
+@pytest.mark.anyio
+async def test_fast_primary_is_not_hedged():
+    router = make_router(hedge=True, hedge_delay=0.05)
+    providers = FakeProviders(delays={PRIMARY: 0.01})
+
+    assert await router.call(PRIMARY, providers.send) == f"answer from {PRIMARY}"
+    assert providers.started == [PRIMARY]
+    assert router.stats()["hedges"] == 0
+
+@pytest.mark.anyio
+async def test_primary_that_wins_the_race_cancels_the_hedge():
+    router = make_router(hedge=True, hedge_delay=0.02)
+    providers = FakeProviders(delays={PRIMARY: 0.05, BACKUP: 10})
+
+    assert await router.call(PRIMARY, providers.send) == f"answer from {PRIMARY}"
+    await asyncio.sleep(0)
+    assert providers.cancelled == [BACKUP]
+    stats = router.stats()
+    assert (stats["hedges"], stats["hedge_wins"]) == (1, 0)
+
+@pytest.mark.anyio
+async def test_hedged_primary_error_fails_over_at_once():
+    router = make_router(hedge=True, hedge_delay=5)
+    providers = FakeProviders(errors={PRIMARY: RuntimeError("500 from provider")})
+
+    assert await router.call(PRIMARY, providers.send) == f"answer from {BACKUP}"
+    stats = router.stats()
+    assert (stats["hedges"], stats["failovers"]) == (0, 1)
+
+def test_hedge_delay_follows_the_measured_p95():
+    router = make_router(hedge=True, hedge_delay=2.0, min_hedge_delay=0.25, hedge_min_samples=20)
+    health = router.provider_health("openai")
+    assert router._hedge_after(PRIMARY) == 2.0
+
+    for i in range(20):
+        health.record_success(0.5 + i / 100)
+    assert router._hedge_after(PRIMARY) == pytest.approx(0.69)
+
+    for _ in range(200):
+        health.record_success(0.01)
+    assert router._hedge_after(PRIMARY) == 0.25
+
+def test_ewma_tracks_latency_and_error_rate():
+    health = ProviderHealth("openai", alpha=0.2)
+
+    health.record_success(1.0)
+    health.record_success(0.0)
+    assert health.latency == pytest.approx(0.8)
+
+    for _ in range(4):
+        health.record_failure()
+    assert health.error_rate == pytest.approx(1 - 0.8 ** 4)
+    assert not health.healthy
+
+def test_unhealthy_primary_goes_second_except_for_probes():
+    clock = FakeClock()
+    router = make_router(health_options={"clock": clock, "probe_interval": 30, "error_threshold": 0.5})
+    primary = router.provider_health("openai")
+    assert router.plan(PRIMARY) == [PRIMARY, BACKUP]
+
+    for _ in range(4):
+        primary.record_failure()
+
+    # The first plan after turning unhealthy is a probe, then the backup leads
+    assert router.plan(PRIMARY) == [PRIMARY, BACKUP]
+    assert router.plan(PRIMARY) == [BACKUP, PRIMARY]
+    clock.now += 29
+    assert router.plan(PRIMARY) == [BACKUP, PRIMARY]
+    clock.now += 1
+    assert router.plan(PRIMARY) == [PRIMARY, BACKUP]
+    assert router.plan(PRIMARY) == [BACKUP, PRIMARY]
+
+    # Successful probes bring the error rate back under the threshold
+    primary.record_success(0.2)
+    assert router.plan(PRIMARY) == [PRIMARY, BACKUP]
+
+def test_unhealthy_backup_does_not_take_the_lead():
+    # No probe is due yet at t=0
+    router = make_router(health_options={"clock": FakeClock(0.0), "probe_interval": 30})
+    for provider in ("openai", "anthropic"):
+        for _ in range(4):
+            router.provider_health(provider).record_failure()
+
+    assert router.plan(PRIMARY) == [PRIMARY, BACKUP]
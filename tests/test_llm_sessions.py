@@ -0,0 +1,30 @@
+"""LLM session ids are derived on the server from the owned chat"""
+
+import server
+from fake_ai_service import FakeAIService
+
+class RecordingAIService(FakeAIService):
+    def __init__(self):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.sessions = []
+
+    async def stream_chat_with_ai(self, message, chat_history=None, session_id=None, *args, **kwargs):
+        self.sessions.append(session_id)
+        async for token in super().stream_chat_with_ai(message, chat_history, session_id, *args, **kwargs):
+            yield token
+
+def test_client_session_id_is_scoped_to_the_user_and_chat(client):
+    services = client.app.state.services
+    services.ai_service = RecordingAIService()
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    for session in (None, "summary", "chat_someone-else_other-chat"):
+        response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "hi", "sessionId": session})
+        assert response.status_code == 200
+
+    owner_session = f"chat_{server.ANONYMOUS_USER_ID}_{chat_id}"
+    assert services.ai_service.sessions == [
+        owner_session,
+        f"{owner_session}_summary",
+        f"{owner_session}_chat_someone-else_other-chat",
+    ]
@@ -0,0 +1,84 @@
+"""Keyset cursors: decoding, page boundaries and items sharing a timestamp"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from pagination import InvalidCursorError, decode_cursor, encode_cursor, fetch_page, fetch_since
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+def test_cursor_round_trips_ids_containing_commas():
+    cursor = encode_cursor(START, "msg,with,commas")
+
+    assert decode_cursor(cursor) == (START, "msg,with,commas")
+
+@pytest.mark.parametrize("cursor", ["", "no-comma", "yesterday,m1", ",m1"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+async def messages_collection(timestamps: dict):
+    collection = AsyncMongoMockClient()["pagination_test"].messages
+    await collection.insert_many([
+        {"id": item_id, "chatId": "chat-1", "timestamp": timestamp}
+        for item_id, timestamp in timestamps.items()
+    ])
+    return collection
+
+async def all_pages(collection, limit: int) -> list:
+    pages, before = [], None
+    while True:
+        items, before = await fetch_page(collection, {"chatId": "chat-1"}, "timestamp", before, limit, {"_id": 0})
+        pages.append([item["id"] for item in items])
+        if not before:
+            return pages
+
+@pytest.mark.anyio
+async def test_pages_split_timestamp_ties_by_id():
+    # m2..m5 share a timestamp, so only the id orders them
+    tied = START + timedelta(seconds=1)
+    collection = await messages_collection({
+        "m1": START, "m2": tied, "m3": tied, "m4": tied, "m5": tied, "m6": START + timedelta(seconds=2)
+    })
+
+    assert await all_pages(collection, limit=2) == [["m6", "m5"], ["m4", "m3"], ["m2", "m1"]]
+
+@pytest.mark.anyio
+async def test_full_last_page_has_no_cursor():
+    collection = await messages_collection({"m1": START, "m2": START + timedelta(seconds=1)})
+
+    items, next_cursor = await fetch_page(collection, {"chatId": "chat-1"}, "timestamp", None, 2)
+
+    assert [item["id"] for item in items] == ["m2", "m1"]
+    assert next_cursor is None
+
+@pytest.mark.anyio
+async def test_cursor_excludes_its_own_item():
+    collection = await messages_collection({"m1": START, "m2": START, "m3": START})
+
+    items, next_cursor = await fetch_page(
+        collection, {"chatId": "chat-1"}, "timestamp", encode_cursor(START, "m2"), 10
+    )
+
+    assert [item["id"] for item in items] == ["m1"]
+    assert next_cursor is None
+
+@pytest.mark.anyio
+async def test_since_returns_later_items_oldest_first_across_ties():
+    collection = await messages_collection({
+        "m1": START, "m2": START, "m3": START, "m4": START + timedelta(seconds=1)
+    })
+
+    items = await fetch_since(collection, {"chatId": "chat-1"}, "timestamp", {"id": "m2", "timestamp": START}, 10)
+
+    assert [item["id"] for item in items] == ["m3", "m4"]
+
+def test_bad_cursor_is_400(client):
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    assert client.get("/api/chats", params={"before": "not-a-cursor"}).status_code == 400
+    response = client.get(f"/api/chats/{chat_id}/messages", params={"before": "yesterday,m1"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor: yesterday,m1"
@@ -0,0 +1,115 @@
+"""Soft delete, batched message purging, the restart sweep and bulk delete"""
+
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from purge_worker import ChatPurgeWorker
+from tests.conftest import auth_headers
+
+DELETED_AT = datetime(2024, 5, 1, 12, 0, 0)
+
+async def seed(chats: dict):
+    """chats: chat_id -> (message count, deleted); deleted chats are stamped oldest first"""
+    db = AsyncMongoMockClient()["purge_test"]
+    for i, (chat_id, (count, deleted)) in enumerate(chats.items()):
+        await db.chats.insert_one({"id": chat_id, "deletedAt": DELETED_AT + timedelta(seconds=i) if deleted else None})
+        if count:
+            await db.messages.insert_many([{"id": f"{chat_id}-{n}", "chatId": chat_id} for n in range(count)])
+    return db
+
+class RecordingMessages:
+    """The messages collection, noting the size of each delete_many batch"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.batches = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def delete_many(self, query):
+        self.batches.append(len(query["_id"]["$in"]))
+        return await self.collection.delete_many(query)
+
+@pytest.mark.anyio
+async def test_messages_are_deleted_in_batches_then_the_chat():
+    db = await seed({"chat-1": (7, True)})
+    messages = RecordingMessages(db.messages)
+    worker = ChatPurgeWorker(SimpleNamespace(chats=db.chats, messages=messages), batch_size=3, pause=0)
+
+    assert await worker.purge_chat("chat-1") == 7
+
+    assert messages.batches == [3, 3, 1]
+    assert await db.chats.count_documents({}) == 0
+    assert worker.stats() == {"chats": 1, "messages": 7, "failed": 0}
+
+@pytest.mark.anyio
+async def test_purge_pass_covers_every_deleted_chat_and_spares_live_ones():
+    db = await seed({"chat-1": (2, True), "chat-2": (3, False), "chat-3": (0, True), "chat-4": (4, True)})
+    worker = ChatPurgeWorker(db, batch_size=2, pause=0)
+
+    # More deleted chats than one batch of chats
+    assert await worker.purge_deleted() == 3
+
+    assert [chat["id"] async for chat in db.chats.find({})] == ["chat-2"]
+    assert {m["chatId"] async for m in db.messages.find({})} == {"chat-2"}
+    assert await db.messages.count_documents({}) == 3
+
+@pytest.mark.anyio
+async def test_restored_chat_is_not_removed():
+    db = await seed({"chat-1": (2, True)})
+    worker = ChatPurgeWorker(db, pause=0)
+    await db.chats.update_one({"id": "chat-1"}, {"$set": {"deletedAt": None}})
+
+    await worker.purge_chat("chat-1")
+
+    assert await db.chats.count_documents({"id": "chat-1"}) == 1
+    assert worker.stats()["chats"] == 0
+
+@pytest.mark.anyio
+async def test_start_sweeps_chats_left_by_a_previous_process():
+    db = await seed({"chat-1": (3, True)})
+    worker = ChatPurgeWorker(db, pause=0, sweep_interval=60)
+
+    worker.start()
+    for _ in range(50):
+        if worker.stats()["chats"]:
+            break
+        await asyncio.sleep(0.01)
+    await worker.stop()
+
+    assert worker.stats() == {"chats": 1, "messages": 3, "failed": 0}
+    assert await db.messages.count_documents({}) == 0
+
+def test_bulk_delete_only_touches_the_callers_chats(auth_client):
+    services = auth_client.app.state.services
+    alice = [auth_client.post("/api/chats", json={}, headers=auth_headers("alice")).json()["id"] for _ in range(3)]
+    bob_chat = auth_client.post("/api/chats", json={}, headers=auth_headers("bob")).json()["id"]
+    auth_client.post(f"/api/chats/{alice[0]}/messages", json={"message": "HOA fees?"}, headers=auth_headers("alice"))
+
+    response = auth_client.request(
+        "DELETE", "/api/chats", json={"ids": [alice[0], alice[1], bob_chat, "missing"]}, headers=auth_headers("alice")
+    )
+    auth_client.portal.call(services.purge_worker.purge_deleted)
+
+    assert response.json() == {"success": True, "deleted": 2}
+    assert [chat["id"] for chat in auth_client.get("/api/chats", headers=auth_headers("alice")).json()] == [alice[2]]
+    assert auth_client.get(f"/api/chats/{bob_chat}", headers=auth_headers("bob")).status_code == 200
+    assert auth_client.portal.call(services.db.messages.count_documents, {"chatId": alice[0]}) == 0
+
+def test_delete_all_reaches_past_the_first_page(client):
+    for _ in range(5):
+        client.post("/api/chats", json={})
+    assert len(client.get("/api/chats", params={"limit": 2}).json()) == 2
+
+    response = client.delete("/api/chats", params={"all": "true"})
+
+    assert response.json() == {"success": True, "deleted": 5}
+    assert client.get("/api/chats").json() == []
+
+def test_bulk_delete_needs_ids_or_all(client):
+    assert client.delete("/api/chats").status_code == 422
@@ -0,0 +1,71 @@
+"""Response cache: exact and similar-prompt hits, and unindexing on TTL/LRU removal"""
+
+from response_cache import ResponseCache
+
+MODEL = "gpt-4o"
+SYSTEM = "You are a real estate assistant."
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+def indexed_keys(cache: ResponseCache) -> set:
+    return {key for grams in cache._ngram_index.values() for keys in grams.values() for key in keys}
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+
+    assert cache.get("  what IS escrow ", MODEL, SYSTEM) == "Escrow holds the deposit"
+    assert cache.stats()["exact_hits"] == 1
+
+def test_entries_are_partitioned_by_model_and_system_message():
+    cache = ResponseCache(similarity_threshold=0.5)
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+
+    assert cache.get("What is escrow?", "gpt-4o-mini", SYSTEM) is None
+    assert cache.get("What is escrow?", MODEL, "You are a mortgage broker.") is None
+    assert cache.stats()["misses"] == 2
+
+def test_similar_prompt_hits_only_at_the_threshold():
+    # "what is an escrow" scores ~0.84 and "what is escrow in texas" ~0.78
+    cache = ResponseCache(similarity_threshold=0.8)
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+
+    assert cache.get("What is an escrow?", MODEL, SYSTEM) == "Escrow holds the deposit"
+    assert cache.get("What is escrow in Texas?", MODEL, SYSTEM) is None
+    assert (cache.stats()["similar_hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_without_a_threshold_only_exact_prompts_hit():
+    cache = ResponseCache()
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+
+    assert cache.get("What is an escrow?", MODEL, SYSTEM) is None
+    assert cache._ngram_index == {}
+
+def test_lru_eviction_unindexes_the_entry():
+    cache = ResponseCache(max_size=2, similarity_threshold=0.8)
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+    cache.set("How do HOA fees work?", MODEL, SYSTEM, "Monthly dues to the association")
+    # A similar hit refreshes escrow, so the HOA entry is the one evicted
+    assert cache.get("What is an escrow?", MODEL, SYSTEM) == "Escrow holds the deposit"
+
+    cache.set("What are closing costs?", MODEL, SYSTEM, "Fees paid at closing")
+
+    assert cache.get("How do HOA fees work?", MODEL, SYSTEM) is None
+    assert indexed_keys(cache) == {key for key, _ in cache.entries.items()}
+    assert cache.stats()["evictions"] == 1
+
+def test_expired_entry_is_unindexed_when_found():
+    cache = ResponseCache(ttl=60, similarity_threshold=0.8)
+    clock = cache.entries.clock = FakeClock()
+    cache.set("What is escrow?", MODEL, SYSTEM, "Escrow holds the deposit")
+
+    clock.now += 61
+
+    assert cache.get("What is an escrow?", MODEL, SYSTEM) is None
+    assert indexed_keys(cache) == set()
+    assert cache.stats()["expirations"] == 1
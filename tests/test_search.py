@@ -0,0 +1,107 @@
+"""In-memory BM25 search: ranking, per-user results and highlight offsets"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from search import InMemorySearchIndex, highlight, stem
+from tests.conftest import auth_headers
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+def build_index(*chats) -> InMemorySearchIndex:
+    """chats: (chat_id, user_id, title, [message texts])"""
+    index = InMemorySearchIndex()
+    for chat_id, user_id, title, texts in chats:
+        index.index_chat({"id": chat_id, "userId": user_id, "title": title})
+        index.index_messages([
+            {"id": f"{chat_id}-{i}", "chatId": chat_id, "text": text, "sender": "user",
+             "timestamp": START + timedelta(minutes=i)}
+            for i, text in enumerate(texts)
+        ])
+    return index
+
+async def hit_ids(index, user_id: str, query: str, limit: int = 10, offset: int = 0) -> list:
+    hits = await index.search(None, user_id, query, limit, offset)
+    return [hit["messageId"] or hit["chatId"] for hit in hits]
+
+def test_stemming_folds_plurals_and_verb_forms():
+    assert stem("houses") == stem("house") == stem("housing") == "hous"
+    # Too short to strip
+    assert stem("yes") == "yes"
+
+@pytest.mark.anyio
+async def test_more_frequent_and_rarer_terms_rank_higher():
+    index = build_index(("chat-1", "alice", "Denver", [
+        "escrow escrow deposit",
+        "escrow and the deposit and the inspection report and appraisal",
+        "the inspection report"
+    ]))
+
+    assert await hit_ids(index, "alice", "escrow") == ["chat-1-0", "chat-1-1"]
+    # "appraisal" occurs once in the index, so it outweighs "inspection"
+    assert (await hit_ids(index, "alice", "inspection appraisal"))[0] == "chat-1-1"
+
+@pytest.mark.anyio
+async def test_equal_scores_prefer_the_newer_message():
+    index = build_index(("chat-1", "alice", "Denver", ["escrow question", "escrow question"]))
+
+    assert await hit_ids(index, "alice", "escrow") == ["chat-1-1", "chat-1-0"]
+
+@pytest.mark.anyio
+async def test_results_are_limited_to_the_users_chats():
+    index = build_index(
+        ("chat-a", "alice", "Escrow in Denver", ["Is escrow refundable?"]),
+        ("chat-b", "bob", "Escrow in Austin", ["Escrow timelines"])
+    )
+
+    assert set(await hit_ids(index, "alice", "escrow")) == {"chat-a", "chat-a-0"}
+    assert set(await hit_ids(index, "bob", "escrow")) == {"chat-b", "chat-b-0"}
+    assert await hit_ids(index, "carol", "escrow") == []
+
+@pytest.mark.anyio
+async def test_retitle_keeps_the_owner_and_removal_drops_the_chat():
+    index = build_index(("chat-a", "alice", "Denver", ["Escrow timelines"]))
+
+    index.index_chat({"id": "chat-a", "title": "Escrow questions"})
+    assert set(await hit_ids(index, "alice", "escrow")) == {"chat-a", "chat-a-0"}
+
+    index.remove_chat("chat-a")
+    assert await hit_ids(index, "alice", "escrow") == []
+    assert (index.postings, index.lengths, index.total_length) == ({}, {}, 0)
+
+@pytest.mark.anyio
+async def test_offset_pages_through_the_ranking():
+    index = build_index(("chat-1", "alice", "Denver", [f"escrow note {i}" for i in range(5)]))
+    everything = await hit_ids(index, "alice", "escrow")
+
+    # search returns one extra hit so callers can tell a next page exists
+    assert await hit_ids(index, "alice", "escrow", limit=2) == everything[:3]
+    assert await hit_ids(index, "alice", "escrow", limit=2, offset=2) == everything[2:5]
+
+def test_highlights_mark_every_matching_word():
+    snippet, ranges = highlight("Houses near the house we toured", ["hous"])
+
+    assert snippet == "Houses near the house we toured"
+    assert [snippet[start:end] for start, end in ranges] == ["Houses", "house"]
+
+def test_highlights_stay_aligned_in_a_trimmed_snippet():
+    text = "Before closing " + "filler words " * 30 + "the escrow deposit is refundable " + "more text " * 30
+
+    snippet, ranges = highlight(text, ["escrow", "deposit"], length=60)
+
+    assert snippet.startswith("…") and snippet.endswith("…")
+    assert len(snippet) == 62
+    assert [snippet[start:end] for start, end in ranges] == ["escrow", "deposit"]
+
+def test_search_endpoint_returns_only_the_callers_hits(auth_client):
+    alice_chat = auth_client.post("/api/chats", json={"title": "Escrow in Denver"}, headers=auth_headers("alice")).json()["id"]
+    auth_client.post("/api/chats", json={"title": "Escrow in Austin"}, headers=auth_headers("bob"))
+
+    response = auth_client.get("/api/search", params={"q": "escrow"}, headers=auth_headers("alice"))
+
+    assert response.status_code == 200
+    hits = response.json()
+    assert [(hit["chatId"], hit["messageId"]) for hit in hits] == [(alice_chat, None)]
+    start, end = hits[0]["highlights"][0]
+    assert hits[0]["snippet"][start:end] == "Escrow"
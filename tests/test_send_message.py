@@ -0,0 +1,55 @@
+"""POST /api/chats/{id}/messages persistence and ordering"""
+
+from fake_ai_service import FakeAIService
+from llm_limiter import LLMSaturatedError
+
+class CheckingAIService(FakeAIService):
+    """Records which of the chat's messages are already saved while the LLM is 'thinking'"""
+
+    def __init__(self, db):
+        super().__init__(first_token_delay=0, token_delay=0)
+        self.db = db
+        self.saved_during_call = []
+
+    async def chat_with_ai(self, message, *args, **kwargs):
+        saved = await self.db.messages.find({}, {"_id": 0, "text": 1}).to_list(None)
+        self.saved_during_call.append([doc["text"] for doc in saved])
+        return await super().chat_with_ai(message, *args, **kwargs)
+
+class SaturatedAIService(FakeAIService):
+    async def chat_with_ai(self, message, *args, **kwargs):
+        raise LLMSaturatedError("openai", retry_after=1.2)
+
+def test_user_message_is_saved_before_the_llm_call(client):
+    services = client.app.state.services
+    services.ai_service = CheckingAIService(services.db)
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "Is escrow refundable?"})
+
+    assert response.status_code == 200
+    assert services.ai_service.saved_during_call == [["Is escrow refundable?"]]
+
+def test_replies_sort_after_their_questions(client):
+    # The fake answers at once, like a response cache hit
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+    for i in range(20):
+        assert client.post(f"/api/chats/{chat_id}/messages", json={"message": f"question {i}"}).status_code == 200
+
+    messages = client.get(f"/api/chats/{chat_id}/messages").json()
+
+    assert [m["sender"] for m in messages] == ["user", "ai"] * 20
+    for question, reply in zip(messages[::2], messages[1::2]):
+        assert reply["timestampMs"] > question["timestampMs"]
+    chat = client.get("/api/chats").json()[0]
+    assert chat["messageCount"] == 40
+
+def test_rejected_message_is_not_kept(client):
+    client.app.state.services.ai_service = SaturatedAIService()
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    response = client.post(f"/api/chats/{chat_id}/messages", json={"message": "hello"})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "2"
+    assert client.get(f"/api/chats/{chat_id}/messages").json() == []
@@ -0,0 +1,121 @@
+"""SSE replies (POST /api/chats/{id}/messages/stream) from the fake streaming backend"""
+
+import asyncio
+import json
+
+import pytest
+
+import server
+from fake_ai_service import FakeAIService
+from llm_limiter import LLMSaturatedError
+from tests.asgi import request_until_disconnect
+from tests.conftest import finish_background_tasks
+
+REPLY = "Escrow holds the deposit until closing"
+
+def parse_sse(body: str) -> list:
+    events = []
+    for raw in filter(None, body.split("\n\n")):
+        fields = dict(line.split(": ", 1) for line in raw.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def stream(client, chat_id: str, message: str) -> list:
+    with client.stream("POST", f"/api/chats/{chat_id}/messages/stream", json={"message": message}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        return parse_sse(response.read().decode())
+
+class FailingAIService(FakeAIService):
+    """Streams `tokens_before_error` tokens, then raises `error`"""
+
+    def __init__(self, error: Exception, tokens_before_error: int = 0):
+        super().__init__(first_token_delay=0, token_delay=0, reply=REPLY)
+        self.error = error
+        self.tokens_before_error = tokens_before_error
+
+    async def stream_chat_with_ai(self, message, *args, **kwargs):
+        sent = 0
+        async for token in super().stream_chat_with_ai(message, *args, **kwargs):
+            if sent == self.tokens_before_error:
+                break
+            sent += 1
+            yield token
+        raise self.error
+
+def test_stream_sends_start_then_tokens_in_order_then_done(client):
+    client.app.state.services.ai_service.reply = REPLY
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+
+    events = stream(client, chat_id, "What is escrow?")
+
+    names = [name for name, _ in events]
+    assert names[0] == "start" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"}
+    tokens = [data["text"] for name, data in events if name == "token"]
+    assert tokens == ["Escrow", " holds", " the", " deposit", " until", " closing"]
+
+    start, done = events[0][1], events[-1][1]
+    assert start["userMessage"]["text"] == "What is escrow?"
+    assert done["userMessage"]["id"] == start["userMessage"]["id"]
+    assert done["aiResponse"]["id"] == start["aiMessageId"]
+    assert done["aiResponse"]["text"] == "".join(tokens)
+
+    saved = client.get(f"/api/chats/{chat_id}/messages").json()
+    assert [(m["sender"], m["text"]) for m in saved] == [("user", "What is escrow?"), ("ai", REPLY)]
+
+def test_stream_to_unknown_chat_is_404(client):
+    response = client.post("/api/chats/missing/messages/stream", json={"message": "hi"})
+    assert response.status_code == 404
+
+@pytest.mark.anyio
+async def test_disconnect_mid_stream_saves_the_partial_reply(app):
+    services = app.state.services
+    services.ai_service = FakeAIService(first_token_delay=0, token_delay=0.05, reply=REPLY)
+    chat = await server.create_chat(server.ChatCreateRequest(), user_id=server.ANONYMOUS_USER_ID, services=services)
+
+    received = []
+    gone = asyncio.Event()
+
+    def on_body(chunk: str):
+        received.extend(data["text"] for name, data in parse_sse(chunk) if name == "token")
+        if len(received) == 2:
+            gone.set()
+
+    response = await request_until_disconnect(
+        app, "POST", f"/api/chats/{chat.id}/messages/stream", {"message": "What is escrow?"},
+        disconnect=gone, on_body=on_body
+    )
+    await finish_background_tasks(services)
+
+    assert response["status"] == 200
+    messages = await services.db.messages.find({"chatId": chat.id}, {"_id": 0}).sort("timestamp", 1).to_list(None)
+    assert [m["sender"] for m in messages] == ["user", "ai"]
+    partial = messages[1]
+    assert partial["metadata"] == {"partial": True}
+    assert partial["text"].startswith("".join(received))
+    assert partial["text"] != REPLY
+    saved_chat = await services.db.chats.find_one({"id": chat.id})
+    assert saved_chat["messageCount"] == 2
+
+def test_backend_error_mid_stream_sends_error_and_keeps_the_partial(client):
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+    client.app.state.services.ai_service = FailingAIService(RuntimeError("provider exploded"), tokens_before_error=2)
+
+    events = stream(client, chat_id, "What is escrow?")
+
+    assert [name for name, _ in events] == ["start", "token", "token", "error"]
+    assert events[-1][1] == {"detail": "Failed to process message"}
+    saved = client.get(f"/api/chats/{chat_id}/messages").json()
+    assert [(m["sender"], m["text"]) for m in saved] == [("user", "What is escrow?"), ("ai", "Escrow holds")]
+
+def test_saturated_backend_sends_429_error_and_saves_nothing(client):
+    chat_id = client.post("/api/chats", json={}).json()["id"]
+    client.app.state.services.ai_service = FailingAIService(LLMSaturatedError("openai", retry_after=2.5))
+
+    events = stream(client, chat_id, "What is escrow?")
+
+    assert [name for name, _ in events] == ["start", "error"]
+    assert events[-1][1] == {"detail": "AI service is busy, please retry", "status": 429, "retryAfter": 3}
+    # The client retries the whole message, so nothing is kept
+    assert client.get(f"/api/chats/{chat_id}/messages").json() == []